@@ -0,0 +1,220 @@
+import asyncio
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable
+
+import click
+from yarl import URL
+
+from benchmarks.site import SiteConfig, children, render_page, serve_site
+from parser.metrics import CrawlMetrics, Stage
+from parser.pages import get_host, scan_page
+from parser.tree import build_tree
+from parser.web import parse
+
+DEFAULT_TOLERANCE = 0.1
+HIGHER_IS_BETTER = {"throughput"}
+LOWER_IS_BETTER = {"latency_p50", "latency_p99", "cpu_seconds", "peak_rss_mb"}
+
+
+@dataclass(kw_only=True, slots=True)
+class Scenario:
+    benchmark: str
+    site: SiteConfig = field(default_factory=SiteConfig)
+    workers: int = 20
+    repeat: int = 200
+
+
+SCENARIOS = {
+    "crawl": Scenario(benchmark="crawl", site=SiteConfig(fan_out=10, depth=3)),
+    "crawl_slow_site": Scenario(
+        benchmark="crawl",
+        site=SiteConfig(fan_out=8, depth=3, latency=0.005, redirect_chain=2, error_rate=0.05),
+        workers=50,
+    ),
+    "scan_page": Scenario(benchmark="scan_page", site=SiteConfig(page_size=64 * 1024, link_density=300)),
+    "build_tree": Scenario(benchmark="build_tree", site=SiteConfig(fan_out=20, depth=4)),
+}
+
+
+def scaled_down(scenario: Scenario) -> Scenario:
+    """Smaller version of the scenario for smoke runs."""
+    return replace(scenario, site=replace(scenario.site, depth=min(scenario.site.depth, 2)), repeat=20)
+
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def result(items: int, wall: float, cpu: float, latencies: list[float] | None = None) -> dict[str, Any]:
+    measured = {
+        "items": items,
+        "throughput": round(items / wall, 1),
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    if latencies:
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        measured["latency_p50"] = round(percentiles[49], 6)
+        measured["latency_p99"] = round(percentiles[98], 6)
+
+    return measured
+
+
+def site_process(config: SiteConfig, ready: multiprocessing.Queue) -> None:
+    async def serve():
+        async with serve_site(config) as url:
+            ready.put(url)
+            await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def bench_crawl(scenario: Scenario) -> dict[str, Any]:
+    """Full crawl of the site served from another process, latency is time to the first byte."""
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    server = context.Process(target=site_process, args=(scenario.site, ready), daemon=True)
+    server.start()
+
+    try:
+        url = ready.get(timeout=30)
+        metrics = CrawlMetrics()
+        cpu, wall = time.process_time(), time.perf_counter()
+        await parse(url, workers_number=scenario.workers, metrics=metrics)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    finally:
+        server.terminate()
+        server.join()
+
+    measured = result(metrics.pages, wall, cpu)
+    ttfb = metrics.stages[Stage.TTFB]
+    measured["latency_p50"] = round(ttfb.quantile(0.5), 6)
+    measured["latency_p99"] = round(ttfb.quantile(0.99), 6)
+    measured["statuses"] = {str(status): count for status, count in sorted(metrics.statuses.items())}
+    return measured
+
+
+async def bench_scan_page(scenario: Scenario) -> dict[str, Any]:
+    base = URL("http://127.0.0.1/page/0")
+    host = get_host(base.host)
+    html = render_page(scenario.site, 0)
+    latencies = []
+    cpu, wall = time.process_time(), time.perf_counter()
+
+    for _ in range(scenario.repeat):
+        started = time.perf_counter()
+        await scan_page(base, host, html)
+        latencies.append(time.perf_counter() - started)
+
+    return result(scenario.repeat, time.perf_counter() - wall, time.process_time() - cpu, latencies)
+
+
+def tree_urls(config: SiteConfig) -> list[URL]:
+    """Urls of the site with a path segment per tree level."""
+    urls = [URL("http://127.0.0.1/")]
+    stack = [(0, "")]
+
+    while stack:
+        page_id, path = stack.pop()
+        for i, child in enumerate(children(config, page_id)):
+            child_path = f"{path}/s{i}"
+            urls.append(URL(f"http://127.0.0.1{child_path}"))
+            stack.append((child, child_path))
+
+    return urls
+
+
+async def bench_build_tree(scenario: Scenario) -> dict[str, Any]:
+    urls = tree_urls(scenario.site)
+    cpu, wall = time.process_time(), time.perf_counter()
+    build_tree(urls)
+    return result(len(urls), time.perf_counter() - wall, time.process_time() - cpu)
+
+
+BENCHMARKS: dict[str, Callable[[Scenario], Any]] = {
+    "crawl": bench_crawl,
+    "scan_page": bench_scan_page,
+    "build_tree": bench_build_tree,
+}
+
+
+def run_scenario(scenario: Scenario) -> dict[str, Any]:
+    return asyncio.run(BENCHMARKS[scenario.benchmark](scenario))
+
+
+def run_isolated(scenario: Scenario) -> dict[str, Any]:
+    """Run scenario in a fresh process, so peak RSS belongs to this scenario only."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_scenario, scenario).result()
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """Describe metrics which got worse than the baseline by more than `tolerance`."""
+    regressions = []
+
+    for name, measured in current["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            continue
+
+        for metric, value in measured.items():
+            old = previous.get(metric)
+            if not isinstance(old, (int, float)) or not old:
+                continue
+            if metric in HIGHER_IS_BETTER and value < old * (1 - tolerance):
+                regressions.append(f"{name}.{metric}: {value} < {old}")
+            elif metric in LOWER_IS_BETTER and value > old * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {value} > {old}")
+
+    return regressions
+
+
+@click.command
+@click.argument("names", nargs=-1, type=click.Choice(list(SCENARIOS)))
+@click.option("--output", type=click.Path(dir_okay=False, path_type=Path), help="Write results to json file.")
+@click.option("--compare", "baseline_path",
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help="Baseline json to compare with. Exit code is 1 if any metric regressed.")
+@click.option("--tolerance",
+              type=click.FloatRange(min=0),
+              default=DEFAULT_TOLERANCE,
+              show_default=True,
+              help="Allowed relative regression.")
+@click.option("--quick", is_flag=True, help="Run smaller sites for a smoke check.")
+def main(names: tuple[str, ...], output: Path | None, baseline_path: Path | None, tolerance: float, quick: bool) -> None:
+    """Run benchmarks against local synthetic sites and print results as json."""
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "benchmarks": {},
+    }
+
+    for name in names or SCENARIOS:
+        scenario = scaled_down(SCENARIOS[name]) if quick else SCENARIOS[name]
+        click.echo(f"Running {name}: {asdict(scenario)}", err=True)
+        results["benchmarks"][name] = run_isolated(scenario)
+
+    text = json.dumps(results, indent=4)
+    click.echo(text)
+
+    if output:
+        output.write_text(text)
+
+    if baseline_path:
+        regressions = compare(json.loads(baseline_path.read_text()), results, tolerance)
+        for regression in regressions:
+            click.echo(f"Regression {regression}", err=True)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,117 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import AsyncIterator
+
+from aiohttp import web
+
+FILLER = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+
+
+@dataclass(kw_only=True, slots=True)
+class SiteConfig:
+    """Shape of a synthetic site.
+
+    Pages form a tree: every page links to `fan_out` children down to `depth` levels,
+    plus `link_density` links to random pages of the site. Every `redirect_every`-th child link
+    goes through a chain of `redirect_chain` redirects. `latency` is added to every response (s),
+    `error_rate` of pages answer 500. The same seed always gives the same site.
+    """
+
+    fan_out: int = 10
+    depth: int = 3
+    page_size: int = 16 * 1024
+    link_density: int = 5
+    redirect_chain: int = 0
+    redirect_every: int = 10
+    latency: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    @property
+    def pages(self) -> int:
+        return sum(self.fan_out ** level for level in range(self.depth + 1))
+
+
+def page_id_depth(config: SiteConfig, page_id: int) -> int:
+    depth, first = 0, 1
+    while page_id >= first:
+        first = first * config.fan_out + 1
+        depth += 1
+    return depth
+
+
+def children(config: SiteConfig, page_id: int) -> range:
+    if page_id_depth(config, page_id) >= config.depth:
+        return range(0)
+    first = page_id * config.fan_out + 1
+    return range(first, first + config.fan_out)
+
+
+def is_error(config: SiteConfig, page_id: int) -> bool:
+    digest = blake2b(f"{config.seed}:{page_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest) / 2 ** 64 < config.error_rate
+
+
+def child_href(config: SiteConfig, child: int) -> str:
+    if config.redirect_chain and child % config.redirect_every == 0:
+        return f"/redirect/{config.redirect_chain}/{child}"
+    return f"/page/{child}"
+
+
+def render_page(config: SiteConfig, page_id: int) -> str:
+    rng = random.Random(config.seed * 1_000_003 + page_id)
+    links = [child_href(config, child) for child in children(config, page_id)]
+    links += [f"/page/{rng.randrange(config.pages)}" for _ in range(config.link_density)]
+
+    body = [f"<html><head><title>Page {page_id}</title></head><body><h1>Page {page_id}</h1>"]
+    body += [f'<p>{FILLER}<a href="{href}">link {i}</a></p>' for i, href in enumerate(links)]
+    size = sum(map(len, body))
+
+    if size < config.page_size:
+        body.append(f"<p>{(FILLER * (config.page_size // len(FILLER) + 1))[:config.page_size - size]}</p>")
+
+    body.append("</body></html>")
+    return "".join(body)
+
+
+def create_app(config: SiteConfig) -> web.Application:
+    async def page(request: web.Request) -> web.Response:
+        page_id = int(request.match_info["page_id"])
+        if config.latency:
+            await asyncio.sleep(config.latency)
+        if not 0 <= page_id < config.pages:
+            raise web.HTTPNotFound()
+        if is_error(config, page_id):
+            raise web.HTTPInternalServerError()
+        return web.Response(text=render_page(config, page_id), content_type="text/html")
+
+    async def redirect(request: web.Request) -> web.Response:
+        left = int(request.match_info["left"])
+        page_id = request.match_info["page_id"]
+        if config.latency:
+            await asyncio.sleep(config.latency)
+        location = f"/redirect/{left - 1}/{page_id}" if left > 1 else f"/page/{page_id}"
+        raise web.HTTPFound(location)
+
+    app = web.Application()
+    app.router.add_get("/page/{page_id:\\d+}", page)
+    app.router.add_get("/redirect/{left:\\d+}/{page_id:\\d+}", redirect)
+    return app
+
+
+@asynccontextmanager
+async def serve_site(config: SiteConfig, host: str = "127.0.0.1", port: int = 0) -> AsyncIterator[str]:
+    """Run the site in the current event loop and yield the url of its root page."""
+    runner = web.AppRunner(create_app(config), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    try:
+        port = runner.addresses[0][1]
+        yield f"http://{host}:{port}/page/0"
+    finally:
+        await runner.cleanup()
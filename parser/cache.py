@@ -0,0 +1,105 @@
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from hashlib import blake2b
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator
+
+from yarl import URL
+
+COMMIT_EVERY = 100
+
+logger = logging.getLogger("parser.cache")
+
+
+def content_digest():
+    return blake2b(digest_size=16)
+
+
+async def hash_chunks(chunks: AsyncIterable[bytes], digest) -> AsyncIterator[bytes]:
+    """Pass chunks through updating the digest."""
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+@dataclass(kw_only=True, slots=True)
+class CachedPage:
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    links: list[str]
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """SQLite store of page validators and links extracted from the page.
+
+    Pages answering 304 Not Modified to a conditional request are not downloaded and parsed again.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, links TEXT, updated REAL)"
+        )
+        self._uncommitted = 0
+        self.hits = 0
+
+    def get(self, url: URL) -> CachedPage | None:
+        row = self._connection.execute(
+            "SELECT etag, last_modified, content_hash, links FROM pages WHERE url = ?", (str(url),)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        etag, last_modified, content_hash, links = row
+        return CachedPage(
+            etag=etag,
+            last_modified=last_modified,
+            content_hash=content_hash,
+            links=links.split("\n") if links else [],
+        )
+
+    def put(self, url: URL, page: CachedPage) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+            (str(url), page.etag, page.last_modified, page.content_hash, "\n".join(page.links), time.time()),
+        )
+        self._uncommitted += 1
+
+        if self._uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self) -> None:
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"<PageCache {self.path}>"
@@ -0,0 +1,110 @@
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from fnmatch import translate
+from typing import Iterable
+
+from yarl import URL
+
+
+class TrailingSlash(Enum):
+    KEEP = "keep"
+    ADD = "add"
+    STRIP = "strip"
+
+
+@dataclass(kw_only=True, slots=True)
+class CanonicalRules:
+    """Rules turning different spellings of a page url into one.
+
+    Case of scheme and host, dot segments, default ports and percent-encoding are normalized by yarl itself.
+    Queries are dropped unless `keep_query` is set or some parameters are allowed. Parameter names are matched
+    by shell-style patterns (`utm_*`), kept parameters are sorted. `host_aliases` map mirrors to the main host.
+    """
+
+    trailing_slash: TrailingSlash = TrailingSlash.KEEP
+    keep_query: bool = False
+    allow_params: tuple[str, ...] = ()
+    deny_params: tuple[str, ...] = ()
+    host_aliases: dict[str, str] = field(default_factory=dict)
+
+    @staticmethod
+    def parse_alias(value: str) -> tuple[str, str]:
+        """Parse 'ALIAS=HOST' string."""
+        alias, separator, host = value.partition("=")
+        if not separator or not alias or not host:
+            raise ValueError(f"Expected ALIAS=HOST, got {value!r}")
+        return alias.strip().lower(), host.strip().lower()
+
+
+def compile_patterns(patterns: Iterable[str]) -> re.Pattern | None:
+    patterns = list(patterns)
+    return re.compile("|".join(translate(pattern) for pattern in patterns)) if patterns else None
+
+
+class Canonicalizer:
+    """Rules compiled for the hot path: urls the rules do not touch are returned as is, without rebuilding."""
+
+    def __init__(self, rules: CanonicalRules | None = None):
+        self.rules = rules = rules if rules is not None else CanonicalRules()
+        self.keeps_query = rules.keep_query or bool(rules.allow_params)
+        self._allow = compile_patterns(rules.allow_params)
+        self._deny = compile_patterns(rules.deny_params)
+        self._aliases = {alias.lower(): host.lower() for alias, host in rules.host_aliases.items()}
+        self._trailing_slash = rules.trailing_slash
+
+    def _query(self, raw_query: str) -> str:
+        params = []
+
+        for param in raw_query.split("&"):
+            name = param.partition("=")[0]
+            if not name:
+                continue
+            if self._allow is not None and not self._allow.match(name):
+                continue
+            if self._deny is not None and self._deny.match(name):
+                continue
+            params.append(param)
+
+        params.sort(key=lambda param: param.partition("=")[0])
+        return "&".join(params)
+
+    def _path(self, raw_path: str) -> str:
+        if self._trailing_slash is TrailingSlash.STRIP:
+            if len(raw_path) > 1 and raw_path.endswith("/"):
+                return raw_path.rstrip("/") or "/"
+        elif self._trailing_slash is TrailingSlash.ADD:
+            if not raw_path.endswith("/") and "." not in raw_path.rpartition("/")[2]:
+                return raw_path + "/"
+        return raw_path or "/"
+
+    def host(self, host: str) -> str:
+        return self._aliases.get(host, host)
+
+    def canonicalize(self, url: URL) -> URL:
+        """Canonical form of absolute url."""
+        host = self._aliases.get(url.host, url.raw_host)
+        path = self._path(url.raw_path)
+        query = self._query(url.raw_query_string) if self.keeps_query and url.raw_query_string else ""
+
+        if (
+            host == url.raw_host
+            and path == url.raw_path
+            and query == url.raw_query_string
+            and not url.raw_fragment
+        ):
+            return url
+
+        return URL.build(
+            scheme=url.scheme,
+            user=url.raw_user,
+            password=url.raw_password,
+            host=host,
+            port=url.explicit_port,
+            path=path,
+            query_string=query,
+            encoded=True,
+        )
+
+    def __repr__(self):
+        return f"<Canonicalizer {self.rules}>"
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+from yarl import URL
+
+DEFAULT_CHECKPOINT_INTERVAL = 5.0
+FOUND = "F"
+SCANNED = "S"
+
+logger = logging.getLogger("parser.checkpoint")
+
+
+class Checkpoint:
+    """Append-only journal of found and scanned urls.
+
+    New urls are buffered in memory and appended to the file every `interval` seconds,
+    so a checkpoint never rewrites the whole state. With `resume` the existing journal is continued.
+    """
+
+    def __init__(self, path: str | Path, interval: float = DEFAULT_CHECKPOINT_INTERVAL, resume: bool = False):
+        self.path = Path(path)
+        self.interval = interval
+        self.resume = resume
+        self._buffer: list[str] = []
+        self._file = None
+
+    def load(self) -> tuple[set[URL], set[URL]]:
+        """Read found and scanned urls from the journal."""
+        found, scanned = set(), set()
+
+        if not self.path.exists():
+            return found, scanned
+
+        complete = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    logger.warning("Skip incomplete record in the end of %s", self.path)
+                    break
+
+                complete += len(line)
+                kind, _, url = line[:-1].decode("utf-8").partition("\t")
+                if kind == FOUND:
+                    found.add(URL(url, encoded=True))
+                elif kind == SCANNED:
+                    scanned.add(URL(url, encoded=True))
+
+        # New records must not be appended to the incomplete one
+        if complete < self.path.stat().st_size:
+            os.truncate(self.path, complete)
+
+        logger.info("Loaded checkpoint: %d found, %d scanned", len(found), len(scanned))
+        return found, scanned
+
+    def record_found(self, url: URL) -> None:
+        self._buffer.append(f"{FOUND}\t{url}\n")
+
+    def record_scanned(self, url: URL) -> None:
+        self._buffer.append(f"{SCANNED}\t{url}\n")
+
+    def flush(self) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a" if self.resume else "w", encoding="utf-8")
+
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer.clear()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def __repr__(self):
+        return f"<Checkpoint {self.path}>"
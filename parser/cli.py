@@ -1,14 +1,38 @@
 import asyncio
 import logging
+import re
 import time
+from contextlib import nullcontext
+from importlib.util import find_spec
 from pathlib import Path
+from typing import Any
 
 import click
 from aiohttp import ClientTimeout
 from yarl import URL
 
 from parser import web
-from parser.reports import write_report
+from parser.cache import PageCache
+from parser.canonical import CanonicalRules, TrailingSlash
+from parser.checkpoint import DEFAULT_CHECKPOINT_INTERVAL, Checkpoint
+from parser.coordinator import (
+    DEFAULT_COORDINATOR_HOST, DEFAULT_COORDINATOR_PORT, DEFAULT_LEASE_TIMEOUT, Coordinator, RemoteFrontier,
+)
+from parser.dedup import DedupMode, Deduplicator
+from parser.frontier import Ordering, PriorityRule
+from parser.metrics import DEFAULT_METRICS_INTERVAL, CrawlMetrics, JsonFileSink, MetricsSink, PrometheusSink, StderrSink
+from parser.pages import Extractor
+from parser.reports import Compression, NdjsonReport, ReportFormat, report_path, write_report
+from parser.retry import (
+    DEFAULT_BREAKER_COOLDOWN, DEFAULT_BREAKER_THRESHOLD, DEFAULT_RETRY_BUDGETS, ErrorClass, Retries, RetryPolicy,
+)
+from parser.robots import RobotsCache
+from parser.scope import PublicSuffixes, Scope
+from parser.session import (
+    DEFAULT_CONNECTIONS_LIMIT, DEFAULT_CONNECTIONS_PER_HOST, DEFAULT_DNS_CACHE_TTL, DEFAULT_KEEPALIVE_TIMEOUT,
+    ConnectionStats, SessionOptions, UserAgentMode,
+)
+from parser.shards import ShardKey, parse_sharded
 
 
 def parse_url(
@@ -18,7 +42,33 @@ def parse_url(
     max_found: int | None,
     request_timeout: ClientTimeout,
     workers_number: int,
-    check_interval: float,
+    parse_workers: int,
+    extractor: Extractor,
+    stream: bool,
+    max_body_bytes: int | None,
+    memory_budget: int | None,
+    bloom_error_rate: float | None,
+    per_host_limit: int | None,
+    per_host_rate: float | None,
+    adaptive_delay: bool,
+    session_options: SessionOptions,
+    pipeline: web.PipelineOptions,
+    connection_stats: ConnectionStats,
+    cache: PageCache | None,
+    checkpoint: Checkpoint | None,
+    report: NdjsonReport | None,
+    metrics: CrawlMetrics,
+    metrics_sinks: list[MetricsSink],
+    ordering: Ordering,
+    priority_rules: tuple[PriorityRule, ...],
+    redirects_first: bool,
+    robots: RobotsCache | None,
+    sitemaps: bool,
+    dedup: Deduplicator | None,
+    canonical: CanonicalRules | None,
+    scope: Scope | None,
+    concurrency: web.ConcurrencyController | None,
+    retries: Retries | None,
 ) -> tuple[set[URL], set[URL], web.StopReason, float]:
     started = time.monotonic()
     result: tuple[set[URL], set[URL], web.StopReason] = asyncio.run(web.parse(
@@ -28,25 +78,208 @@ def parse_url(
         max_found=max_found,
         request_timeout=request_timeout,
         workers_number=workers_number,
-        check_interval=check_interval,
+        parse_workers=parse_workers,
+        extractor=extractor,
+        stream=stream,
+        max_body_bytes=max_body_bytes,
+        memory_budget=memory_budget,
+        bloom_error_rate=bloom_error_rate,
+        per_host_limit=per_host_limit,
+        per_host_rate=per_host_rate,
+        adaptive_delay=adaptive_delay,
+        session_options=session_options,
+        pipeline=pipeline,
+        connection_stats=connection_stats,
+        cache=cache,
+        checkpoint=checkpoint,
+        report=report,
+        metrics=metrics,
+        metrics_sinks=metrics_sinks,
+        ordering=ordering,
+        priority_rules=priority_rules,
+        redirects_first=redirects_first,
+        robots=robots,
+        sitemaps=sitemaps,
+        dedup=dedup,
+        canonical=canonical,
+        scope=scope,
+        concurrency=concurrency,
+        retries=retries,
     ))
     found, scanned, reason = result
     elapsed = time.monotonic() - started
     return found, scanned, reason, elapsed
 
 
+def parse_url_sharded(
+    url: str,
+    shards: int,
+    shard_key: ShardKey,
+    timeout: float | None,
+    max_scanned: int | None,
+    max_found: int | None,
+    request_timeout: ClientTimeout,
+    workers_number: int,
+    parse_workers: int,
+    extractor: Extractor,
+    stream: bool,
+    max_body_bytes: int | None,
+    memory_budget: int | None,
+    bloom_error_rate: float | None,
+    per_host_limit: int | None,
+    per_host_rate: float | None,
+    adaptive_delay: bool,
+    session_options: SessionOptions,
+    pipeline: web.PipelineOptions,
+    canonical: CanonicalRules | None,
+    scope: Scope | None,
+) -> tuple[set[URL], set[URL], web.StopReason, float, list[dict[str, Any]]]:
+    started = time.monotonic()
+    found, scanned, reason, shard_stats = parse_sharded(
+        url,
+        shards,
+        key=shard_key,
+        max_found=max_found,
+        max_scanned=max_scanned,
+        collect_metrics=True,
+        log_level=logging.getLogger().level,
+        timeout=timeout,
+        request_timeout=request_timeout,
+        workers_number=workers_number,
+        parse_workers=parse_workers,
+        extractor=extractor,
+        stream=stream,
+        max_body_bytes=max_body_bytes,
+        memory_budget=memory_budget,
+        bloom_error_rate=bloom_error_rate,
+        per_host_limit=per_host_limit,
+        per_host_rate=per_host_rate,
+        adaptive_delay=adaptive_delay,
+        session_options=session_options,
+        pipeline=pipeline,
+        canonical=canonical,
+        scope=scope,
+    )
+    elapsed = time.monotonic() - started
+    return found, scanned, reason, elapsed, shard_stats
+
+
+def parse_url_remote(
+    url: str,
+    coordinator: tuple[str, int],
+    timeout: float | None,
+    request_timeout: ClientTimeout,
+    workers_number: int,
+    parse_workers: int,
+    extractor: Extractor,
+    stream: bool,
+    max_body_bytes: int | None,
+    per_host_limit: int | None,
+    per_host_rate: float | None,
+    adaptive_delay: bool,
+    session_options: SessionOptions,
+    pipeline: web.PipelineOptions,
+    connection_stats: ConnectionStats,
+    cache: PageCache | None,
+    metrics: CrawlMetrics,
+    metrics_sinks: list[MetricsSink],
+    robots: RobotsCache | None,
+    canonical: CanonicalRules | None,
+    scope: Scope | None,
+) -> tuple[set[URL], set[URL], web.StopReason, float]:
+    async def crawl() -> tuple[set[URL], set[URL], web.StopReason]:
+        host, port = coordinator
+        async with RemoteFrontier(host, port) as frontier:
+            return await web.parse(
+                url=url,
+                timeout=timeout,
+                request_timeout=request_timeout,
+                workers_number=workers_number,
+                parse_workers=parse_workers,
+                extractor=extractor,
+                stream=stream,
+                max_body_bytes=max_body_bytes,
+                frontier=frontier,
+                per_host_limit=per_host_limit,
+                per_host_rate=per_host_rate,
+                adaptive_delay=adaptive_delay,
+                session_options=session_options,
+                pipeline=pipeline,
+                connection_stats=connection_stats,
+                cache=cache,
+                metrics=metrics,
+                metrics_sinks=metrics_sinks,
+                sinks=[frontier],
+                robots=robots,
+                canonical=canonical,
+                scope=scope,
+            )
+
+    started = time.monotonic()
+    found, scanned, reason = asyncio.run(crawl())
+    elapsed = time.monotonic() - started
+    return found, scanned, reason, elapsed
+
+
+def parse_address(ctx: click.Context, param: click.Parameter, value: str | None) -> tuple[str, int] | None:
+    if value is None:
+        return None
+
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        raise click.BadParameter("Expected HOST:PORT.")
+    return host, int(port)
+
+
+def parse_priority_rules(
+    ctx: click.Context,
+    param: click.Parameter,
+    value: tuple[str, ...],
+) -> tuple[PriorityRule, ...]:
+    try:
+        return tuple(PriorityRule.parse(rule) for rule in value)
+    except (ValueError, re.error) as e:
+        raise click.BadParameter(str(e))
+
+
+def parse_host_aliases(ctx: click.Context, param: click.Parameter, value: tuple[str, ...]) -> dict[str, str]:
+    try:
+        return dict(CanonicalRules.parse_alias(alias) for alias in value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def parse_retry_budgets(
+    ctx: click.Context,
+    param: click.Parameter,
+    value: tuple[str, ...],
+) -> dict[ErrorClass, int]:
+    try:
+        return dict(RetryPolicy.parse_budget(budget) for budget in value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def setup_logging(log_level: str) -> None:
+    logging.basicConfig(
+        format="%(asctime)5s.%(msecs)03d [%(levelname)s] %(name)s - %(message)s",
+        level=log_level.upper(),
+        datefmt="%H:%M:%S",
+    )
+    logging.getLogger("charset_normalizer").setLevel(logging.WARNING)
+    logging.getLogger("parser.pages").setLevel(max(logging.INFO, logging.getLogger().level))
+
+
 @click.command
 @click.argument("url", type=str)
 @click.option("--timeout", type=float,
               help="Total timeout for scanning. "
                    "Parser doesn't guarantee what parsing will be finished immediately after the timeout.")
 @click.option("--max-scanned", type=int,
-              help="Limit for scanned urls. "
-                   "Parser doesn't guarantee what exactly 'n' urls will be scanned, but at least 'n'. ")
+              help="Limit for scanned urls. Parsing stops exactly after 'n' urls are scanned.")
 @click.option("--max-found",
               type=int,
-              help="Limit for found urls. "
-                   "Parser doesn't guarantee what exactly 'n' urls will be found, but at least 'n'.")
+              help="Limit for found urls. Parsing stops exactly after 'n' urls are found.")
 @click.option("--request-timeout",
               type=float,
               default=web.DEFAULT_REQUEST_TIMEOUT.total,
@@ -56,12 +289,261 @@ def parse_url(
               type=int,
               default=web.DEFAULT_WORKERS_NUMBER,
               show_default=True,
-              help="Number of workers who scan urls concurrently.")
-@click.option("--check-interval",
-              type=float,
-              default=web.DEFAULT_CHECK_INTERVAL,
+              help="Number of workers who download pages concurrently. "
+                   "With --adaptive-concurrency it is the initial number.")
+@click.option("--adaptive-concurrency",
+              is_flag=True,
+              help="Adjust the number of downloading workers at runtime: raise it while throughput grows, "
+                   "cut it when latency or the rate of errors grows. Decisions are listed in the report.")
+@click.option("--min-workers",
+              type=click.IntRange(min=1),
+              default=web.DEFAULT_MIN_WORKERS,
+              show_default=True,
+              help="Lower bound of --adaptive-concurrency.")
+@click.option("--max-workers",
+              type=click.IntRange(min=1),
+              default=web.DEFAULT_MAX_WORKERS,
+              show_default=True,
+              help="Upper bound of --adaptive-concurrency.")
+@click.option("--parse-workers",
+              type=click.IntRange(min=0),
+              default=web.DEFAULT_PARSE_WORKERS,
+              show_default=True,
+              help="Number of processes extracting links from pages. "
+                   "With 0 pages are parsed in the event loop.")
+@click.option("--parse-concurrency",
+              type=click.IntRange(min=1),
+              help="Number of pages parsed concurrently. By default one per parse process or one without them.")
+@click.option("--parse-queue-size",
+              type=click.IntRange(min=1),
+              default=web.DEFAULT_PARSE_QUEUE_SIZE,
+              show_default=True,
+              help="Number of downloaded pages waiting for parsing. Workers stop downloading when it is full.")
+@click.option("--link-queue-size",
+              type=click.IntRange(min=1),
+              default=web.DEFAULT_LINK_QUEUE_SIZE,
+              show_default=True,
+              help="Number of parsed pages waiting for their links to be queued. "
+                   "Parsing stops when it is full.")
+@click.option("--extractor",
+              type=click.Choice([extractor.value for extractor in Extractor]),
+              default=web.DEFAULT_EXTRACTOR.value,
+              show_default=True,
+              help="Backend for extracting links from pages. "
+                   "'lxml' streams hrefs without building a tree, 'soup' uses BeautifulSoup.")
+@click.option("--stream",
+              is_flag=True,
+              help="Extract links while response body is downloading and enqueue them immediately.")
+@click.option("--max-body-bytes",
+              type=click.IntRange(min=1),
+              help="Stop reading a page after this number of bytes. Applied with --stream.")
+@click.option("--memory-budget",
+              type=click.IntRange(min=1),
+              help="Memory for the queue of urls (MB). Pending urls exceeding it are kept on disk. "
+                   "With priority ordering it limits the seen-set only.")
+@click.option("--bloom-error-rate",
+              type=click.FloatRange(min=0, max=1, min_open=True, max_open=True),
+              help="Remember seen urls in a Bloom filter with this false positive rate instead of exact fingerprints. "
+                   "A false positive url is never scanned.")
+@click.option("--ordering",
+              type=click.Choice([ordering.value for ordering in Ordering]),
+              default=Ordering.FIFO.value,
+              show_default=True,
+              help="Order of scanning: by discovery, by the number of links from the start page "
+                   "or by the number of path segments.")
+@click.option("--priority-rule",
+              "priority_rules",
+              multiple=True,
+              callback=parse_priority_rules,
+              metavar="REGEX=N",
+              help="Add N to the priority of urls matching the regular expression, lower goes first. "
+                   "The first matching rule is applied, may be repeated.")
+@click.option("--redirects-first",
+              is_flag=True,
+              help="Scan redirect targets before any other queued url.")
+@click.option("--robots",
+              is_flag=True,
+              help="Obey robots.txt of every host: skip disallowed urls and keep its Crawl-delay.")
+@click.option("--sitemaps",
+              is_flag=True,
+              help="Queue pages listed in sitemaps of robots.txt (or /sitemap.xml) while crawling.")
+@click.option("--dedup",
+              "dedup_mode",
+              type=click.Choice([mode.value for mode in DedupMode]),
+              help="Do not follow links of pages duplicating already scanned ones: with the same body ('exact') "
+                   "or also with similar text ('near'). Duplicates are listed in the report.")
+@click.option("--trailing-slash",
+              type=click.Choice([policy.value for policy in TrailingSlash]),
+              default=TrailingSlash.KEEP.value,
+              show_default=True,
+              help="Treat '/a' and '/a/' as one page: add the slash to paths without extension or strip it.")
+@click.option("--keep-query",
+              is_flag=True,
+              help="Keep query of links, its parameters are sorted. By default queries are dropped.")
+@click.option("--allow-param",
+              "allow_params",
+              multiple=True,
+              metavar="PATTERN",
+              help="Keep only query parameters matching the shell-style pattern, may be repeated. "
+                   "Implies --keep-query.")
+@click.option("--deny-param",
+              "deny_params",
+              multiple=True,
+              metavar="PATTERN",
+              help="Drop query parameters matching the shell-style pattern like 'utm_*', may be repeated.")
+@click.option("--host-alias",
+              "host_aliases",
+              multiple=True,
+              callback=parse_host_aliases,
+              metavar="ALIAS=HOST",
+              help="Treat links to ALIAS as links to HOST, e.g. www.example.org=example.org. May be repeated.")
+@click.option("--top-level",
+              is_flag=True,
+              help="Crawl the whole registrable domain of URL, e.g. example.co.uk for www.example.co.uk. "
+                   "By default the host of URL and its subdomains are crawled.")
+@click.option("--public-suffix-list",
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help="Public suffix list file (publicsuffix.org format) for --top-level. "
+                   "By default the most used suffixes are known.")
+@click.option("--allow-host",
+              "allow_hosts",
+              multiple=True,
+              metavar="HOST",
+              help="Crawl this host and its subdomains too, may be repeated.")
+@click.option("--exclude-host",
+              "exclude_hosts",
+              multiple=True,
+              metavar="HOST",
+              help="Do not crawl this host and its subdomains, may be repeated.")
+@click.option("--per-host-limit",
+              type=click.IntRange(min=1),
+              help="Maximum number of concurrent requests to a single host.")
+@click.option("--per-host-rate",
+              type=click.FloatRange(min=0, min_open=True),
+              help="Maximum number of requests per second to a single host.")
+@click.option("--adaptive-delay",
+              is_flag=True,
+              help="Adjust delay between requests to a host by its response latency. "
+                   "Hosts answering 429 and 503 are slowed down regardless of this flag.")
+@click.option("--retry",
+              is_flag=True,
+              help="Retry urls failed with connection errors, timeouts, 429 and 5xx with exponential backoff. "
+                   "Urls failed for good are listed in the report.")
+@click.option("--retry-budget",
+              "retry_budgets",
+              multiple=True,
+              callback=parse_retry_budgets,
+              metavar="CLASS=N",
+              help="Number of retries of a url after errors of the class: 'connection' (3 by default), "
+                   "'timeout' (2), 'server' for 5xx (2) or 'throttled' for 429 (3). May be repeated.")
+@click.option("--breaker-threshold",
+              type=click.IntRange(min=1),
+              default=DEFAULT_BREAKER_THRESHOLD,
+              show_default=True,
+              help="Number of failures of a host in a row pausing requests to it, applied with --retry.")
+@click.option("--breaker-cooldown",
+              type=click.FloatRange(min=0, min_open=True),
+              default=DEFAULT_BREAKER_COOLDOWN,
+              show_default=True,
+              help="Time to pause a failing host for (s).")
+@click.option("--connections-limit",
+              type=click.IntRange(min=0),
+              default=DEFAULT_CONNECTIONS_LIMIT,
+              show_default=True,
+              help="Maximum number of open connections. 0 for no limit.")
+@click.option("--connections-per-host",
+              type=click.IntRange(min=0),
+              default=DEFAULT_CONNECTIONS_PER_HOST,
+              show_default=True,
+              help="Maximum number of open connections to a single host. 0 for no limit.")
+@click.option("--dns-cache-ttl",
+              type=click.IntRange(min=0),
+              default=DEFAULT_DNS_CACHE_TTL,
+              show_default=True,
+              help="Time to keep resolved addresses (s). 0 disables DNS cache.")
+@click.option("--keepalive-timeout",
+              type=click.FloatRange(min=0),
+              default=DEFAULT_KEEPALIVE_TIMEOUT,
+              show_default=True,
+              help="Time to keep idle connections open for reuse (s).")
+@click.option("--compress/--no-compress",
+              default=True,
               show_default=True,
-              help="Interval for checking the exceeded limits (s).")
+              help="Ask servers for compressed responses.")
+@click.option("--user-agent",
+              type=click.Choice([mode.value for mode in UserAgentMode]),
+              default=UserAgentMode.RANDOM.value,
+              show_default=True,
+              help="Send random User-Agent with every request or a fixed one for the whole session.")
+@click.option("--cache",
+              "cache_path",
+              type=click.Path(dir_okay=False, path_type=Path),
+              help="SQLite file with ETag/Last-Modified of scanned pages and their links. "
+                   "Unchanged pages are not downloaded again.")
+@click.option("--checkpoint",
+              "checkpoint_path",
+              type=click.Path(dir_okay=False, path_type=Path),
+              help="File for periodic checkpoints of found and scanned urls.")
+@click.option("--resume",
+              "resume_path",
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help="Continue parsing from the checkpoint file. New checkpoints are appended to it.")
+@click.option("--checkpoint-interval",
+              type=click.FloatRange(min=0, min_open=True),
+              default=DEFAULT_CHECKPOINT_INTERVAL,
+              show_default=True,
+              help="Interval for writing checkpoints (s).")
+@click.option("--report-format",
+              type=click.Choice([report_format.value for report_format in ReportFormat]),
+              default=ReportFormat.JSON.value,
+              show_default=True,
+              help="'json' writes the report after parsing, "
+                   "'ndjson' appends every scanned url as it completes and found urls with the summary in the end.")
+@click.option("--report-compression",
+              type=click.Choice([compression.value for compression in Compression]),
+              default=Compression.NONE.value,
+              show_default=True,
+              help="Compression of the report file. 'zstd' requires zstandard package.")
+@click.option("--sort/--no-sort",
+              default=True,
+              show_default=True,
+              help="Sort urls in the report. Without sorting urls are written straight from the parsed sets.")
+@click.option("--metrics-log",
+              is_flag=True,
+              help="Print a summary of throughput and stage latencies to stderr every --metrics-interval.")
+@click.option("--metrics-file",
+              type=click.Path(dir_okay=False, path_type=Path),
+              help="JSON file rewritten with metrics every --metrics-interval.")
+@click.option("--metrics-port",
+              type=click.IntRange(min=1, max=65535),
+              help="Serve metrics in Prometheus text format on http://127.0.0.1:<port>/metrics.")
+@click.option("--metrics-interval",
+              type=click.FloatRange(min=0, min_open=True),
+              default=DEFAULT_METRICS_INTERVAL,
+              show_default=True,
+              help="Interval for publishing metrics (s).")
+@click.option("--log-level",
+              type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"], case_sensitive=False),
+              default="INFO",
+              show_default=True,
+              help="Logging level. Above INFO per-url messages are not formatted at all.")
+@click.option("--shards",
+              type=click.IntRange(min=1),
+              default=1,
+              show_default=True,
+              help="Number of processes crawling in parallel, each with its own event loop and connections. "
+                   "Urls are partitioned between them by --shard-key.")
+@click.option("--shard-key",
+              type=click.Choice([key.value for key in ShardKey]),
+              default=ShardKey.URL.value,
+              show_default=True,
+              help="Partition urls between shards by the whole url or by host. "
+                   "Per-host limits are exact only with 'host'.")
+@click.option("--coordinator",
+              callback=parse_address,
+              metavar="HOST:PORT",
+              help="Join the crawl run by parse-coordinator. "
+                   "Urls are leased from it and results are sent to it, the report is written by the coordinator.")
 def parse(
     url: str,
     timeout: float | None,
@@ -69,27 +551,284 @@ def parse(
     max_found: int | None,
     request_timeout: float,
     workers_number: int,
-    check_interval: float,
+    adaptive_concurrency: bool,
+    min_workers: int,
+    max_workers: int,
+    parse_workers: int,
+    parse_concurrency: int | None,
+    parse_queue_size: int,
+    link_queue_size: int,
+    extractor: str,
+    stream: bool,
+    max_body_bytes: int | None,
+    memory_budget: int | None,
+    bloom_error_rate: float | None,
+    ordering: str,
+    priority_rules: tuple[PriorityRule, ...],
+    redirects_first: bool,
+    robots: bool,
+    sitemaps: bool,
+    dedup_mode: str | None,
+    trailing_slash: str,
+    keep_query: bool,
+    allow_params: tuple[str, ...],
+    deny_params: tuple[str, ...],
+    host_aliases: dict[str, str],
+    top_level: bool,
+    public_suffix_list: Path | None,
+    allow_hosts: tuple[str, ...],
+    exclude_hosts: tuple[str, ...],
+    per_host_limit: int | None,
+    per_host_rate: float | None,
+    adaptive_delay: bool,
+    retry: bool,
+    retry_budgets: dict[ErrorClass, int],
+    breaker_threshold: int,
+    breaker_cooldown: float,
+    connections_limit: int,
+    connections_per_host: int,
+    dns_cache_ttl: int,
+    keepalive_timeout: float,
+    compress: bool,
+    user_agent: str,
+    cache_path: Path | None,
+    checkpoint_path: Path | None,
+    resume_path: Path | None,
+    checkpoint_interval: float,
+    report_format: str,
+    report_compression: str,
+    sort: bool,
+    metrics_log: bool,
+    metrics_file: Path | None,
+    metrics_port: int | None,
+    metrics_interval: float,
+    log_level: str,
+    shards: int,
+    shard_key: str,
+    coordinator: tuple[str, int] | None,
 ) -> None:
     """Parse given URL and save results to json in current directory."""
 
-    logging.basicConfig(
-        format="%(asctime)5s.%(msecs)03d [%(levelname)s] %(name)s - %(message)s",
-        level=logging.INFO,
-        datefmt="%H:%M:%S",
-    )
-    logging.getLogger("charset_normalizer").setLevel(logging.WARNING)
-    logging.getLogger("parser.pages").setLevel(logging.INFO)
+    setup_logging(log_level)
 
     request_timeout = ClientTimeout(total=request_timeout)
+    extractor = Extractor(extractor)
+    memory_budget = memory_budget * 1024 * 1024 if memory_budget else None
+    ordering = Ordering(ordering)
+    prioritized = ordering is not Ordering.FIFO or bool(priority_rules) or redirects_first
+    session_options = SessionOptions(
+        limit=connections_limit,
+        limit_per_host=connections_per_host,
+        dns_cache_ttl=dns_cache_ttl,
+        keepalive_timeout=keepalive_timeout,
+        compress=compress,
+        user_agent=UserAgentMode(user_agent),
+    )
+    pipeline = web.PipelineOptions(
+        parse_concurrency=parse_concurrency,
+        parse_queue_size=parse_queue_size,
+        link_queue_size=link_queue_size,
+    )
+    connection_stats = ConnectionStats()
+    robots_cache = RobotsCache() if robots else None
+    dedup = Deduplicator(DedupMode(dedup_mode)) if dedup_mode else None
+
+    if min_workers > max_workers:
+        raise click.UsageError("Option --min-workers must not exceed --max-workers.")
+    concurrency = web.ConcurrencyController(workers_number, min_workers, max_workers) if adaptive_concurrency else None
+
+    if retry:
+        retries = Retries(RetryPolicy(
+            budgets={**DEFAULT_RETRY_BUDGETS, **retry_budgets},
+            breaker_threshold=breaker_threshold,
+            breaker_cooldown=breaker_cooldown,
+        ))
+    else:
+        retries = None
+    canonical = CanonicalRules(
+        trailing_slash=TrailingSlash(trailing_slash),
+        keep_query=keep_query,
+        allow_params=allow_params,
+        deny_params=deny_params,
+        host_aliases=host_aliases,
+    )
+    canonical = canonical if canonical != CanonicalRules() else None
+
+    if top_level or allow_hosts or exclude_hosts:
+        suffixes = PublicSuffixes.load(public_suffix_list) if public_suffix_list else None
+        scope = Scope.for_url(URL(url), top_level, suffixes, allow_hosts, exclude_hosts)
+    else:
+        scope = None
+    report_format = ReportFormat(report_format)
+    compression = Compression(report_compression)
+
+    if compression is Compression.ZSTD and find_spec("zstandard") is None:
+        raise click.UsageError("Report compression 'zstd' requires zstandard package.")
+
+    if checkpoint_path and resume_path:
+        raise click.UsageError("Options --checkpoint and --resume are mutually exclusive.")
+    elif resume_path:
+        checkpoint = Checkpoint(resume_path, checkpoint_interval, resume=True)
+    elif checkpoint_path:
+        checkpoint = Checkpoint(checkpoint_path, checkpoint_interval)
+    else:
+        checkpoint = None
+
+    metrics = CrawlMetrics()
+    metrics_sinks = []
+
+    if metrics_log:
+        metrics_sinks.append(StderrSink(metrics_interval))
+    if metrics_file:
+        metrics_sinks.append(JsonFileSink(metrics_file, metrics_interval))
+    if metrics_port:
+        metrics_sinks.append(PrometheusSink(metrics_port))
+
+    if coordinator is not None:
+        unsupported = shards > 1 or max_found or max_scanned or checkpoint or memory_budget or bloom_error_rate
+        reporting = report_format is not ReportFormat.JSON or compression is not Compression.NONE or not sort
+        if unsupported or reporting or prioritized or sitemaps or dedup or concurrency or retries:
+            raise click.UsageError(
+                "Options --shards, --max-*, --checkpoint, --resume, --memory-budget, --bloom-error-rate, "
+                "--report-format, --report-compression, --no-sort, --ordering, --priority-rule, --redirects-first, "
+                "--sitemaps, --dedup, --adaptive-concurrency and --retry are not supported with --coordinator, "
+                "limits are set and the report is written on the coordinator.")
+
+        with PageCache(cache_path) if cache_path else nullcontext() as cache:
+            parse_url_remote(
+                url, coordinator, timeout, request_timeout, workers_number, parse_workers, extractor, stream,
+                max_body_bytes, per_host_limit, per_host_rate, adaptive_delay, session_options, pipeline,
+                connection_stats, cache, metrics, metrics_sinks, robots_cache, canonical, scope)
+        return
+
+    if report_format is ReportFormat.NDJSON:
+        report = NdjsonReport(report_path(Path.cwd(), url, report_format, compression), compression)
+    else:
+        report = None
+
+    if shards > 1:
+        extended = prioritized or robots or sitemaps or dedup or concurrency or retries
+        if cache_path or checkpoint or metrics_sinks or extended:
+            raise click.UsageError(
+                "Options --cache, --checkpoint, --resume, --metrics-*, --ordering, --priority-rule, "
+                "--redirects-first, --robots, --sitemaps, --dedup, --adaptive-concurrency and --retry "
+                "are not supported with --shards.")
+
+        with report or nullcontext():
+            found, scanned, reason, elapsed, shard_stats = parse_url_sharded(
+                url, shards, ShardKey(shard_key), timeout, max_scanned, max_found, request_timeout, workers_number,
+                parse_workers, extractor, stream, max_body_bytes, memory_budget, bloom_error_rate, per_host_limit,
+                per_host_rate, adaptive_delay, session_options, pipeline, canonical, scope)
+            stats = {"shards": shard_stats}
 
-    found, scanned, reason, elapsed = parse_url(
-        url, timeout, max_scanned, max_found, request_timeout, workers_number, check_interval)
+            if report is not None:
+                for scanned_url in scanned:
+                    report.record_scanned(scanned_url)
+                report.finish(url, found, scanned, reason, elapsed, stats, sort)
+            else:
+                write_report(Path.cwd(), url, found, scanned, reason, elapsed, stats, compression, sort)
+        return
 
-    found = sorted(str(url) for url in found)
-    scanned = sorted(str(url) for url in scanned)
+    with PageCache(cache_path) if cache_path else nullcontext() as cache, report or nullcontext():
+        found, scanned, reason, elapsed = parse_url(
+            url, timeout, max_scanned, max_found, request_timeout, workers_number, parse_workers,
+            extractor, stream, max_body_bytes, memory_budget, bloom_error_rate, per_host_limit, per_host_rate,
+            adaptive_delay, session_options, pipeline, connection_stats, cache, checkpoint, report, metrics,
+            metrics_sinks, ordering, priority_rules, redirects_first, robots_cache, sitemaps, dedup, canonical, scope,
+            concurrency, retries)
+        stats = {"connections": connection_stats.as_dict(), "metrics": metrics.snapshot()}
+
+        if robots_cache is not None:
+            stats["robots"] = robots_cache.as_dict()
+        if dedup is not None:
+            stats["duplicates"] = dedup.as_dict()
+        if concurrency is not None:
+            stats["concurrency"] = concurrency.as_dict()
+        if retries is not None:
+            stats["retries"] = retries.as_dict()
+
+        if cache is not None:
+            stats["cache"] = {"pages": len(cache), "not_modified": cache.hits}
+
+        if report is not None:
+            report.finish(url, found, scanned, reason, elapsed, stats, sort)
+        else:
+            write_report(Path.cwd(), url, found, scanned, reason, elapsed, stats, compression, sort)
+
+
+async def run_coordinator(
+    coordinator: Coordinator,
+    url: str,
+    host: str,
+    port: int,
+    timeout: float | None,
+) -> web.StopReason:
+    coordinator.put(str(URL(url)))
+    server = await coordinator.serve(host, port)
+
+    async with server:
+        return await coordinator.wait(timeout)
+
+
+@click.command
+@click.argument("url", type=str)
+@click.option("--host",
+              default=DEFAULT_COORDINATOR_HOST,
+              show_default=True,
+              help="Address to listen for nodes.")
+@click.option("--port",
+              type=click.IntRange(min=0, max=65535),
+              default=DEFAULT_COORDINATOR_PORT,
+              show_default=True,
+              help="Port to listen for nodes.")
+@click.option("--timeout", type=float, help="Total timeout for the crawl. All nodes are stopped after it.")
+@click.option("--max-scanned", type=int, help="Limit for scanned urls of all nodes.")
+@click.option("--max-found", type=int, help="Limit for found urls of all nodes.")
+@click.option("--lease-timeout",
+              type=click.FloatRange(min=0, min_open=True),
+              default=DEFAULT_LEASE_TIMEOUT,
+              show_default=True,
+              help="Urls leased by a node are given to other nodes if it is silent for this time (s).")
+@click.option("--report-compression",
+              type=click.Choice([compression.value for compression in Compression]),
+              default=Compression.NONE.value,
+              show_default=True,
+              help="Compression of the report file. 'zstd' requires zstandard package.")
+@click.option("--sort/--no-sort",
+              default=True,
+              show_default=True,
+              help="Sort urls in the report.")
+@click.option("--log-level",
+              type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"], case_sensitive=False),
+              default="INFO",
+              show_default=True,
+              help="Logging level.")
+def coordinate(
+    url: str,
+    host: str,
+    port: int,
+    timeout: float | None,
+    max_scanned: int | None,
+    max_found: int | None,
+    lease_timeout: float,
+    report_compression: str,
+    sort: bool,
+    log_level: str,
+) -> None:
+    """Coordinate crawl of URL by several `parse --coordinator` nodes and save results to json in current directory."""
+
+    setup_logging(log_level)
+    compression = Compression(report_compression)
+
+    if compression is Compression.ZSTD and find_spec("zstandard") is None:
+        raise click.UsageError("Report compression 'zstd' requires zstandard package.")
+
+    coordinator = Coordinator(max_found, max_scanned, lease_timeout)
+    started = time.monotonic()
+    reason = asyncio.run(run_coordinator(coordinator, url, host, port, timeout))
+    elapsed = time.monotonic() - started
 
-    write_report(Path.cwd(), url, found, scanned, reason, elapsed)
+    write_report(Path.cwd(), url, coordinator.found, coordinator.scanned, reason, elapsed, None, compression, sort)
 
 
 if __name__ == "__main__":
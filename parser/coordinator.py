@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from collections import deque
+from typing import Any
+
+from yarl import URL
+
+from parser.frontier import Fingerprints, Frontier
+from parser.web import StopReason, StopScanning
+
+DEFAULT_COORDINATOR_HOST = "127.0.0.1"
+DEFAULT_COORDINATOR_PORT = 7655
+DEFAULT_LEASE_TIMEOUT = 30.0
+DEFAULT_LEASE_BATCH = 64
+DEFAULT_SYNC_INTERVAL = 0.05
+STOP_GRACE = 1.0
+STREAM_LIMIT = 64 * 1024 * 1024
+
+logger = logging.getLogger("parser.coordinator")
+
+
+class Coordinator:
+    """Shared state of a crawl run by several nodes: frontier, seen-set, results, limits and stop reason.
+
+    Nodes talk to it with `sync` requests carrying new urls, scanned and completed urls and asking for new leases.
+    A sync also renews all leases of the node, leases of a node silent for `lease_timeout` seconds
+    are returned to the frontier. Served over TCP as one json object per line.
+    """
+
+    def __init__(
+        self,
+        max_found: int | None = None,
+        max_scanned: int | None = None,
+        lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+    ):
+        self.max_found = max_found
+        self.max_scanned = max_scanned
+        self.lease_timeout = lease_timeout
+        self.found: list[str] = []
+        self.scanned: list[str] = []
+        self.reason: StopReason | None = None
+        self._seen = Fingerprints()
+        self._scanned_seen = Fingerprints()
+        self._pending = deque[str]()
+        self._leases: dict[str, str] = {}
+        self._nodes: dict[str, tuple[float, set[str]]] = {}
+        self._stopped = asyncio.Event()
+
+    def put(self, value: str) -> None:
+        if self.reason is not None or (self.max_found and len(self.found) >= self.max_found):
+            return
+        if not self._seen.add(value):
+            return
+
+        self.found.append(value)
+        self._pending.append(value)
+
+        if self.max_found and len(self.found) >= self.max_found:
+            self.stop(StopReason.FOUND_LIMIT)
+
+    def record_scanned(self, value: str) -> None:
+        if not self._scanned_seen.add(value):
+            return
+
+        self.scanned.append(value)
+
+        if self.max_scanned and len(self.scanned) >= self.max_scanned:
+            self.stop(StopReason.SCANNED_LIMIT)
+
+    def stop(self, reason: StopReason) -> None:
+        if self.reason is None:
+            logger.info("Crawl stopped: %s", reason.value)
+            self.reason = reason
+            self._stopped.set()
+
+    def expire(self, now: float) -> None:
+        for node, (last_seen, leases) in list(self._nodes.items()):
+            if now - last_seen < self.lease_timeout:
+                continue
+
+            logger.warning("Node %s is silent for %.1fs, %d leases are returned", node, now - last_seen, len(leases))
+            del self._nodes[node]
+
+            for value in leases:
+                del self._leases[value]
+                self._pending.appendleft(value)
+
+    def _can_lease(self) -> bool:
+        if self.reason is not None or not self._pending:
+            return False
+        return not self.max_scanned or len(self.scanned) + len(self._leases) < self.max_scanned
+
+    def sync(
+        self,
+        node: str,
+        put: list[str] = (),
+        scanned: list[str] = (),
+        completed: list[str] = (),
+        want: int = 0,
+    ) -> dict[str, Any]:
+        now = time.monotonic()
+        self.expire(now)
+        _, leases = self._nodes.get(node, (now, set()))
+        self._nodes[node] = (now, leases)
+
+        for value in put:
+            self.put(value)
+        for value in scanned:
+            self.record_scanned(value)
+        for value in completed:
+            if value in leases:
+                leases.discard(value)
+                del self._leases[value]
+
+        granted = []
+
+        while len(granted) < want and self._can_lease():
+            value = self._pending.popleft()
+            self._leases[value] = node
+            leases.add(value)
+            granted.append(value)
+
+        if self.found and not self._pending and not self._leases:
+            self.stop(StopReason.ALL_PROCESSED)
+
+        return {"leases": granted, "stop": self.reason.name if self.reason is not None else None}
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "found": len(self.found),
+            "scanned": len(self.scanned),
+            "pending": len(self._pending),
+            "leased": len(self._leases),
+            "nodes": len(self._nodes),
+            "stop": self.reason.name if self.reason is not None else None,
+        }
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.pop("op")
+
+        if op == "sync":
+            return self.sync(**request)
+        if op == "stop":
+            self.stop(StopReason[request["reason"]])
+            return self.status()
+        if op == "status":
+            return self.status()
+        raise ValueError(f"Unknown operation {op!r}")
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    response = self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {"error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError as e:
+            logger.warning("Node connection lost: %s", e)
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_COORDINATOR_HOST, port: int = DEFAULT_COORDINATOR_PORT) -> asyncio.Server:
+        server = await asyncio.start_server(self._serve_connection, host, port, limit=STREAM_LIMIT)
+        logger.info("Coordinator is listening on %s:%d", host, port)
+        return server
+
+    async def wait(self, timeout: float | None = None) -> StopReason:
+        """Wait until the crawl stops, then give nodes time to receive the reason with their next sync."""
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.stop(StopReason.TIMEOUT)
+
+        await asyncio.sleep(STOP_GRACE)
+        return self.reason
+
+    def __repr__(self):
+        return f"<Coordinator found={len(self.found)} scanned={len(self.scanned)} leased={len(self._leases)}>"
+
+
+class RemoteFrontier(Frontier):
+    """Frontier of a node leasing urls from the coordinator.
+
+    New urls, scanned urls (it is a result sink for `parse`) and completed leases are sent with periodic syncs,
+    leased urls are queued locally. `join` waits for the coordinator to stop the crawl.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_COORDINATOR_HOST,
+        port: int = DEFAULT_COORDINATOR_PORT,
+        node: str | None = None,
+        lease_batch: int = DEFAULT_LEASE_BATCH,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+    ):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.node = node or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_batch = lease_batch
+        self.sync_interval = sync_interval
+        self.reason: StopReason | None = None
+        self._put: list[str] = []
+        self._scanned: list[str] = []
+        self._completed: list[str] = []
+        self._in_progress = 0
+        self._closing = False
+        self._stopped = asyncio.Event()
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=STREAM_LIMIT)
+        self._task = asyncio.create_task(self._run(), name=f"sync-{self.node}")
+
+    async def _sync(self, want: int) -> None:
+        request = {
+            "op": "sync",
+            "node": self.node,
+            "put": self._put,
+            "scanned": self._scanned,
+            "completed": self._completed,
+            "want": want,
+        }
+        self._put, self._scanned, self._completed = [], [], []
+        self._writer.write(json.dumps(request).encode() + b"\n")
+        await self._writer.drain()
+        response = json.loads(await self._reader.readline() or b"{}")
+
+        if "leases" not in response:
+            raise ConnectionError(response.get("error", "Coordinator closed connection"))
+
+        for value in response["leases"]:
+            self.pending.append(value)
+        if response["leases"]:
+            self._not_empty.set()
+
+        if response["stop"] is not None:
+            self._stop(StopReason[response["stop"]])
+
+    def _stop(self, reason: StopReason) -> None:
+        if self.reason is None:
+            self.reason = reason
+            self._stopped.set()
+
+    async def _run(self) -> None:
+        try:
+            while self.reason is None and not self._closing:
+                want = max(0, self.lease_batch - len(self.pending) - self._in_progress)
+                await self._sync(want)
+                await asyncio.sleep(self.sync_interval)
+        except (ConnectionError, json.JSONDecodeError) as e:
+            logger.error("Lost connection to coordinator: %s", e)
+            self._stop(StopReason.RUNTIME_ERROR)
+
+    def get_nowait(self) -> URL:
+        url = super().get_nowait()
+        self._in_progress += 1
+        return url
+
+    def put_nowait(self, item: URL, source: URL | None = None, redirect: bool = False) -> None:
+        value = str(item)
+        if self.seen.add(value):
+            self._put.append(value)
+
+    def complete(self, item: URL) -> None:
+        self._completed.append(str(item))
+
+    def task_done(self) -> None:
+        self._in_progress -= 1
+
+    def record_found(self, url: URL) -> None:
+        pass
+
+    def record_scanned(self, url: URL) -> None:
+        self._scanned.append(str(url))
+
+    async def join(self) -> None:
+        await self._stopped.wait()
+        if self.reason is not StopReason.ALL_PROCESSED:
+            raise StopScanning(self.reason)
+
+    async def aclose(self) -> None:
+        """Send the last results and disconnect."""
+        self._closing = True
+
+        if self._task is not None:
+            # Not cancelled: a request interrupted before its response is read would desync the connection
+            await self._task
+
+        if self._writer is not None:
+            try:
+                await self._sync(want=0)
+            except (ConnectionError, json.JSONDecodeError) as e:
+                logger.error("Cannot send last results to coordinator: %s", e)
+            self._writer.close()
+
+        self.close()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    def __repr__(self):
+        return f"<RemoteFrontier {self.node} {self.host}:{self.port} size={self.qsize()}>"
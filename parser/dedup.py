@@ -0,0 +1,128 @@
+import logging
+import re
+from enum import Enum
+from hashlib import blake2b
+from typing import Any
+
+from yarl import URL
+
+DEFAULT_MAX_DISTANCE = 3
+SHINGLE_SIZE = 3
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+MAX_SIMHASH_BYTES = 1024 * 1024
+TAG_PATTERN = re.compile(rb"<(script|style)\b.*?</\1\s*>|<[^>]*>", re.IGNORECASE | re.DOTALL)
+WORD_PATTERN = re.compile(r"\w+")
+
+logger = logging.getLogger("parser.dedup")
+
+
+class DedupMode(Enum):
+    EXACT = "exact"
+    NEAR = "near"
+
+
+def page_words(body: bytes) -> list[str]:
+    """Lowercase words of the page text without tags, scripts and styles."""
+    text = TAG_PATTERN.sub(b" ", body).decode("utf-8", errors="ignore")
+    return WORD_PATTERN.findall(text.lower())
+
+
+def simhash(words: list[str], shingle_size: int = SHINGLE_SIZE) -> int:
+    """64-bit SimHash of word shingles: similar texts get fingerprints differing in few bits."""
+    weights = [0] * SIMHASH_BITS
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))}
+
+    for shingle in shingles:
+        value = int.from_bytes(blake2b(shingle.encode(), digest_size=8).digest())
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BodyBuffer:
+    """Digest-like sink keeping the beginning of a streamed body for SimHash."""
+
+    def __init__(self, limit: int = MAX_SIMHASH_BYTES):
+        self.limit = limit
+        self.data = bytearray()
+
+    def update(self, chunk: bytes) -> None:
+        if len(self.data) < self.limit:
+            self.data += chunk[:self.limit - len(self.data)]
+
+
+class Deduplicator:
+    """Detector of pages served under several urls.
+
+    Every page is looked up by the hash of its body. In NEAR mode pages with SimHash differing
+    in at most `max_distance` bits are duplicates too: fingerprints are split into bands and indexed by each,
+    so with `max_distance` below the number of bands a near duplicate shares a band value with the original.
+    Duplicates are grouped into clusters by the first url seen with the content.
+    """
+
+    def __init__(self, mode: DedupMode = DedupMode.EXACT, max_distance: int = DEFAULT_MAX_DISTANCE):
+        if mode is DedupMode.NEAR and max_distance >= SIMHASH_BANDS:
+            raise ValueError(f"Max distance must be less than {SIMHASH_BANDS}")
+
+        self.mode = mode
+        self.max_distance = max_distance
+        self.pages = 0
+        self.clusters: dict[str, list[str]] = {}
+        self._hashes: dict[str, str] = {}
+        self._bands: list[dict[int, list[tuple[int, str]]]] = [{} for _ in range(SIMHASH_BANDS)]
+
+    def _bands_of(self, fingerprint: int) -> list[int]:
+        width = SIMHASH_BITS // SIMHASH_BANDS
+        return [fingerprint >> (width * i) & ((1 << width) - 1) for i in range(SIMHASH_BANDS)]
+
+    def _find_near(self, fingerprint: int) -> str | None:
+        for index, band in zip(self._bands, self._bands_of(fingerprint)):
+            for candidate, original in index.get(band, ()):
+                if hamming_distance(candidate, fingerprint) <= self.max_distance:
+                    return original
+        return None
+
+    def check(self, url: URL, content_hash: str, body: bytes | None = None) -> str | None:
+        """Return url of the page with the same content or remember the page and return None.
+
+        Without `body` only exact duplicates are detected.
+        """
+        self.pages += 1
+        original = self._hashes.get(content_hash)
+
+        if original is None and self.mode is DedupMode.NEAR and body is not None:
+            fingerprint = simhash(page_words(body[:MAX_SIMHASH_BYTES]))
+            original = self._find_near(fingerprint)
+
+            if original is None:
+                for index, band in zip(self._bands, self._bands_of(fingerprint)):
+                    index.setdefault(band, []).append((fingerprint, str(url)))
+
+        if original is None:
+            self._hashes[content_hash] = str(url)
+            return None
+
+        self._hashes.setdefault(content_hash, original)
+        self.clusters.setdefault(original, []).append(str(url))
+        return original
+
+    @property
+    def duplicates(self) -> int:
+        return sum(len(cluster) for cluster in self.clusters.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "mode": self.mode.value,
+            "pages": self.pages,
+            "duplicates": self.duplicates,
+            "clusters": {original: sorted(cluster) for original, cluster in sorted(self.clusters.items())},
+        }
+
+    def __repr__(self):
+        return f"<Deduplicator {self.mode.value} duplicates={self.duplicates}>"
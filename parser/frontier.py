@@ -0,0 +1,386 @@
+import asyncio
+import heapq
+import logging
+import math
+import re
+import tempfile
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from hashlib import blake2b
+from typing import Iterable, Protocol
+
+from yarl import URL
+
+DEFAULT_BLOOM_CAPACITY = 1_000_000
+AVERAGE_URL_SIZE = 128
+REDIRECT_PRIORITY = -(2 ** 31)
+
+logger = logging.getLogger("parser.frontier")
+
+
+def fingerprint(value: str) -> int:
+    """Stable 64-bit fingerprint of the string."""
+    return int.from_bytes(blake2b(value.encode(), digest_size=8).digest())
+
+
+class SeenSet(Protocol):
+    def add(self, value: str) -> bool:
+        """Add value and return True if it has not been seen before."""
+
+    def __contains__(self, value: str) -> bool: ...
+
+    def __len__(self) -> int: ...
+
+
+class Fingerprints:
+    """Exact seen-set keeping 64-bit fingerprints instead of the values."""
+
+    def __init__(self):
+        self._values = set[int]()
+
+    def add(self, value: str) -> bool:
+        key = fingerprint(value)
+        if key in self._values:
+            return False
+        self._values.add(key)
+        return True
+
+    def __contains__(self, value: str) -> bool:
+        return fingerprint(value) in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self):
+        return f"<Fingerprints size={len(self)}>"
+
+
+class BloomFilter:
+    """Probabilistic seen-set with fixed memory usage.
+
+    False positive means that a new url is considered seen and will not be scanned.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        if not 0 < error_rate < 1:
+            raise ValueError(f"Error rate must be between 0 and 1, got {error_rate}")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray(math.ceil(self.size / 8))
+        self._count = 0
+
+    @classmethod
+    def from_memory(cls, memory: int, error_rate: float):
+        """Create filter with the largest capacity fitting to the given number of bytes."""
+        capacity = max(1, int(memory * 8 * math.log(2) ** 2 / -math.log(error_rate)))
+        return cls(capacity, error_rate)
+
+    def _positions(self, value: str) -> list[int]:
+        digest = blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8])
+        second = int.from_bytes(digest[8:]) | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value: str) -> bool:
+        new = False
+
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                new = True
+
+        if new:
+            self._count += 1
+        return new
+
+    def __contains__(self, value: str) -> bool:
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __repr__(self):
+        return f"<BloomFilter size={len(self)} capacity={self.capacity} error_rate={self.error_rate}>"
+
+
+def create_seen(memory_budget: int | None, error_rate: float | None) -> tuple[SeenSet, int | None]:
+    """Create seen-set for the memory budget and return it with the rest of the budget."""
+    if error_rate is None:
+        return Fingerprints(), memory_budget
+    if memory_budget is None:
+        return BloomFilter(DEFAULT_BLOOM_CAPACITY, error_rate), None
+    return BloomFilter.from_memory(memory_budget // 2, error_rate), memory_budget - memory_budget // 2
+
+
+class SpillQueue:
+    """FIFO of strings keeping at most `memory_items` in memory and the rest in a temporary file."""
+
+    def __init__(self, memory_items: int | None = None):
+        self.memory_items = memory_items
+        self._memory = deque[str]()
+        self._file = None
+        self._read_offset = 0
+        self._spilled = 0
+
+    def append(self, value: str) -> None:
+        if self.memory_items is None or (not self._spilled and len(self._memory) < self.memory_items):
+            self._memory.append(value)
+            return
+
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+            logger.info("Pending queue exceeded %d items and is spilled to disk", self.memory_items)
+
+        self._file.seek(0, 2)
+        self._file.write(value.encode() + b"\n")
+        self._spilled += 1
+
+    def popleft(self) -> str:
+        if not self._memory and self._spilled:
+            self._load()
+        return self._memory.popleft()
+
+    def _load(self) -> None:
+        self._file.flush()
+        self._file.seek(self._read_offset)
+
+        for _ in range(min(self._spilled, self.memory_items)):
+            line = self._file.readline()
+            self._memory.append(line[:-1].decode())
+            self._spilled -= 1
+
+        self._read_offset = self._file.tell()
+
+        if not self._spilled:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_offset = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self._memory) + self._spilled
+
+
+class Frontier:
+    """Queue of unique urls storing them compactly.
+
+    Urls are deduplicated on put, join waits for all of them to be processed.
+    """
+
+    def __init__(self, seen: SeenSet | None = None, pending: SpillQueue | None = None):
+        self.seen = seen if seen is not None else Fingerprints()
+        self.pending = pending if pending is not None else SpillQueue()
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._not_empty = asyncio.Event()
+
+    @classmethod
+    def create(cls, memory_budget: int | None = None, error_rate: float | None = None):
+        """Create frontier fitting to the memory budget (bytes).
+
+        A half of the budget is given to the seen-set if it is a Bloom filter (`error_rate` is set),
+        the rest is used for pending urls kept in memory.
+        """
+        seen, memory_budget = create_seen(memory_budget, error_rate)
+        memory_items = None if memory_budget is None else max(1, memory_budget // AVERAGE_URL_SIZE)
+        return cls(seen, SpillQueue(memory_items))
+
+    async def get(self) -> URL:
+        while not self.pending:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def get_nowait(self) -> URL:
+        if not self.pending:
+            raise asyncio.QueueEmpty
+        return URL(self.pending.popleft(), encoded=True)
+
+    def put_nowait(self, item: URL, source: URL | None = None, redirect: bool = False) -> None:
+        """Queue unseen url. `source` is the page it was found on, `redirect` tells it came from Location header."""
+        value = str(item)
+        if self.seen.add(value):
+            self.pending.append(value)
+            self._unfinished += 1
+            self._finished.clear()
+            self._not_empty.set()
+
+    def mark_seen(self, item: URL) -> None:
+        """Remember the url as already processed without queueing it."""
+        self.seen.add(str(item))
+
+    def complete(self, item: URL) -> None:
+        """Called when processing of the url is finished, right before `task_done`."""
+
+    def task_done(self) -> None:
+        if self._unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._finished.set()
+
+    async def join(self) -> None:
+        await self._finished.wait()
+
+    def qsize(self) -> int:
+        return len(self.pending)
+
+    def close(self) -> None:
+        self.pending.close()
+
+    def __repr__(self):
+        return f"<Frontier size={self.qsize()} seen={len(self.seen)}>"
+
+
+class Ordering(Enum):
+    FIFO = "fifo"
+    DEPTH = "depth"
+    PATH_LENGTH = "path-length"
+
+
+@dataclass(frozen=True, slots=True)
+class PriorityRule:
+    """Urls matching the pattern get `priority` added to their base priority, lower goes first."""
+
+    pattern: re.Pattern
+    priority: int
+
+    @classmethod
+    def parse(cls, value: str) -> "PriorityRule":
+        """Create rule from 'PATTERN=PRIORITY' string."""
+        pattern, separator, priority = value.rpartition("=")
+        if not separator or not pattern:
+            raise ValueError(f"Expected PATTERN=PRIORITY, got {value!r}")
+        return cls(re.compile(pattern), int(priority))
+
+
+class BucketQueue:
+    """Priority queue of FIFO buckets, one per distinct integer priority.
+
+    Crawl priorities take few distinct values, so pushing and popping cost O(1) amortized
+    plus O(log buckets) for creating and dropping a bucket.
+    """
+
+    def __init__(self):
+        self._buckets: dict[int, deque[tuple[str, int]]] = {}
+        self._priorities: list[int] = []
+        self._size = 0
+
+    def append(self, value: str, priority: int = 0, depth: int = 0) -> None:
+        if (bucket := self._buckets.get(priority)) is None:
+            bucket = self._buckets[priority] = deque()
+            heapq.heappush(self._priorities, priority)
+        bucket.append((value, depth))
+        self._size += 1
+
+    def popleft(self) -> tuple[str, int]:
+        """Return the oldest url of the lowest priority and its depth."""
+        priority = self._priorities[0]
+        bucket = self._buckets[priority]
+        entry = bucket.popleft()
+
+        if not bucket:
+            heapq.heappop(self._priorities)
+            del self._buckets[priority]
+
+        self._size -= 1
+        return entry
+
+    def close(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class PriorityFrontier(Frontier):
+    """Frontier giving out urls by priority instead of the discovery order.
+
+    Base priority is the number of links from the start page (DEPTH), the number of path segments
+    (PATH_LENGTH) or zero (FIFO), the first matching rule is added to it. Redirects keep the depth
+    of their source and with `redirects_first` go before any other url.
+    Depth of urls being processed is kept until `complete`, so links found on them get the next depth.
+    """
+
+    def __init__(
+        self,
+        seen: SeenSet | None = None,
+        ordering: Ordering = Ordering.DEPTH,
+        rules: Iterable[PriorityRule] = (),
+        redirects_first: bool = False,
+    ):
+        super().__init__(seen, BucketQueue())
+        self.ordering = ordering
+        self.rules = tuple(rules)
+        self.redirects_first = redirects_first
+        self._depths: dict[str, int] = {}
+
+    @classmethod
+    def create(
+        cls,
+        memory_budget: int | None = None,
+        error_rate: float | None = None,
+        ordering: Ordering = Ordering.DEPTH,
+        rules: Iterable[PriorityRule] = (),
+        redirects_first: bool = False,
+    ):
+        """Create frontier with seen-set fitting to the memory budget. Pending urls are always kept in memory."""
+        seen, _ = create_seen(memory_budget, error_rate)
+        return cls(seen, ordering, rules, redirects_first)
+
+    def priority(self, item: URL, depth: int) -> int:
+        if self.ordering is Ordering.DEPTH:
+            priority = depth
+        elif self.ordering is Ordering.PATH_LENGTH:
+            priority = sum(1 for part in item.raw_parts[1:] if part)
+        else:
+            priority = 0
+
+        value = str(item)
+        for rule in self.rules:
+            if rule.pattern.search(value):
+                return priority + rule.priority
+        return priority
+
+    def get_nowait(self) -> URL:
+        if not self.pending:
+            raise asyncio.QueueEmpty
+        value, depth = self.pending.popleft()
+        self._depths[value] = depth
+        return URL(value, encoded=True)
+
+    def put_nowait(self, item: URL, source: URL | None = None, redirect: bool = False) -> None:
+        value = str(item)
+        if not self.seen.add(value):
+            return
+
+        depth = self._depths.get(str(source), -1) if source is not None else -1
+        if not redirect:
+            depth += 1
+        depth = max(depth, 0)
+
+        priority = REDIRECT_PRIORITY if redirect and self.redirects_first else self.priority(item, depth)
+        self.pending.append(value, priority, depth)
+        self._unfinished += 1
+        self._finished.clear()
+        self._not_empty.set()
+
+    def complete(self, item: URL) -> None:
+        self._depths.pop(str(item), None)
+
+    def __repr__(self):
+        return f"<PriorityFrontier {self.ordering.value} size={self.qsize()} seen={len(self.seen)}>"
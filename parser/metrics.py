@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from enum import Enum
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Protocol, TextIO
+
+from aiohttp import ClientSession, TraceConfig, web
+
+DEFAULT_METRICS_INTERVAL = 10.0
+DEFAULT_METRICS_HOST = "127.0.0.1"
+BUCKETS = tuple(0.0005 * 2 ** i for i in range(18))
+
+logger = logging.getLogger("parser.metrics")
+
+
+class Stage(Enum):
+    DNS = "dns"
+    CONNECT = "connect"
+    TTFB = "ttfb"
+    DOWNLOAD = "download"
+    PARSE = "parse"
+    NORMALIZE = "normalize"
+
+
+class Histogram:
+    """Latency histogram with fixed exponential buckets from 0.5 ms to about a minute (s)."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket containing the quantile, the maximum for the overflow bucket."""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p90": round(self.quantile(0.9), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "max": round(self.max, 6),
+        }
+
+
+class CrawlMetrics:
+    """Live counters and per-stage latency histograms of the crawl.
+
+    Network stages are measured by aiohttp tracing (`trace_config`), the rest are observed by workers.
+    `queue_size` is set by the parser to read the frontier depth, `stage_queues` to read the number of pages
+    waiting for each pipeline stage and `concurrency_limit` to read the limit of the adaptive concurrency.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = {stage: Histogram() for stage in Stage}
+        self.statuses = Counter[int]()
+        self.pages = 0
+        self.bytes = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.queue_size: Callable[[], int] = lambda: 0
+        self.stage_queues: dict[str, Callable[[], int]] = {}
+        self.concurrency_limit: Callable[[], int | None] = lambda: None
+
+    def observe(self, stage: Stage, value: float) -> None:
+        self.stages[stage].observe(value)
+
+    def trace_config(self) -> TraceConfig:
+        config = TraceConfig()
+        config.on_dns_resolvehost_start.append(self._on_dns_resolvehost_start)
+        config.on_dns_resolvehost_end.append(self._on_dns_resolvehost_end)
+        config.on_connection_create_start.append(self._on_connection_create_start)
+        config.on_connection_create_end.append(self._on_connection_create_end)
+        config.on_request_start.append(self._on_request_start)
+        config.on_request_end.append(self._on_request_end)
+        return config
+
+    async def _on_dns_resolvehost_start(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        context.dns_started = time.monotonic()
+
+    async def _on_dns_resolvehost_end(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.observe(Stage.DNS, time.monotonic() - context.dns_started)
+
+    async def _on_connection_create_start(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        context.connect_started = time.monotonic()
+
+    async def _on_connection_create_end(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.observe(Stage.CONNECT, time.monotonic() - context.connect_started)
+
+    async def _on_request_start(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        context.request_started = time.monotonic()
+
+    async def _on_request_end(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.observe(Stage.TTFB, time.monotonic() - context.request_started)
+
+    def snapshot(self) -> dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            "elapsed": round(elapsed, 3),
+            "pages": self.pages,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "pages_per_second": round(self.pages / elapsed, 3),
+            "bytes_per_second": round(self.bytes / elapsed, 3),
+            "in_flight": self.in_flight,
+            "queue_size": self.queue_size(),
+            "stage_queues": {stage: size() for stage, size in self.stage_queues.items()},
+            "concurrency_limit": self.concurrency_limit(),
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "stages": {stage.value: histogram.as_dict() for stage, histogram in self.stages.items()},
+        }
+
+    def summary(self) -> str:
+        """One line for the log: throughput, concurrency and median stage latencies (ms)."""
+        stages = " ".join(
+            f"{stage.value}={histogram.quantile(0.5) * 1000:.1f}"
+            for stage, histogram in self.stages.items() if histogram.count
+        )
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        limit = self.concurrency_limit()
+        in_flight = f"{self.in_flight}" if limit is None else f"{self.in_flight}/{limit}"
+        return (
+            f"pages={self.pages} pages/s={self.pages / elapsed:.1f} KiB/s={self.bytes / elapsed / 1024:.1f} "
+            f"in_flight={in_flight} queue={self.queue_size()} errors={self.errors} p50_ms[{stages}]"
+        )
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# TYPE parser_pages_total counter",
+            f"parser_pages_total {self.pages}",
+            "# TYPE parser_bytes_total counter",
+            f"parser_bytes_total {self.bytes}",
+            "# TYPE parser_errors_total counter",
+            f"parser_errors_total {self.errors}",
+            "# TYPE parser_in_flight gauge",
+            f"parser_in_flight {self.in_flight}",
+            "# TYPE parser_queue_size gauge",
+            f"parser_queue_size {self.queue_size()}",
+            "# TYPE parser_stage_queue_size gauge",
+            *(f'parser_stage_queue_size{{stage="{stage}"}} {size()}' for stage, size in self.stage_queues.items()),
+            "# TYPE parser_responses_total counter",
+            *(f'parser_responses_total{{status="{status}"}} {count}' for status, count in sorted(self.statuses.items())),
+            "# TYPE parser_stage_seconds histogram",
+        ]
+
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'parser_stage_seconds_bucket{{stage="{stage.value}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'parser_stage_seconds_bucket{{stage="{stage.value}",le="+Inf"}} {histogram.count}')
+            lines.append(f'parser_stage_seconds_sum{{stage="{stage.value}"}} {histogram.sum}')
+            lines.append(f'parser_stage_seconds_count{{stage="{stage.value}"}} {histogram.count}')
+
+        if (limit := self.concurrency_limit()) is not None:
+            lines.append("# TYPE parser_concurrency_limit gauge")
+            lines.append(f"parser_concurrency_limit {limit}")
+
+        return "\n".join(lines) + "\n"
+
+    def __repr__(self):
+        return f"<CrawlMetrics pages={self.pages} in_flight={self.in_flight}>"
+
+
+class MetricsSink(Protocol):
+    async def run(self, metrics: CrawlMetrics) -> None:
+        """Publish metrics until cancelled."""
+
+
+class StderrSink:
+    """Periodic one-line summary written to stderr."""
+
+    def __init__(self, interval: float = DEFAULT_METRICS_INTERVAL, stream: TextIO | None = None):
+        self.interval = interval
+        self.stream = stream
+
+    async def run(self, metrics: CrawlMetrics) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            print(metrics.summary(), file=self.stream or sys.stderr, flush=True)
+
+
+class JsonFileSink:
+    """Snapshot replaced atomically every `interval` seconds and once more when the crawl stops."""
+
+    def __init__(self, path: str | Path, interval: float = DEFAULT_METRICS_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+
+    def write(self, metrics: CrawlMetrics) -> None:
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(json.dumps(metrics.snapshot(), indent=4))
+        os.replace(temporary, self.path)
+
+    async def run(self, metrics: CrawlMetrics) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                self.write(metrics)
+        finally:
+            self.write(metrics)
+
+
+class PrometheusSink:
+    """Local HTTP endpoint serving metrics in Prometheus text format on `/metrics`."""
+
+    def __init__(self, port: int, host: str = DEFAULT_METRICS_HOST):
+        self.port = port
+        self.host = host
+
+    async def run(self, metrics: CrawlMetrics) -> None:
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(text=metrics.to_prometheus(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+            logger.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
@@ -1,10 +1,29 @@
 import asyncio
+import codecs
 import logging
+import re
+import time
+from concurrent.futures import Executor
+from enum import Enum
+from functools import lru_cache
 from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Iterable
 
 from bs4 import BeautifulSoup
+from lxml import etree
 from yarl import URL
 
+from parser.canonical import Canonicalizer
+from parser.metrics import CrawlMetrics, Stage
+from parser.scope import Scope
+
+SCHEMES = ("http", "https")
+SUFFIXES = (".htm", ".html")
+SCHEME_PATTERN = re.compile(r"([a-zA-Z][a-zA-Z0-9+.-]*):")
+HOST_CACHE_SIZE = 4096
+NORMALIZE_BATCH_SIZE = 256
+NORMALIZE_BATCH_TIME = 0.0005
+
 logger = logging.getLogger("parser.pages")
 
 
@@ -22,6 +41,10 @@ class Host:
     def __contains__(self, other: "Host"):
         return self.parts[: len(other.parts)] == other.parts
 
+    def includes(self, host: str) -> bool:
+        """Check if the host is this one or its subdomain, like `Scope.includes`."""
+        return self in get_host(host)
+
     def __str__(self):
         return ".".join(reversed(self.parts))
 
@@ -29,29 +52,152 @@ class Host:
         return f"Host({self})"
 
 
-def search_for_urls(html: str) -> set[str]:
+@lru_cache(maxsize=HOST_CACHE_SIZE)
+def get_host(host: str, top_level: bool = False) -> Host:
+    """Memoized Host constructor. Returned instances must not be mutated."""
+    return Host(host, top_level)
+
+
+class Extractor(Enum):
+    LXML = "lxml"
+    SOUP = "soup"
+
+
+class LinkCollector:
+    """Target for lxml parser collecting hrefs without building a tree."""
+
+    def __init__(self):
+        self.urls = set()
+        self.pending = []
+
+    def start(self, tag: str, attrib: dict[str, str]) -> None:
+        if tag == "a" and (href := attrib.get("href")) is not None and href not in self.urls:
+            self.urls.add(href)
+            self.pending.append(href)
+
+    def take_pending(self) -> list[str]:
+        pending, self.pending = self.pending, []
+        return pending
+
+    def close(self) -> set[str]:
+        return self.urls
+
+
+class LinkStream:
+    """Incremental link extractor fed with chunks of a page."""
+
+    def __init__(self, encoding: str | None = None):
+        if encoding is not None:
+            try:
+                codecs.lookup(encoding)
+            except LookupError:
+                logger.debug("Unknown encoding %r, it is detected by the page", encoding)
+                encoding = None
+
+        self._collector = LinkCollector()
+        self._parser = etree.HTMLParser(target=self._collector, encoding=encoding)
+
+    def feed(self, chunk: bytes) -> list[str]:
+        """Return hrefs which appeared after the previous chunk."""
+        self._parser.feed(chunk)
+        return self._collector.take_pending()
+
+    def close(self) -> list[str]:
+        try:
+            self._parser.close()
+        except etree.LxmlError as e:
+            logger.debug("Cannot finish parsing: %s", e)
+        return self._collector.take_pending()
+
+
+def search_with_soup(html: str) -> set[str]:
     soup = BeautifulSoup(html, "lxml")
     tags = soup.find_all("a", href=True)
-    raw_urls = set(link["href"] for link in tags)
+    return set(link["href"] for link in tags)
+
+
+def search_with_lxml(html: str) -> set[str]:
+    parser = etree.HTMLParser(target=LinkCollector())
+    parser.feed(html)
+    return parser.close()
+
+
+def search_for_urls(html: str, extractor: Extractor = Extractor.LXML) -> set[str]:
+    if extractor is Extractor.LXML:
+        try:
+            raw_urls = search_with_lxml(html)
+        except etree.LxmlError as e:
+            logger.debug("Fallback to soup: %s", e)
+            raw_urls = search_with_soup(html)
+    else:
+        raw_urls = search_with_soup(html)
+
     logger.debug("Found raw urls: %d", len(raw_urls))
     return raw_urls
 
 
-def normalize_url(base: URL, base_host: Host, raw_url: str) -> URL | None:
+def reject_reason(raw_url: str) -> str | None:
+    """Check scheme and extension of the url without constructing URL object.
+
+    Only cases which URL would reject too are detected, so None doesn't mean the url is valid.
+    """
+    path = raw_url
+
+    if match := SCHEME_PATTERN.match(raw_url):
+        scheme = match[1].lower()
+        if scheme not in SCHEMES:
+            return f"unsupported scheme '{scheme}'"
+        path = raw_url[match.end():]
+
+    if path.startswith("//"):
+        _, slash, path = path[2:].partition("/")
+        if not slash:
+            return None
+
+    name = path.rpartition("/")[2]
+    if "%" in name:
+        return None
+
+    dot = name.rfind(".")
+    if 0 < dot < len(name) - 1 and (suffix := name[dot:]) not in SUFFIXES:
+        return f"not a web page with extension '{suffix}'"
+
+    return None
+
+
+def normalize_url(
+    base: URL,
+    base_host: Host | Scope,
+    raw_url: str,
+    canonicalizer: Canonicalizer | None = None,
+) -> URL | None:
     raw_url = raw_url.strip(" \n")
     logger.debug("Raw: %s", raw_url)
-    url = URL(raw_url).with_fragment(None).with_query(None)
+    raw_url = raw_url.partition("#")[0]
+
+    if canonicalizer is None or not canonicalizer.keeps_query:
+        raw_url = raw_url.partition("?")[0]
+        reason = reject_reason(raw_url)
+    else:
+        reason = reject_reason(raw_url.partition("?")[0])
 
-    if url.scheme and url.scheme not in ("http", "https"):
+    if reason:
+        logger.debug("Skip: %s", reason)
+        return None
+
+    url = URL(raw_url)
+
+    if url.scheme and url.scheme not in SCHEMES:
         logger.debug("Skip: unsupported scheme '%s'", url.scheme)
         return None
 
-    if url.suffix and url.suffix not in (".htm", ".html"):
+    if url.suffix and url.suffix not in SUFFIXES:
         logger.debug("Skip: not a web page with extension '%s'", url.suffix)
         return None
 
     if url.is_absolute():
-        if base_host not in (host := Host(url.host)):
+        host = url.host if canonicalizer is None else canonicalizer.host(url.host)
+        if not base_host.includes(host):
             logger.debug("Skip: host '%s' not belongs to base '%s'", host, base_host)
             return None
         if not url.scheme:
@@ -59,18 +205,102 @@ def normalize_url(base: URL, base_host: Host, raw_url: str) -> URL | None:
     else:
         url = base.join(url)
 
+    if canonicalizer is not None:
+        url = canonicalizer.canonicalize(url)
+
     logger.debug("Clean: %s", url)
     return url
 
 
-async def scan_page(base: URL, base_host: Host, html: str) -> set[URL]:
-    raw_urls = search_for_urls(html)
-    await asyncio.sleep(0)
+async def normalize_urls(
+    base: URL,
+    base_host: Host | Scope,
+    raw_urls: Iterable[str],
+    batch_size: int = NORMALIZE_BATCH_SIZE,
+    batch_time: float = NORMALIZE_BATCH_TIME,
+    canonicalizer: Canonicalizer | None = None,
+) -> set[URL]:
+    """Normalize urls yielding to the event loop every `batch_size` urls or `batch_time` seconds."""
     clean_urls = set()
+    deadline = time.perf_counter() + batch_time
 
-    for raw_url in raw_urls:
-        if url := normalize_url(base, base_host, raw_url):
+    for i, raw_url in enumerate(raw_urls, 1):
+        if url := normalize_url(base, base_host, raw_url, canonicalizer):
             clean_urls.add(url)
-        await asyncio.sleep(0)
+
+        if i % batch_size == 0 or time.perf_counter() >= deadline:
+            await asyncio.sleep(0)
+            deadline = time.perf_counter() + batch_time
 
     return clean_urls
+
+
+async def scan_page(
+    base: URL,
+    base_host: Host | Scope,
+    html: str,
+    executor: Executor | None = None,
+    extractor: Extractor = Extractor.LXML,
+    metrics: CrawlMetrics | None = None,
+    canonicalizer: Canonicalizer | None = None,
+) -> set[URL]:
+    started = time.perf_counter()
+
+    if executor is None:
+        raw_urls = search_for_urls(html, extractor)
+        await asyncio.sleep(0)
+    else:
+        loop = asyncio.get_running_loop()
+        raw_urls = await loop.run_in_executor(executor, search_for_urls, html, extractor)
+
+    if metrics is None:
+        return await normalize_urls(base, base_host, raw_urls, canonicalizer=canonicalizer)
+
+    parsed = time.perf_counter()
+    metrics.observe(Stage.PARSE, parsed - started)
+    urls = await normalize_urls(base, base_host, raw_urls, canonicalizer=canonicalizer)
+    metrics.observe(Stage.NORMALIZE, time.perf_counter() - parsed)
+    return urls
+
+
+async def scan_stream(
+    base: URL,
+    base_host: Host | Scope,
+    chunks: AsyncIterable[bytes],
+    encoding: str | None = None,
+    max_bytes: int | None = None,
+    metrics: CrawlMetrics | None = None,
+    canonicalizer: Canonicalizer | None = None,
+) -> AsyncIterator[set[URL]]:
+    """Yield links found in every chunk while the page is still being downloaded.
+
+    Parse and normalize time of all chunks is summed up and observed once per page.
+    """
+    stream = LinkStream(encoding)
+    received = 0
+    timings = {Stage.PARSE: 0.0, Stage.NORMALIZE: 0.0}
+
+    def scan(chunk: bytes | None) -> set[URL]:
+        started = time.perf_counter()
+        raw_urls = stream.close() if chunk is None else stream.feed(chunk)
+        parsed = time.perf_counter()
+        urls = {url for raw_url in raw_urls if (url := normalize_url(base, base_host, raw_url, canonicalizer))}
+        timings[Stage.PARSE] += parsed - started
+        timings[Stage.NORMALIZE] += time.perf_counter() - parsed
+        return urls
+
+    async for chunk in chunks:
+        if max_bytes is not None and received + len(chunk) > max_bytes:
+            chunk = chunk[: max_bytes - received]
+            logger.debug("Body is cut off after %d bytes: %s", max_bytes, base)
+            yield scan(chunk)
+            break
+
+        received += len(chunk)
+        yield scan(chunk)
+
+    yield scan(None)
+
+    if metrics is not None:
+        for stage, value in timings.items():
+            metrics.observe(stage, value)
@@ -1,33 +1,161 @@
+import gzip
 import json
 from datetime import datetime
+from enum import Enum
 from pathlib import Path
-from typing import Sequence
+from typing import TYPE_CHECKING, Any, Collection, Iterable, Iterator, TextIO
 
 from yarl import URL
 
-from parser.web import StopReason
+if TYPE_CHECKING:
+    from parser.web import StopReason
 
+INDENT = " " * 4
 
-def write_report(
-    path: Path,
+
+class ReportFormat(Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+    @property
+    def suffix(self) -> str:
+        return "." + self.value
+
+
+class Compression(Enum):
+    NONE = "none"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+    @property
+    def suffix(self) -> str:
+        return {Compression.NONE: "", Compression.GZIP: ".gz", Compression.ZSTD: ".zst"}[self]
+
+
+def open_text(path: Path, compression: Compression = Compression.NONE) -> TextIO:
+    if compression is Compression.GZIP:
+        return gzip.open(path, "wt", encoding="utf-8")
+    if compression is Compression.ZSTD:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("zstd compression requires 'zstandard' package") from e
+        return zstandard.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def report_path(
+    directory: Path,
     start_url: str,
-    found: Sequence[str],
-    scanned: Sequence[str],
-    reason: StopReason,
-    elapsed: float,
-) -> None:
+    report_format: ReportFormat = ReportFormat.JSON,
+    compression: Compression = Compression.NONE,
+) -> Path:
     date = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
-    filename = f"{URL(start_url).host} {date}.json"
+    return directory / f"{URL(start_url).host} {date}{report_format.suffix}{compression.suffix}"
+
+
+def iter_urls(urls: Iterable[URL | str], sort: bool) -> Iterator[str]:
+    """Stringify urls one by one. Sorting needs a single list of strings."""
+    if sort:
+        return iter(sorted(str(url) for url in urls))
+    return (str(url) for url in urls)
+
 
-    report = {
+def summary(
+    start_url: str,
+    found: Collection,
+    scanned: Collection,
+    reason: "StopReason",
+    elapsed: float,
+    stats: dict[str, Any] | None,
+) -> dict[str, Any]:
+    return {
         "start_url": start_url,
         "total_scanned": len(scanned),
         "total_found": len(found),
         "elapsed_time": round(elapsed, 2),
         "stop_reason": reason.name,
-        "scanned": scanned,
-        "found": found,
+        **({"stats": stats} if stats else {}),
     }
 
-    with open(path / filename, "w") as file:
-        json.dump(report, file, indent=4)
+
+def write_array(file: TextIO, key: str, values: Iterable[str]) -> None:
+    """Write array member of the top level object one item at a time in the layout of `json.dump(indent=4)`."""
+    file.write(f"{INDENT}{json.dumps(key)}: [")
+    separator = "\n"
+
+    for value in values:
+        file.write(f"{separator}{INDENT * 2}{json.dumps(value)}")
+        separator = ",\n"
+
+    file.write("]" if separator == "\n" else f"\n{INDENT}]")
+
+
+def write_report(
+    path: Path,
+    start_url: str,
+    found: Collection[URL | str],
+    scanned: Collection[URL | str],
+    reason: "StopReason",
+    elapsed: float,
+    stats: dict[str, Any] | None = None,
+    compression: Compression = Compression.NONE,
+    sort: bool = True,
+) -> Path:
+    """Write json report into the directory streaming url arrays instead of building the whole document."""
+    filename = report_path(path, start_url, ReportFormat.JSON, compression)
+    header = json.dumps(summary(start_url, found, scanned, reason, elapsed, stats), indent=4)
+
+    with open_text(filename, compression) as file:
+        file.write(header[:-2])
+        file.write(",\n")
+        write_array(file, "scanned", iter_urls(scanned, sort))
+        file.write(",\n")
+        write_array(file, "found", iter_urls(found, sort))
+        file.write("\n}")
+
+    return filename
+
+
+class NdjsonReport:
+    """Report with one json object per line.
+
+    Scanned pages are appended as they complete (`record_scanned` is a listener of scanned urls),
+    found urls and the summary line are written by `finish`.
+    """
+
+    def __init__(self, path: Path, compression: Compression = Compression.NONE):
+        self.path = path
+        self._file = open_text(path, compression)
+
+    def record_scanned(self, url: URL) -> None:
+        self._file.write(f'{{"scanned": {json.dumps(str(url))}}}\n')
+
+    def finish(
+        self,
+        start_url: str,
+        found: Collection[URL | str],
+        scanned: Collection[URL | str],
+        reason: "StopReason",
+        elapsed: float,
+        stats: dict[str, Any] | None = None,
+        sort: bool = True,
+    ) -> None:
+        for url in iter_urls(found, sort):
+            self._file.write(f'{{"found": {json.dumps(url)}}}\n')
+
+        self._file.write(json.dumps(summary(start_url, found, scanned, reason, elapsed, stats)) + "\n")
+        self.close()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f"<NdjsonReport {self.path}>"
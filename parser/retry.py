@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+from aiohttp import ClientConnectionError
+from yarl import URL
+
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30.0
+
+logger = logging.getLogger("parser.retry")
+
+
+class ErrorClass(Enum):
+    CONNECTION = "connection"
+    TIMEOUT = "timeout"
+    SERVER = "server"
+    THROTTLED = "throttled"
+
+
+DEFAULT_RETRY_BUDGETS = {
+    ErrorClass.CONNECTION: 3,
+    ErrorClass.TIMEOUT: 2,
+    ErrorClass.SERVER: 2,
+    ErrorClass.THROTTLED: 3,
+}
+RETRY_STATUSES = {
+    429: ErrorClass.THROTTLED,
+    500: ErrorClass.SERVER,
+    502: ErrorClass.SERVER,
+    503: ErrorClass.SERVER,
+    504: ErrorClass.SERVER,
+}
+
+
+def classify(error: BaseException | None = None, status: int | None = None) -> ErrorClass | None:
+    """Class of a transient failure worth retrying, None for a success or a permanent failure."""
+    if isinstance(error, asyncio.TimeoutError):
+        return ErrorClass.TIMEOUT
+    if isinstance(error, ClientConnectionError):
+        return ErrorClass.CONNECTION
+    return RETRY_STATUSES.get(status)
+
+
+@dataclass(kw_only=True, slots=True)
+class RetryPolicy:
+    """How many times a url is retried after each class of failures and how long to wait.
+
+    The delay grows twice with every attempt up to `max_delay` and is jittered between its half and whole,
+    so urls failed together are not retried together. `breaker_threshold` failures of a host in a row
+    pause the host for `breaker_cooldown` seconds.
+    """
+
+    budgets: dict[ErrorClass, int] = field(default_factory=lambda: dict(DEFAULT_RETRY_BUDGETS))
+    base_delay: float = DEFAULT_BASE_DELAY
+    max_delay: float = DEFAULT_MAX_DELAY
+    breaker_threshold: int = DEFAULT_BREAKER_THRESHOLD
+    breaker_cooldown: float = DEFAULT_BREAKER_COOLDOWN
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before the attempt, the first retry is attempt 1."""
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(cap / 2, cap)
+
+    @staticmethod
+    def parse_budget(value: str) -> tuple[ErrorClass, int]:
+        """Parse 'CLASS=N' string."""
+        name, _, retries = value.partition("=")
+        try:
+            return ErrorClass(name.strip()), int(retries)
+        except ValueError:
+            classes = ", ".join(error_class.value for error_class in ErrorClass)
+            raise ValueError(f"Expected CLASS=N with CLASS one of {classes}, got {value!r}") from None
+
+
+class CircuitBreaker:
+    """Per host breaker opened by consecutive failures.
+
+    An open host is not requested until the cooldown passes. After that the breaker is half-open:
+    the first success closes it, the first failure opens it again.
+    """
+
+    def __init__(self, threshold: int = DEFAULT_BREAKER_THRESHOLD, cooldown: float = DEFAULT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.opened = 0
+        self._failures: Counter[str] = Counter()
+
+    def success(self, host: str) -> None:
+        self._failures.pop(host, None)
+
+    def failure(self, host: str, now: float) -> float | None:
+        """Count the failure and return the moment the host is paused until, if the breaker opens."""
+        self._failures[host] += 1
+
+        if self._failures[host] < self.threshold:
+            return None
+
+        self.opened += 1
+        logger.warning("Host %s failed %d times in a row, paused for %.2fs", host, self._failures[host], self.cooldown)
+        return now + self.cooldown
+
+
+class Retries:
+    """Retry bookkeeping of a crawl: attempts of every url by error class, host breakers and failed urls."""
+
+    def __init__(self, policy: RetryPolicy | None = None):
+        self.policy = policy = policy if policy is not None else RetryPolicy()
+        self.breaker = CircuitBreaker(policy.breaker_threshold, policy.breaker_cooldown)
+        self.retried: Counter[ErrorClass] = Counter()
+        self.failed: dict[str, str] = {}
+        self._attempts: dict[URL, Counter[ErrorClass]] = {}
+
+    def success(self, url: URL) -> None:
+        self.breaker.success(url.host)
+        self._attempts.pop(url, None)
+
+    def failure(self, url: URL, error_class: ErrorClass, reason: str) -> tuple[float | None, float | None]:
+        """Record a failed attempt.
+
+        Return delay before the next attempt or None if the url has failed for good,
+        and the moment its host is paused until if the failure opened the breaker.
+        """
+        now = time.monotonic()
+        paused_until = self.breaker.failure(url.host, now)
+        attempts = self._attempts.setdefault(url, Counter())
+        attempts[error_class] += 1
+
+        if attempts[error_class] > self.policy.budgets.get(error_class, 0):
+            del self._attempts[url]
+            self.failed[str(url)] = reason
+            logger.info("Giving up on %s: %s", url, reason)
+            return None, paused_until
+
+        self.retried[error_class] += 1
+        delay = self.policy.backoff(attempts[error_class])
+
+        if paused_until is not None:
+            delay = max(delay, paused_until - now)
+
+        logger.info("Retrying %s in %.2fs: %s", url, delay, reason)
+        return delay, paused_until
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "retried": {error_class.value: self.retried[error_class] for error_class in ErrorClass},
+            "breakers_opened": self.breaker.opened,
+            "failed": dict(sorted(self.failed.items())),
+        }
+
+    def __repr__(self):
+        return f"<Retries retried={self.retried.total()} failed={len(self.failed)}>"
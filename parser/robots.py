@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import re
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from aiohttp import ClientError, ClientSession, ClientTimeout
+from lxml import etree
+from yarl import URL
+
+DEFAULT_ROBOTS_AGENT = "*"
+DEFAULT_MAX_SITEMAPS = 1000
+MAX_ROBOTS_SIZE = 512 * 1024
+MAX_SITEMAP_SIZE = 50 * 1024 * 1024
+SITEMAP_CHUNK_SIZE = 64 * 1024
+SITEMAP_TIMEOUT = ClientTimeout(total=None, sock_connect=10, sock_read=30)
+GZIP_MAGIC = b"\x1f\x8b"
+
+logger = logging.getLogger("parser.robots")
+
+
+@dataclass(frozen=True, slots=True)
+class RobotsRule:
+    pattern: re.Pattern
+    length: int
+    allow: bool
+
+
+def compile_rule(path: str, allow: bool) -> RobotsRule:
+    """Compile Allow/Disallow path with `*` wildcards and `$` end anchor into a regular expression."""
+    anchored = path.endswith("$")
+    body = path[:-1] if anchored else path
+    regex = ".*".join(re.escape(part) for part in body.split("*"))
+    return RobotsRule(re.compile(regex + ("$" if anchored else "")), len(path), allow)
+
+
+@dataclass(kw_only=True, slots=True)
+class RobotsRules:
+    """Rules of robots.txt group applied to the crawler.
+
+    Rules are sorted by specificity, so the first matching one wins as RFC 9309 requires:
+    the longest path and Allow over Disallow of the same length.
+    """
+
+    rules: list[RobotsRule] = field(default_factory=list)
+    crawl_delay: float | None = None
+    sitemaps: list[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.rules.sort(key=lambda rule: (-rule.length, not rule.allow))
+
+    def allowed(self, url: URL) -> bool:
+        path = url.raw_path_qs
+
+        for rule in self.rules:
+            if rule.pattern.match(path):
+                return rule.allow
+        return True
+
+
+ALLOW_ALL = RobotsRules()
+DISALLOW_ALL = RobotsRules(rules=[compile_rule("/", allow=False)])
+
+
+@dataclass(kw_only=True, slots=True)
+class RobotsGroup:
+    rules: list[RobotsRule] = field(default_factory=list)
+    crawl_delay: float | None = None
+
+
+def parse_robots(text: str, agent: str = DEFAULT_ROBOTS_AGENT) -> RobotsRules:
+    """Take rules of the groups matching the agent product token, the `*` group if there are none."""
+    groups: dict[str, RobotsGroup] = {}
+    sitemaps = []
+    agents: list[str] = []
+    in_rules = False
+
+    for line in text.splitlines():
+        key, separator, value = line.partition("#")[0].partition(":")
+        if not separator:
+            continue
+
+        key = key.strip().lower()
+        value = value.strip()
+
+        if key == "sitemap":
+            if value:
+                sitemaps.append(value)
+        elif key == "user-agent":
+            if in_rules:
+                agents, in_rules = [], False
+            agents.append(value.lower())
+        elif key in ("allow", "disallow", "crawl-delay"):
+            in_rules = True
+
+            for name in agents:
+                group = groups.setdefault(name, RobotsGroup())
+
+                if key == "crawl-delay":
+                    try:
+                        group.crawl_delay = float(value)
+                    except ValueError:
+                        logger.debug("Invalid crawl delay: %s", value)
+                elif value:
+                    group.rules.append(compile_rule(value, allow=key == "allow"))
+
+    agent = agent.lower()
+    matched = [group for name, group in groups.items() if name != "*" and name in agent]
+
+    if not matched and "*" in groups:
+        matched = [groups["*"]]
+
+    delays = [group.crawl_delay for group in matched if group.crawl_delay is not None]
+    return RobotsRules(
+        rules=[rule for group in matched for rule in group.rules],
+        crawl_delay=max(delays) if delays else None,
+        sitemaps=sitemaps,
+    )
+
+
+class RobotsCache:
+    """Rules of robots.txt fetched once per origin.
+
+    Missing robots.txt (4xx) allows everything, unreachable one (5xx or connection error) disallows everything.
+    """
+
+    def __init__(self, agent: str = DEFAULT_ROBOTS_AGENT):
+        self.agent = agent
+        self.disallowed = 0
+        self._rules: dict[str, RobotsRules] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def cached(self, url: URL) -> RobotsRules | None:
+        return self._rules.get(str(url.origin()))
+
+    def disallows(self, url: URL) -> bool:
+        """Whether the url is disallowed by rules fetched before. Nothing is disallowed until they are fetched."""
+        return (rules := self.cached(url)) is not None and not rules.allowed(url)
+
+    async def get(
+        self,
+        session: ClientSession,
+        url: URL,
+        timeout: ClientTimeout | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> RobotsRules:
+        origin = str(url.origin())
+
+        if (rules := self._rules.get(origin)) is not None:
+            return rules
+
+        async with self._locks.setdefault(origin, asyncio.Lock()):
+            if (rules := self._rules.get(origin)) is None:
+                rules = self._rules[origin] = await self._fetch(session, url.origin(), timeout, headers)
+                self._locks.pop(origin, None)
+        return rules
+
+    async def _fetch(
+        self,
+        session: ClientSession,
+        origin: URL,
+        timeout: ClientTimeout | None,
+        headers: dict[str, str] | None,
+    ) -> RobotsRules:
+        robots_url = origin.with_path("/robots.txt")
+
+        try:
+            async with session.get(robots_url, timeout=timeout, headers=headers) as response:
+                if response.status >= 500:
+                    logger.warning("Got %d for %s, the host is not crawled", response.status, robots_url)
+                    return DISALLOW_ALL
+                if not response.ok:
+                    logger.info("No robots.txt on %s", origin)
+                    return ALLOW_ALL
+
+                body = await response.content.read(MAX_ROBOTS_SIZE)
+        except (ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Cannot fetch %s, the host is not crawled: %r", robots_url, e)
+            return DISALLOW_ALL
+
+        rules = parse_robots(body.decode("utf-8", errors="replace"), self.agent)
+        logger.info("Got %d rules from %s, crawl delay is %s", len(rules.rules), robots_url, rules.crawl_delay)
+        return rules
+
+    def as_dict(self) -> dict[str, int]:
+        return {"hosts": len(self._rules), "disallowed": self.disallowed}
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __repr__(self):
+        return f"<RobotsCache hosts={len(self)} disallowed={self.disallowed}>"
+
+
+def read_locations(parser: etree.XMLPullParser) -> Iterator[tuple[str, bool]]:
+    """Take locations of parsed `url` and `sitemap` entries dropping the entries to keep the tree small."""
+    for _, element in parser.read_events():
+        if not isinstance(element.tag, str):
+            continue
+
+        name = element.tag.rpartition("}")[2]
+        if name not in ("url", "sitemap"):
+            continue
+
+        location = element.find("{*}loc")
+        if location is not None and location.text and location.text.strip():
+            yield location.text.strip(), name == "sitemap"
+
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+async def iter_sitemap(
+    chunks: AsyncIterable[bytes],
+    max_size: int = MAX_SITEMAP_SIZE,
+) -> AsyncIterator[tuple[str, bool]]:
+    """Stream-parse sitemap or sitemap index, plain or gzipped, yielding locations and whether they are sitemaps."""
+    parser = etree.XMLPullParser(events=("end",), resolve_entities=False, no_network=True)
+    decompressor = None
+    size = 0
+    first = True
+
+    async for chunk in chunks:
+        if first:
+            first = False
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+
+        size += len(chunk)
+        if size > max_size:
+            logger.warning("Sitemap exceeds %d bytes, the rest is skipped", max_size)
+            return
+
+        parser.feed(chunk)
+        for item in read_locations(parser):
+            yield item
+
+    parser.close()
+    for item in read_locations(parser):
+        yield item
+
+
+async def iter_sitemap_urls(
+    session: ClientSession,
+    sitemaps: Iterable[URL],
+    timeout: ClientTimeout = SITEMAP_TIMEOUT,
+    headers: dict[str, str] | None = None,
+    max_sitemaps: int = DEFAULT_MAX_SITEMAPS,
+) -> AsyncIterator[str]:
+    """Yield page locations of the sitemaps following sitemap indexes. Broken sitemaps are skipped."""
+    pending = deque(sitemaps)
+    seen = {str(url) for url in pending}
+    fetched = 0
+
+    while pending and fetched < max_sitemaps:
+        sitemap_url = pending.popleft()
+        fetched += 1
+
+        try:
+            async with session.get(sitemap_url, timeout=timeout, headers=headers) as response:
+                if not response.ok:
+                    logger.info("Got %d for sitemap %s", response.status, sitemap_url)
+                    continue
+
+                logger.info("Reading sitemap %s", sitemap_url)
+
+                async for location, nested in iter_sitemap(response.content.iter_chunked(SITEMAP_CHUNK_SIZE)):
+                    if not nested:
+                        yield location
+                    elif location not in seen:
+                        seen.add(location)
+                        pending.append(URL(location))
+        except (ClientError, asyncio.TimeoutError, ValueError, zlib.error, etree.XMLSyntaxError) as e:
+            logger.warning("Cannot read sitemap %s: %r", sitemap_url, e)
+
+    if pending:
+        logger.warning("Sitemaps limit %d is reached, %d sitemaps are skipped", max_sitemaps, len(pending))
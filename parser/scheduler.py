@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Coroutine, Any
+
+from yarl import URL
+
+from parser.frontier import Frontier, PriorityFrontier
+
+BACKOFF_STATUSES = (429, 503)
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_LOOKAHEAD = 1024
+LATENCY_SMOOTHING = 0.3
+
+logger = logging.getLogger("parser.scheduler")
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Convert Retry-After header given in seconds or as HTTP date to seconds."""
+    if not value:
+        return None
+
+    if value.strip().isdigit():
+        return float(value)
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+    # A date in -0000 zone is naive, it is UTC still
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass(kw_only=True, slots=True)
+class HostState:
+    pending: deque[URL] = field(default_factory=deque)
+    in_flight: int = 0
+    tokens: float = 1.0
+    refilled: float = 0.0
+    ready_at: float = 0.0
+    delay: float = 0.0
+    min_delay: float = 0.0
+    latency: float | None = None
+
+
+class Scheduler:
+    """Layer between the frontier and workers giving out urls of the hosts ready to be requested.
+
+    Every host has a limit of concurrent requests, a token bucket with `per_host_rate` requests per second
+    and a crawl delay, which grows on 429/503 responses and follows observed latency if `adaptive` is set.
+    Up to `lookahead` urls are taken from the frontier to find a ready host, one by default for a priority
+    frontier, so its order is not lost in the per host queues.
+    Urls given back with `retry` wait in a heap out of the frontier, so they are not completed until retried.
+    """
+
+    def __init__(
+        self,
+        frontier: Frontier,
+        per_host_limit: int | None = None,
+        per_host_rate: float | None = None,
+        adaptive: bool = False,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        lookahead: int | None = None,
+    ):
+        if lookahead is None:
+            lookahead = 1 if isinstance(frontier, PriorityFrontier) else DEFAULT_LOOKAHEAD
+        self.frontier = frontier
+        self.per_host_limit = per_host_limit
+        self.per_host_rate = per_host_rate
+        self.adaptive = adaptive
+        self.max_delay = max_delay
+        self.lookahead = lookahead
+        self._hosts: dict[str, HostState] = {}
+        self._buffered = 0
+        self._retries: list[tuple[float, int, URL]] = []
+        self._retry_counter = 0
+        self._changed = asyncio.Event()
+
+    def _state(self, host: str) -> HostState:
+        if (state := self._hosts.get(host)) is None:
+            state = self._hosts[host] = HostState(tokens=self._burst, refilled=time.monotonic())
+        return state
+
+    @property
+    def _burst(self) -> float:
+        return float(self.per_host_limit or 1)
+
+    def _refill(self, state: HostState, now: float) -> None:
+        if self.per_host_rate is not None:
+            state.tokens = min(self._burst, state.tokens + (now - state.refilled) * self.per_host_rate)
+            state.refilled = now
+
+    def _ready_time(self, state: HostState, now: float) -> float | None:
+        """Return moment when the host can be requested or None if it waits for a released slot."""
+        if self.per_host_limit is not None and state.in_flight >= self.per_host_limit:
+            return None
+
+        ready_at = state.ready_at
+
+        if self.per_host_rate is not None and state.tokens < 1:
+            ready_at = max(ready_at, now + (1 - state.tokens) / self.per_host_rate)
+
+        return ready_at
+
+    def _pop_ready(self, now: float) -> tuple[URL | None, float | None]:
+        """Return url of the first ready host and the nearest moment when another host becomes ready."""
+        nearest = None
+
+        for host, state in self._hosts.items():
+            if not state.pending:
+                continue
+
+            self._refill(state, now)
+            ready_at = self._ready_time(state, now)
+
+            if ready_at is None:
+                continue
+
+            if ready_at <= now:
+                url = state.pending.popleft()
+                self._buffered -= 1
+                state.in_flight += 1
+                state.ready_at = now + state.delay
+                if self.per_host_rate is not None:
+                    state.tokens -= 1
+                # Move host to the end for round-robin between hosts
+                self._hosts[host] = self._hosts.pop(host)
+                return url, None
+
+            nearest = ready_at if nearest is None else min(nearest, ready_at)
+
+        return None, nearest
+
+    def _buffer(self, url: URL) -> None:
+        self._state(url.host).pending.append(url)
+        self._buffered += 1
+
+    def _buffer_retries(self, now: float) -> None:
+        while self._retries and self._retries[0][0] <= now:
+            _, _, url = heapq.heappop(self._retries)
+            self._state(url.host).pending.appendleft(url)
+            self._buffered += 1
+
+    async def get(self) -> URL:
+        while True:
+            self._buffer_retries(time.monotonic())
+
+            while self._buffered < self.lookahead and self.frontier.qsize():
+                self._buffer(self.frontier.get_nowait())
+
+            url, nearest = self._pop_ready(time.monotonic())
+
+            if url is not None:
+                return url
+
+            if self._retries:
+                nearest = self._retries[0][0] if nearest is None else min(nearest, self._retries[0][0])
+
+            timeout = None if nearest is None else max(0.0, nearest - time.monotonic())
+            self._changed.clear()
+            changed = asyncio.ensure_future(self._changed.wait())
+            # With the full lookahead new urls have to wait in the frontier until buffered hosts get ready
+            getter = asyncio.ensure_future(self.frontier.get()) if self._buffered < self.lookahead else None
+            waiters = (changed,) if getter is None else (getter, changed)
+
+            try:
+                await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                changed.cancel()
+                if getter is not None and getter.done() and not getter.cancelled():
+                    self._buffer(getter.result())
+                elif getter is not None:
+                    getter.cancel()
+
+    def release(
+        self,
+        url: URL,
+        latency: float | None = None,
+        status: int | None = None,
+        retry_after: str | None = None,
+    ) -> None:
+        """Return the host slot taken by `get` and adjust the host delay by the response."""
+        state = self._state(url.host)
+        state.in_flight -= 1
+        now = time.monotonic()
+
+        if latency is not None:
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += LATENCY_SMOOTHING * (latency - state.latency)
+
+        if status in BACKOFF_STATUSES:
+            delay = parse_retry_after(retry_after)
+            state.delay = min(self.max_delay, max(state.delay * 2, state.latency or 0, 1.0))
+            state.ready_at = max(state.ready_at, now + (delay if delay is not None else state.delay))
+            logger.info("Host %s asked to slow down, delay is %.2fs", url.host, state.delay)
+        elif self.adaptive and state.latency is not None:
+            concurrency = self.per_host_limit or 1
+            target = min(self.max_delay, state.latency / concurrency)
+            state.delay = max(state.min_delay, (state.delay + target) / 2)
+        elif state.delay > state.min_delay:
+            state.delay = max(state.min_delay, state.delay / 2)
+
+        self._changed.set()
+
+    def retry(self, url: URL, delay: float) -> None:
+        """Give out the url taken by `get` again in `delay` seconds. The url stays not done for `join`."""
+        self._retry_counter += 1
+        heapq.heappush(self._retries, (time.monotonic() + delay, self._retry_counter, url))
+        self._changed.set()
+
+    def pause(self, host: str, until: float) -> None:
+        """Do not request the host until the moment."""
+        state = self._state(host)
+        state.ready_at = max(state.ready_at, until)
+        self._changed.set()
+
+    def set_min_delay(self, host: str, delay: float) -> None:
+        """Keep at least `delay` seconds between requests to the host, like Crawl-delay of robots.txt asks."""
+        state = self._state(host)
+        state.min_delay = min(self.max_delay, delay)
+        state.delay = max(state.delay, state.min_delay)
+
+    def put_nowait(self, item: URL, source: URL | None = None, redirect: bool = False) -> None:
+        self.frontier.put_nowait(item, source, redirect)
+
+    def task_done(self, url: URL | None = None) -> None:
+        if url is not None:
+            self.frontier.complete(url)
+        self.frontier.task_done()
+
+    def join(self) -> Coroutine[Any, Any, None]:
+        return self.frontier.join()
+
+    def qsize(self) -> int:
+        return self.frontier.qsize() + self._buffered + len(self._retries)
+
+    def __repr__(self):
+        return f"<Scheduler size={self.qsize()} hosts={len(self._hosts)}>"
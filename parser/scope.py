@@ -0,0 +1,150 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable
+
+from yarl import URL
+
+HOST_CACHE_SIZE = 4096
+MARK = ""
+EXCEPTION = "!"
+WILDCARD = "*"
+
+# Most used multi-label public suffixes, single labels are public by the default rule
+DEFAULT_PUBLIC_SUFFIXES = (
+    "ac.uk", "co.uk", "gov.uk", "ltd.uk", "me.uk", "net.uk", "org.uk", "plc.uk",
+    "com.au", "edu.au", "gov.au", "net.au", "org.au",
+    "ac.jp", "co.jp", "go.jp", "ne.jp", "or.jp",
+    "co.kr", "or.kr", "co.nz", "org.nz", "co.za", "org.za", "co.in", "net.in", "org.in", "co.il", "co.id",
+    "com.ar", "com.br", "com.cn", "com.co", "com.hk", "com.mx", "com.my", "com.sg", "com.tr", "com.tw", "com.ua",
+    "net.br", "net.cn", "org.br", "org.cn", "gov.br", "gov.cn", "edu.cn",
+    "msk.ru", "spb.ru", "com.ru", "org.ru",
+    "appspot.com", "blogspot.com", "cloudfront.net", "github.io", "gitlab.io", "herokuapp.com", "netlify.app",
+    "pages.dev", "vercel.app", "workers.dev",
+)
+
+
+@lru_cache(maxsize=HOST_CACHE_SIZE)
+def host_labels(host: str) -> tuple[str, ...]:
+    """Labels of the host from the top level one. Memoized, so repeated hosts are not split again."""
+    return tuple(reversed(host.lower().rstrip(".").split(".")))
+
+
+class PublicSuffixes:
+    """Public suffix rules in the format of publicsuffix.org list: plain, wildcard (`*.ck`) and exception (`!www.ck`).
+
+    Rules are kept in a trie of reversed labels, so the registrable domain is found in one pass over the labels.
+    """
+
+    def __init__(self, rules: Iterable[str] = DEFAULT_PUBLIC_SUFFIXES):
+        self._trie: dict[str, Any] = {}
+
+        for rule in rules:
+            exception = rule.startswith(EXCEPTION)
+            node = self._trie
+            for label in host_labels(rule.removeprefix(EXCEPTION)):
+                node = node.setdefault(label, {})
+            node[EXCEPTION if exception else MARK] = True
+
+    @classmethod
+    def load(cls, path: str | Path) -> "PublicSuffixes":
+        rules = []
+
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("//"):
+                rules.append(line.split()[0])
+
+        return cls(rules)
+
+    def suffix_length(self, labels: tuple[str, ...]) -> int:
+        """Number of labels of the public suffix, at least the top level label."""
+        length = 1
+        node = self._trie
+
+        for i, label in enumerate(labels):
+            child = node.get(label)
+            if child is not None and EXCEPTION in child:
+                return i
+
+            node = child if child is not None else node.get(WILDCARD)
+            if node is None:
+                break
+            if MARK in node:
+                length = i + 1
+
+        return length
+
+    def registrable_domain(self, host: str) -> str:
+        """Public suffix with one more label, the host itself if it is a public suffix."""
+        labels = host_labels(host)
+        length = self.suffix_length(labels) + 1
+        return ".".join(reversed(labels[:length])) if len(labels) > length else ".".join(reversed(labels))
+
+
+class Scope:
+    """Hosts allowed to crawl: the roots with their subdomains except the excluded subtrees.
+
+    Roots and exclusions are kept in a trie of reversed labels, the deepest marked node decides,
+    so an excluded subdomain may have an allowed subdomain again. Answers are memoized per host.
+    """
+
+    def __init__(self, roots: Iterable[str], exclude: Iterable[str] = (), cache_size: int = HOST_CACHE_SIZE):
+        self.roots = tuple(roots)
+        self.excluded = tuple(exclude)
+        self.cache_size = cache_size
+        self._trie: dict[str, Any] = {}
+        self._cache: dict[str, bool] = {}
+
+        for host in self.roots:
+            self._insert(host, True)
+        for host in self.excluded:
+            self._insert(host, False)
+
+    @classmethod
+    def for_url(
+        cls,
+        url: URL,
+        top_level: bool = False,
+        suffixes: PublicSuffixes | None = None,
+        allow: Iterable[str] = (),
+        exclude: Iterable[str] = (),
+    ) -> "Scope":
+        """Scope of the start url host or, with `top_level`, of its registrable domain."""
+        root = url.host
+        if top_level:
+            root = (suffixes or PublicSuffixes()).registrable_domain(root)
+        return cls((root, *allow), exclude)
+
+    def _insert(self, host: str, included: bool) -> None:
+        node = self._trie
+        for label in host_labels(host):
+            node = node.setdefault(label, {})
+        node[MARK] = included
+
+    def _match(self, host: str) -> bool:
+        node = self._trie
+        included = False
+
+        for label in host_labels(host):
+            node = node.get(label)
+            if node is None:
+                break
+            included = node.get(MARK, included)
+
+        return included
+
+    def includes(self, host: str) -> bool:
+        if (included := self._cache.get(host)) is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            included = self._cache[host] = self._match(host)
+        return included
+
+    def __contains__(self, host: str) -> bool:
+        return self.includes(host)
+
+    def __str__(self):
+        return ", ".join((*self.roots, *(f"-{host}" for host in self.excluded)))
+
+    def __repr__(self):
+        return f"<Scope {self}>"
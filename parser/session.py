@@ -0,0 +1,105 @@
+from dataclasses import dataclass, asdict
+from enum import Enum
+from types import SimpleNamespace
+from typing import Any
+
+from aiohttp import ClientSession, TCPConnector, TraceConfig
+from fake_useragent import UserAgent
+
+from parser.metrics import CrawlMetrics
+
+DEFAULT_CONNECTIONS_LIMIT = 100
+DEFAULT_CONNECTIONS_PER_HOST = 0
+DEFAULT_DNS_CACHE_TTL = 10
+DEFAULT_KEEPALIVE_TIMEOUT = 15.0
+
+user_agent = UserAgent()
+
+
+class UserAgentMode(Enum):
+    RANDOM = "random"
+    FIXED = "fixed"
+
+
+@dataclass(kw_only=True, slots=True)
+class SessionOptions:
+    """Settings of the connection layer.
+
+    Zero `limit` and `limit_per_host` mean no limit.
+    Zero `dns_cache_ttl` disables DNS caching, None keeps resolved addresses forever.
+    """
+
+    limit: int = DEFAULT_CONNECTIONS_LIMIT
+    limit_per_host: int = DEFAULT_CONNECTIONS_PER_HOST
+    dns_cache_ttl: int | None = DEFAULT_DNS_CACHE_TTL
+    keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT
+    compress: bool = True
+    user_agent: UserAgentMode = UserAgentMode.RANDOM
+
+
+@dataclass(kw_only=True, slots=True)
+class ConnectionStats:
+    """Counters of the connection layer collected with aiohttp tracing."""
+
+    requests: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+
+    def trace_config(self) -> TraceConfig:
+        config = TraceConfig()
+        config.on_request_start.append(self._on_request_start)
+        config.on_connection_create_end.append(self._on_connection_create_end)
+        config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        config.on_dns_cache_miss.append(self._on_dns_cache_miss)
+        return config
+
+    async def _on_request_start(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.requests += 1
+
+    async def _on_connection_create_end(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.connections_created += 1
+
+    async def _on_connection_reuseconn(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.connections_reused += 1
+
+    async def _on_dns_cache_hit(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+        self.dns_cache_misses += 1
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+def request_headers(mode: UserAgentMode) -> dict[str, str] | None:
+    """Headers sent with every request in addition to the session ones."""
+    if mode is UserAgentMode.RANDOM:
+        return {"User-Agent": user_agent.random}
+    return None
+
+
+def create_session(
+    options: SessionOptions,
+    stats: ConnectionStats | None = None,
+    metrics: CrawlMetrics | None = None,
+) -> ClientSession:
+    connector = TCPConnector(
+        limit=options.limit,
+        limit_per_host=options.limit_per_host,
+        use_dns_cache=options.dns_cache_ttl != 0,
+        ttl_dns_cache=options.dns_cache_ttl,
+        keepalive_timeout=options.keepalive_timeout,
+    )
+
+    headers = {}
+    if options.user_agent is UserAgentMode.FIXED:
+        headers["User-Agent"] = user_agent.random
+    if not options.compress:
+        headers["Accept-Encoding"] = "identity"
+
+    trace_configs = [tracer.trace_config() for tracer in (stats, metrics) if tracer is not None]
+    return ClientSession(connector=connector, headers=headers, trace_configs=trace_configs or None)
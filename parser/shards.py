@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any
+
+from yarl import URL
+
+from parser.frontier import Frontier, SeenSet, SpillQueue, fingerprint
+from parser.metrics import CrawlMetrics
+from parser.session import ConnectionStats
+from parser.web import Budget, StopReason, StopScanning, parse
+
+REASONS = list(StopReason)
+NO_REASON = -1
+BUDGET_POLL_INTERVAL = 0.05
+RESULT_POLL_INTERVAL = 1.0
+
+logger = logging.getLogger("parser.shards")
+
+
+class ShardKey(Enum):
+    HOST = "host"
+    URL = "url"
+
+
+def shard_of(url: URL, shards: int, key: ShardKey = ShardKey.URL) -> int:
+    """Shard owning the url. With HOST key all urls of a host are crawled by one shard, so per-host limits hold."""
+    value = (url.host or "") if key is ShardKey.HOST else str(url)
+    return fingerprint(value) % shards
+
+
+class SharedState:
+    """Counters and stop flag shared by all shards of a crawl.
+
+    `pending` counts urls queued anywhere or sent to another shard and not processed yet,
+    the crawl is over when it drops to zero.
+    """
+
+    def __init__(self, shards: int, max_found: int | None = None, max_scanned: int | None = None):
+        context = multiprocessing.get_context("spawn")
+        self.max_found = max_found
+        self.max_scanned = max_scanned
+        self.inboxes = [context.Queue() for _ in range(shards)]
+        self.pending = context.Value("q", 0)
+        self.found = context.Value("q", 0)
+        self.scanned = context.Value("q", 0)
+        self.reserved = context.Value("q", 0)
+        self.reason = context.Value("i", NO_REASON)
+
+    @property
+    def stop_reason(self) -> StopReason | None:
+        return None if self.reason.value == NO_REASON else REASONS[self.reason.value]
+
+    def stop(self, reason: StopReason) -> None:
+        """Set the reason unless some shard has already stopped the crawl and wake up all shards."""
+        with self.reason.get_lock():
+            if self.reason.value != NO_REASON:
+                return
+            self.reason.value = REASONS.index(reason)
+
+        logger.info("Stop all shards: %s", reason.value)
+        for inbox in self.inboxes:
+            inbox.put(None)
+
+    def add_pending(self, count: int) -> None:
+        with self.pending.get_lock():
+            self.pending.value += count
+            finished = self.pending.value == 0
+
+        if finished:
+            self.stop(StopReason.ALL_PROCESSED)
+
+
+class ShardFrontier(Frontier):
+    """Frontier of one shard: own urls are queued locally, the others are sent to their shards in batches.
+
+    Every url is deduplicated by its owner only, so the local seen-set is enough for global dedup.
+    `join` waits for the whole crawl to stop and raises the reason, if it is not ALL_PROCESSED.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        state: SharedState,
+        key: ShardKey = ShardKey.URL,
+        seen: SeenSet | None = None,
+        pending: SpillQueue | None = None,
+    ):
+        super().__init__(seen, pending)
+        self.index = index
+        self.state = state
+        self.key = key
+        self.owned: list[str] = []
+        self._outbox: list[list[str]] = [[] for _ in state.inboxes]
+        self._flush_scheduled = False
+        self._stopped = asyncio.Event()
+        self._receiver: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Receive urls sent by the other shards. Must be called within the running event loop."""
+        loop = asyncio.get_running_loop()
+        inbox = self.state.inboxes[self.index]
+
+        def receive() -> None:
+            while (batch := inbox.get()) is not None:
+                loop.call_soon_threadsafe(self._accept_batch, batch)
+            loop.call_soon_threadsafe(self._stop)
+
+        self._receiver = threading.Thread(target=receive, name=f"shard-{self.index}-inbox", daemon=True)
+        self._receiver.start()
+
+    def _stop(self) -> None:
+        self._stopped.set()
+        self._not_empty.set()
+
+    def _accept(self, value: str) -> bool:
+        if self.state.stop_reason is not None or not self.seen.add(value):
+            return False
+
+        if self.state.max_found is not None:
+            with self.state.found.get_lock():
+                if self.state.found.value >= self.state.max_found:
+                    return False
+                self.state.found.value += 1
+                reached = self.state.found.value == self.state.max_found
+            if reached:
+                self.state.stop(StopReason.FOUND_LIMIT)
+
+        self.pending.append(value)
+        self.owned.append(value)
+        self._unfinished += 1
+        self._finished.clear()
+        self._not_empty.set()
+        return True
+
+    def _accept_batch(self, batch: list[str]) -> None:
+        rejected = sum(not self._accept(value) for value in batch)
+        if rejected:
+            self.state.add_pending(-rejected)
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+
+        for shard, batch in enumerate(self._outbox):
+            if batch:
+                self.state.inboxes[shard].put(batch)
+                self._outbox[shard] = []
+
+    def put_nowait(self, item: URL, source: URL | None = None, redirect: bool = False) -> None:
+        shard = shard_of(item, len(self._outbox), self.key)
+
+        if shard == self.index:
+            if self._accept(str(item)):
+                self.state.add_pending(1)
+            return
+
+        self.state.add_pending(1)
+        self._outbox[shard].append(str(item))
+
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def task_done(self) -> None:
+        super().task_done()
+        self.state.add_pending(-1)
+
+    async def join(self) -> None:
+        await self._stopped.wait()
+        reason = self.state.stop_reason
+        if reason is not None and reason is not StopReason.ALL_PROCESSED:
+            raise StopScanning(reason)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+        if self._receiver is not None:
+            self.state.inboxes[self.index].put(None)
+            self._receiver.join()
+            self._receiver = None
+
+    def __repr__(self):
+        return f"<ShardFrontier {self.index} size={self.qsize()} seen={len(self.seen)}>"
+
+
+class SharedBudget(Budget):
+    """Scanned urls limit counted across all shards."""
+
+    def __init__(self, state: SharedState):
+        super().__init__(state.max_scanned)
+        self.state = state
+
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.state.scanned.value >= self.limit
+
+    async def reserve(self) -> None:
+        if self.limit is None:
+            return
+
+        while True:
+            with self.state.reserved.get_lock():
+                if self.state.scanned.value + self.state.reserved.value < self.limit:
+                    self.state.reserved.value += 1
+                    return
+            # Places are released by other processes, so they cannot wake us up
+            await asyncio.sleep(BUDGET_POLL_INTERVAL)
+
+    def release(self) -> None:
+        if self.limit is not None:
+            with self.state.reserved.get_lock():
+                self.state.reserved.value -= 1
+
+    def spend(self, _item: Any = None) -> None:
+        with self.state.scanned.get_lock():
+            self.state.scanned.value += 1
+
+        if self.exhausted():
+            self.state.stop(StopReason.SCANNED_LIMIT)
+            raise StopScanning(StopReason.SCANNED_LIMIT)
+
+
+@dataclass(kw_only=True, slots=True)
+class ShardResult:
+    index: int
+    found: list[str]
+    scanned: list[str]
+    reason: StopReason | None
+    stats: dict[str, Any] = field(default_factory=dict)
+
+
+def run_shard(
+    index: int,
+    url: str,
+    state: SharedState,
+    key: ShardKey,
+    results: multiprocessing.Queue,
+    collect_metrics: bool,
+    log_level: int | None,
+    parse_kwargs: dict[str, Any],
+) -> None:
+    if log_level is not None:
+        logging.basicConfig(
+            format=f"%(asctime)5s.%(msecs)03d [%(levelname)s] shard-{index} %(name)s - %(message)s",
+            level=log_level,
+            datefmt="%H:%M:%S",
+        )
+
+    async def crawl() -> ShardResult:
+        # Memory budget and error rate are applied to the shard frontier, they are ignored by parse with it
+        queue = Frontier.create(parse_kwargs.get("memory_budget"), parse_kwargs.get("bloom_error_rate"))
+        frontier = ShardFrontier(index, state, key, queue.seen, queue.pending)
+        frontier.start()
+        connection_stats = ConnectionStats()
+        metrics = CrawlMetrics() if collect_metrics else None
+
+        try:
+            found, scanned, reason = await parse(
+                url,
+                frontier=frontier,
+                budget=SharedBudget(state),
+                connection_stats=connection_stats,
+                metrics=metrics,
+                **parse_kwargs,
+            )
+        except BaseException:
+            # Urls of the shard would never be processed, the other shards would wait for them forever
+            state.stop(StopReason.RUNTIME_ERROR)
+            raise
+        finally:
+            frontier.close()
+
+        stats = {"connections": connection_stats.as_dict()}
+        if metrics is not None:
+            stats["metrics"] = metrics.snapshot()
+
+        return ShardResult(
+            index=index,
+            found=frontier.owned,
+            scanned=[str(scanned_url) for scanned_url in scanned],
+            reason=reason,
+            stats=stats,
+        )
+
+    results.put(asyncio.run(crawl()))
+
+
+def parse_sharded(
+    url: str,
+    shards: int,
+    key: ShardKey = ShardKey.URL,
+    max_found: int | None = None,
+    max_scanned: int | None = None,
+    collect_metrics: bool = False,
+    log_level: int | None = None,
+    **parse_kwargs: Any,
+) -> tuple[set[URL], set[URL], StopReason, list[dict[str, Any]]]:
+    """Crawl with `shards` processes, each running `parse` with its own event loop and session.
+
+    Urls are partitioned between shards by `key`, limits are global. Returns merged found and scanned urls,
+    the stop reason and stats of every shard.
+    """
+    context = multiprocessing.get_context("spawn")
+    state = SharedState(shards, max_found or None, max_scanned)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_shard,
+            args=(index, url, state, key, results, collect_metrics, log_level, parse_kwargs),
+            name=f"shard-{index}",
+        )
+        for index in range(shards)
+    ]
+
+    for process in processes:
+        process.start()
+
+    shard_results: list[ShardResult] = []
+    running = shards
+
+    try:
+        while len(shard_results) < running:
+            try:
+                result = results.get(timeout=RESULT_POLL_INTERVAL)
+            except queue.Empty:
+                crashed = [process for process in processes if process.exitcode not in (None, 0)]
+                if len(crashed) > shards - running:
+                    logger.error("Shards crashed: %s", ", ".join(process.name for process in crashed))
+                    running = shards - len(crashed)
+                    state.stop(StopReason.RUNTIME_ERROR)
+                continue
+
+            shard_results.append(result)
+            # A shard stopped on its own, e.g. by an error, leaves its urls unprocessed
+            if result.reason is not None and result.reason is not StopReason.ALL_PROCESSED:
+                state.stop(result.reason)
+    finally:
+        for process in processes:
+            process.join()
+
+    shard_results.sort(key=lambda result: result.index)
+    found = {URL(value, encoded=True) for result in shard_results for value in result.found}
+    scanned = {URL(value, encoded=True) for result in shard_results for value in result.scanned}
+    reason = state.stop_reason or next(
+        (result.reason for result in shard_results if result.reason is not None), StopReason.RUNTIME_ERROR)
+
+    return found, scanned, reason, [result.stats for result in shard_results]
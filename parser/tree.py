@@ -1,14 +1,19 @@
 import json
 import logging
-from collections import deque
+from array import array
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from enum import Enum
-from itertools import islice, chain
-from typing import Iterable, Optional
+from itertools import islice
+from typing import Iterable, Iterator, Optional
 
 from yarl import URL
 
-from parser.pages import Host
+from parser.pages import get_host
+
+NO_NODE = -1
+DOMAIN = 0
+PATH = 1
 
 logger = logging.getLogger("parser.tree")
 
@@ -25,12 +30,17 @@ class NodeType(Enum):
         return f"<NodeType {self.type}, '{self.separator}'>"
 
 
+def node_key(type_: NodeType, value: str) -> str:
+    """Key of the node among its siblings. Domain labels never contain slash, so the keys don't collide."""
+    return "/" + value if type_ is NodeType.PATH else value
+
+
 @dataclass(kw_only=True, slots=True, unsafe_hash=True)
 class Node:
     type: NodeType
     value: str
-    parent: Optional["Node"] = None
-    children: list["Node"] = field(default_factory=list)
+    parent: Optional["Node"] = field(default=None, hash=False, compare=False)
+    children: dict[str, "Node"] = field(default_factory=dict, hash=False, compare=False)
 
     @classmethod
     def domain(cls, value: str):
@@ -40,6 +50,28 @@ class Node:
     def path(cls, value: str):
         return cls(type=NodeType.PATH, value=value)
 
+    @property
+    def key(self) -> str:
+        return node_key(self.type, self.value)
+
+    def add(self, child: "Node") -> "Node":
+        """Attach child node unless there is an equal one and return the attached child."""
+        key = child.key
+        if (existing := self.children.get(key)) is not None:
+            return existing
+        self.children[key] = child
+        child.parent = self
+        return child
+
+    def get(self, type_: NodeType, value: str) -> Optional["Node"]:
+        return self.children.get(node_key(type_, value))
+
+    def child(self, type_: NodeType, value: str) -> "Node":
+        """Return existing child or create a new one."""
+        if (existing := self.children.get(node_key(type_, value))) is not None:
+            return existing
+        return self.add(Node(type=type_, value=value))
+
     def __eq__(self, other: object):
         if not isinstance(other, Node):
             raise NotImplementedError
@@ -49,62 +81,218 @@ class Node:
         return f"<Node {self.type.type}, '{self.value}'>"
 
 
-def prepare_branches(urls: Iterable[URL]) -> deque[deque[Node]]:
-    branches = deque()
+class SiteTree:
+    """Site map growing by one url at a time.
 
-    for url in urls:
-        domains = [Node(type=NodeType.DOMAIN, value=domain) for domain in Host(url.host).parts]
-        parts = [Node(type=NodeType.PATH, value=part) for part in islice(url.parts, 1, None) if part]
-        branches.append(deque(chain(domains, parts)))
+    The root is the first segment of the first inserted url, the following urls are expected to share it.
+    `insert` can be used as a listener of found urls to build the tree while parsing.
+    """
+
+    def __init__(self):
+        self.root: Node | None = None
+
+    def insert(self, url: URL) -> None:
+        domains = get_host(url.host).parts
+
+        if self.root is None:
+            self.root = Node(type=NodeType.DOMAIN, value=domains[0])
+
+        node = self.root
+
+        for domain in islice(domains, 1, None):
+            if (child := node.children.get(domain)) is None:
+                child = node.add(Node(type=NodeType.DOMAIN, value=domain))
+            node = child
+
+        for part in islice(url.parts, 1, None):
+            if part:
+                if (child := node.children.get("/" + part)) is None:
+                    child = node.add(Node(type=NodeType.PATH, value=part))
+                node = child
+
+
+class CompactTree:
+    """Site map stored in parallel arrays instead of Node objects.
+
+    Node 0 is the root. Segment strings are interned, children of a node form a linked list
+    through `first_child` and `next_sibling` (the latest child goes first).
+    Until `freeze` is called, children are also indexed for constant time lookup.
+    """
+
+    def __init__(self):
+        self.segments: list[str] = []
+        self._segment_ids: dict[str, int] = {}
+        self.types = array("b")
+        self.segment = array("i")
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self._index: dict[int, int] | None = {}
+
+    def _intern(self, value: str) -> int:
+        if (segment_id := self._segment_ids.get(value)) is None:
+            segment_id = self._segment_ids[value] = len(self.segments)
+            self.segments.append(value)
+        return segment_id
+
+    def _append(self, type_: int, segment_id: int, parent: int) -> int:
+        node = len(self.segment)
+        self.types.append(type_)
+        self.segment.append(segment_id)
+        self.parent.append(parent)
+        self.first_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+
+        if parent != NO_NODE:
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+        return node
+
+    def _find(self, parent: int, type_: int, segment_id: int) -> int:
+        if self._index is not None:
+            return self._index.get((parent << 32 | segment_id) << 1 | type_, NO_NODE)
+
+        child = self.first_child[parent]
+        while child != NO_NODE and (self.segment[child] != segment_id or self.types[child] != type_):
+            child = self.next_sibling[child]
+        return child
+
+    def _child(self, parent: int, type_: int, value: str) -> int:
+        segment_id = self._intern(value)
+
+        if (child := self._find(parent, type_, segment_id)) == NO_NODE:
+            child = self._append(type_, segment_id, parent)
+            if self._index is not None:
+                self._index[(parent << 32 | segment_id) << 1 | type_] = child
+        return child
+
+    def insert(self, url: URL) -> None:
+        domains = get_host(url.host).parts
+
+        if not self.segment:
+            self._append(DOMAIN, self._intern(domains[0]), NO_NODE)
 
-    return branches
+        node = 0
 
+        for domain in islice(domains, 1, None):
+            node = self._child(node, DOMAIN, domain)
 
-def merge_branch(parent: Optional[Node], branch: deque[Node]) -> Node:
-    if not branch:
-        return parent
+        for part in islice(url.parts, 1, None):
+            if part:
+                node = self._child(node, PATH, part)
 
-    node = branch.popleft()
+    def freeze(self) -> None:
+        """Drop the children index to save memory. Insertion keeps working, but scans siblings."""
+        self._index = None
 
-    if parent is not None:
-        existing_child = list(filter(lambda child: node == child, parent.children))
+    def children(self, node: int) -> list[int]:
+        """Children of the node in insertion order. NO_NODE stands for the virtual parent of the root."""
+        if node == NO_NODE:
+            return [0] if self.segment else []
 
-        if existing_child:
-            merge_branch(existing_child[0], branch)
-        else:
-            parent.children.append(node)
-            node.parent = parent
-            merge_branch(node, branch)
-    else:
-        merge_branch(node, branch)
+        children = []
+        child = self.first_child[node]
 
-    return node
+        while child != NO_NODE:
+            children.append(child)
+            child = self.next_sibling[child]
+
+        children.reverse()
+        return children
+
+    def type_of(self, node: int) -> NodeType:
+        return NodeType.PATH if self.types[node] == PATH else NodeType.DOMAIN
+
+    def value_of(self, node: int) -> str:
+        return self.segments[self.segment[node]]
+
+    def view(self) -> "TreeView":
+        return TreeView(self, NO_NODE)
+
+    def __len__(self) -> int:
+        return len(self.segment)
+
+    def __repr__(self):
+        return f"<CompactTree nodes={len(self)} segments={len(self.segments)}>"
+
+
+class TreeView(Mapping[str, "TreeView"]):
+    """Read-only mapping of segments to subtrees over CompactTree, nothing is materialized until accessed.
+
+    Children of the node are indexed by segment on the first access and again after the tree grows.
+    """
+
+    def __init__(self, tree: CompactTree, node: int):
+        self._tree = tree
+        self._node = node
+        self._children: dict[str, int] = {}
+        self._indexed = -1
+
+    def _index(self) -> dict[str, int]:
+        if self._indexed != len(self._tree):
+            self._children = {}
+            for child in self._tree.children(self._node):
+                self._children.setdefault(self._tree.value_of(child), child)
+            self._indexed = len(self._tree)
+        return self._children
+
+    def __getitem__(self, key: str) -> "TreeView":
+        return TreeView(self._tree, self._index()[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index())
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+    def to_dict(self) -> dict[str, ...]:
+        tree = {}
+        stack = [(self._node, tree)]
+
+        while stack:
+            node, container = stack.pop()
+            for child in self._tree.children(node):
+                container[self._tree.value_of(child)] = nested = {}
+                stack.append((child, nested))
+
+        return tree
+
+    def __repr__(self):
+        return f"<TreeView {dict.fromkeys(self)}>"
 
 
 def build_tree(urls: Iterable[URL]) -> Node:
-    branches = prepare_branches(urls)
-    root = merge_branch(None, branches.popleft())
+    tree = SiteTree()
 
-    for branch in branches:
-        branch.popleft()
-        merge_branch(root, branch)
+    for url in urls:
+        tree.insert(url)
 
-    return root
+    return tree.root
 
 
-def _tree_to_dict(node: Node) -> dict[str, ...]:
-    tree = {}
+def build_compact_tree(urls: Iterable[URL]) -> CompactTree:
+    tree = CompactTree()
 
-    for child in node.children:
-        tree[child.value] = _tree_to_dict(child)
+    for url in urls:
+        tree.insert(url)
 
     return tree
 
 
-def tree_to_dict(root: Node) -> dict[str, ...]:
-    return {
-        root.value: _tree_to_dict(root)
-    }
+def tree_to_dict(root: Node | CompactTree) -> Mapping[str, ...]:
+    """Convert tree to nested dicts. CompactTree is returned as a lazy TreeView."""
+    if isinstance(root, CompactTree):
+        return root.view()
+
+    tree = {}
+    stack = [(root, tree)]
+
+    while stack:
+        node, container = stack.pop()
+        container[node.value] = children = {}
+        stack.extend((child, children) for child in reversed(node.children.values()))
+
+    return tree
 
 
 if __name__ == "__main__":
@@ -1,21 +1,52 @@
 import asyncio
 import logging
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
 from enum import Enum
-from typing import Coroutine, Any, TypeVar, Generic, Sized, cast
+from contextlib import aclosing
+from statistics import median
+from typing import Any, TypeVar, Generic, Sized, cast, Callable, Iterable, Iterator, Protocol
 
 from aiohttp import ClientSession, ClientTimeout, ClientConnectionError
-from fake_useragent import UserAgent
 from yarl import URL
 
-from parser.pages import Host, normalize_url, scan_page
+from parser.cache import CachedPage, PageCache, content_digest, hash_chunks
+from parser.canonical import CanonicalRules, Canonicalizer
+from parser.checkpoint import Checkpoint
+from parser.dedup import BodyBuffer, DedupMode, Deduplicator
+from parser.frontier import Frontier, Ordering, PriorityFrontier, PriorityRule
+from parser.metrics import CrawlMetrics, MetricsSink, Stage
+from parser.pages import Extractor, Host, get_host, normalize_url, scan_page, scan_stream
+from parser.reports import NdjsonReport
+from parser.retry import ErrorClass, Retries, classify
+from parser.robots import RobotsCache, iter_sitemap_urls
+from parser.scheduler import Scheduler
+from parser.scope import Scope
+from parser.session import ConnectionStats, SessionOptions, UserAgentMode, create_session, request_headers
+from parser.tree import SiteTree
 
 T = TypeVar("T")
 
 DEFAULT_REQUEST_TIMEOUT = ClientTimeout(total=10)
-DEFAULT_CHECK_INTERVAL = 0.1
 DEFAULT_WORKERS_NUMBER = 5
+DEFAULT_PARSE_WORKERS = 0
+DEFAULT_EXTRACTOR = Extractor.LXML
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_PARSE_QUEUE_SIZE = 16
+DEFAULT_LINK_QUEUE_SIZE = 64
+DEFAULT_MIN_WORKERS = 1
+DEFAULT_MAX_WORKERS = 100
+DEFAULT_CONTROL_INTERVAL = 1.0
+DEFAULT_MAX_ERROR_RATE = 0.1
+DEFAULT_LATENCY_TOLERANCE = 2.0
+CONTROL_MIN_SAMPLES = 5
+DECREASE_FACTOR = 0.75
+BASELINE_DRIFT = 1.1
+THROUGHPUT_TOLERANCE = 0.9
+MAX_DECISIONS = 1000
 
-user_agent = UserAgent()
 module_logger = logging.getLogger("parser.web")
 
 
@@ -35,114 +66,600 @@ class StopScanning(Exception):
         self.reason = reason
 
 
-class UniqueQueue(Generic[T]):
-    """Wrapper for asyncio.Queue receiving only unique elements."""
+class ConcurrencyController:
+    """AIMD limit of workers fetching concurrently.
+
+    Requests finished within `interval` form a window. With an error rate above `max_error_rate` or median latency
+    above `latency_tolerance` times the best one seen, the limit is cut by a quarter. Otherwise, while urls are
+    waiting, it doubles until the first cut and then grows by one. Growth pauses when the previous one lowered
+    throughput. The best latency drifts up by 10% a window, so it follows a site getting slower for good.
+    """
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_WORKERS_NUMBER,
+        min_limit: int = DEFAULT_MIN_WORKERS,
+        max_limit: int = DEFAULT_MAX_WORKERS,
+        interval: float = DEFAULT_CONTROL_INTERVAL,
+        max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+        latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"Expected 1 <= min <= max, got {min_limit} and {max_limit}")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(initial, min_limit), max_limit)
+        self.interval = interval
+        self.max_error_rate = max_error_rate
+        self.latency_tolerance = latency_tolerance
+        self.backlog: Callable[[], int] = lambda: 0
+        self.active = 0
+        self.increases = 0
+        self.decreases = 0
+        self.baseline: float | None = None
+        self.decisions: deque[dict[str, Any]] = deque(maxlen=MAX_DECISIONS)
+        self._started = time.monotonic()
+        self._slow_start = True
+        self._increased = False
+        self._throughput: float | None = None
+        self._released = asyncio.Event()
+        self._reset(self._started)
+
+    def _reset(self, now: float) -> None:
+        self._window_started = now
+        self._latencies: list[float] = []
+        self._errors = 0
+
+    async def acquire(self) -> None:
+        while self.active >= self.limit:
+            self._released.clear()
+            await self._released.wait()
+        self.active += 1
+
+    def release(self, latency: float | None = None, error: bool = False) -> None:
+        """Return the slot taken by `acquire` with the outcome of the request, if one was sent."""
+        self.active -= 1
+
+        if error:
+            self._errors += 1
+        elif latency is not None:
+            self._latencies.append(latency)
+
+        now = time.monotonic()
+        if now - self._window_started >= self.interval and len(self._latencies) + self._errors >= CONTROL_MIN_SAMPLES:
+            self.adjust(now)
+        self._released.set()
+
+    def adjust(self, now: float) -> None:
+        """Decide on the limit by the requests finished since the previous decision and start a new window."""
+        samples = len(self._latencies) + self._errors
+        if not samples or now <= self._window_started:
+            return
+
+        throughput = samples / (now - self._window_started)
+        error_rate = self._errors / samples
+        latency = median(self._latencies) if self._latencies else None
+        increased, self._increased = self._increased, False
+        previous_throughput, self._throughput = self._throughput, throughput
+        self._reset(now)
+
+        if latency is not None:
+            self.baseline = latency if self.baseline is None else min(latency, self.baseline * BASELINE_DRIFT)
+
+        decreased = max(self.min_limit, min(self.limit - 1, int(self.limit * DECREASE_FACTOR)))
+
+        if error_rate > self.max_error_rate:
+            self._decide(now, decreased, "errors")
+        elif latency is not None and latency > self.baseline * self.latency_tolerance:
+            self._decide(now, decreased, "latency")
+        elif not self.backlog():
+            return
+        elif increased and previous_throughput and throughput < previous_throughput * THROUGHPUT_TOLERANCE:
+            return
+        elif self._slow_start:
+            self._decide(now, min(self.max_limit, self.limit * 2), "slow start")
+        else:
+            self._decide(now, min(self.max_limit, self.limit + 1), "throughput")
+
+    def _decide(self, now: float, limit: int, reason: str) -> None:
+        if limit == self.limit:
+            return
+
+        if limit < self.limit:
+            self.decreases += 1
+            self._slow_start = False
+        else:
+            self.increases += 1
+            self._increased = True
+
+        module_logger.info("Concurrency limit %d -> %d by %s", self.limit, limit, reason)
+        self.limit = limit
+        self.decisions.append({"elapsed": round(now - self._started, 3), "limit": limit, "reason": reason})
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "decisions": list(self.decisions),
+        }
+
+    def __repr__(self):
+        return f"<ConcurrencyController limit={self.limit} active={self.active}>"
+
+
+@dataclass(kw_only=True, slots=True)
+class ScanOptions:
+    """Settings of scanning a single page shared by all workers."""
+
+    request_timeout: ClientTimeout = DEFAULT_REQUEST_TIMEOUT
+    executor: Executor | None = None
+    extractor: Extractor = DEFAULT_EXTRACTOR
+    stream: bool = False
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    max_body_bytes: int | None = None
+    user_agent: UserAgentMode = UserAgentMode.RANDOM
+    cache: PageCache | None = None
+    metrics: CrawlMetrics | None = None
+    robots: RobotsCache | None = None
+    dedup: Deduplicator | None = None
+    canonicalizer: Canonicalizer | None = None
+    scope: Scope | None = None
+    concurrency: ConcurrencyController | None = None
+    retries: Retries | None = None
+
+    def scope_of(self, url: URL) -> Host | Scope:
+        """Hosts allowed for links of the page: the crawl scope or the page host with subdomains."""
+        return self.scope if self.scope is not None else get_host(url.host)
+
+
+@dataclass(kw_only=True, slots=True)
+class PipelineOptions:
+    """Sizes of the crawl stages connected by bounded queues.
+
+    Fetchers download pages into a queue of `parse_queue_size` pages, `parse_concurrency` parsers
+    (by default one per parse process) extract links into a queue of `link_queue_size` pages read by the link sink.
+    A full queue blocks the stage before it, so fetching slows down when parsing falls behind.
+    """
+
+    parse_concurrency: int | None = None
+    parse_queue_size: int = DEFAULT_PARSE_QUEUE_SIZE
+    link_queue_size: int = DEFAULT_LINK_QUEUE_SIZE
+
+
+@dataclass(kw_only=True, slots=True)
+class FetchedPage:
+    """Downloaded page on its way to parsers.
+
+    `links` are already known for streamed and not modified pages, `streamed` ones are passed to the sink.
+    """
+
+    url: URL
+    body: bytes | None = None
+    encoding: str = "utf-8"
+    links: set[URL] | None = None
+    streamed: bool = False
+    content_hash: str | None = None
+    check_duplicate: bool = False
+    cached: CachedPage | None = None
+
+
+@dataclass(kw_only=True, slots=True)
+class PageLinks:
+    """Links of a page on its way to the link sink. The page is scanned with its `complete` part.
+
+    A `failed` part completes the url of a page failed after streaming some links, it is not scanned.
+    """
+
+    url: URL
+    links: set[URL]
+    complete: bool = True
+    redirect: bool = False
+    failed: bool = False
+    cached: CachedPage | None = None
+
+
+class ResultSink(Protocol):
+    """Receiver of every new found and scanned url."""
+
+    def record_found(self, url: URL) -> None: ...
+
+    def record_scanned(self, url: URL) -> None: ...
 
-    def __init__(self):
-        self._queue = asyncio.Queue[T]()
-        self._values = set()
 
-    def get(self) -> Coroutine[Any, Any, T]:
-        return self._queue.get()
+class ObservedSet(Generic[T]):
+    """Wrapper for set notifying listeners about every new element."""
 
-    def put_nowait(self, item: T) -> None:
-        if item not in self._values:
-            self._queue.put_nowait(item)
-            self._values.add(item)
+    def __init__(self, values: set[T]):
+        self.values = values
+        self.listeners: list[Callable[[T], None]] = []
 
-    def task_done(self) -> None:
-        self._queue.task_done()
+    def add(self, item: T) -> None:
+        if item not in self.values:
+            self.values.add(item)
+            for listener in self.listeners:
+                listener(item)
 
-    def join(self) -> Coroutine[Any, Any, None]:
-        return self._queue.join()
+    def update(self, items: Iterable[T]) -> None:
+        for item in items:
+            self.add(item)
 
-    def qsize(self) -> int:
-        return self._queue.qsize()
+    def __contains__(self, item: object) -> bool:
+        return item in self.values
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
 
     def __repr__(self):
-        return f"<UniqueQueue size={self.qsize()}>"
+        return f"<ObservedSet size={len(self)}>"
+
+
+class Budget:
+    """Limit of scanned urls taking into account the ones being scanned right now.
+
+    Workers reserve a place before taking a url, so no request is sent after the limit is reached.
+    """
+
+    def __init__(self, limit: int | None, spent: int = 0):
+        self.limit = limit
+        self.spent = spent
+        self.reserved = 0
+        self._released = asyncio.Event()
+
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.spent >= self.limit
+
+    async def reserve(self) -> None:
+        while self.limit is not None and self.spent + self.reserved >= self.limit:
+            self._released.clear()
+            await self._released.wait()
+        self.reserved += 1
+
+    def release(self) -> None:
+        self.reserved -= 1
+        self._released.set()
+
+    def spend(self, _item: Any = None) -> None:
+        self.spent += 1
+        if self.exhausted():
+            module_logger.info("Got %s", StopReason.SCANNED_LIMIT.value)
+            raise StopScanning(StopReason.SCANNED_LIMIT)
+
+
+def limit_listener(reason: StopReason, limit: int, collection: Sized) -> Callable[[Any], None]:
+    """Create listener stopping scanning as soon as the collection reaches the limit."""
+
+    def check(_item: Any) -> None:
+        if len(collection) >= limit:
+            module_logger.info("Got %s", reason.value)
+            raise StopScanning(reason)
 
+    return check
 
-async def work(
+
+def robots_allow(url: URL, found: ObservedSet[URL], robots: RobotsCache | None) -> bool:
+    """Check the url by the cached robots.txt before queueing, so a disallowed url never takes a slot of its host.
+
+    A new disallowed url is counted, it must be checked before adding to found.
+    """
+    if robots is None or not robots.disallows(url):
+        return True
+
+    if url not in found:
+        module_logger.info("Disallowed by robots.txt: %s", url)
+        robots.disallowed += 1
+    return False
+
+
+def retry_failed(url: URL, error_class: ErrorClass, reason: str, queue: Scheduler, retries: Retries) -> bool:
+    """Give the url back to the scheduler for another attempt, False if it has failed for good."""
+    delay, paused_until = retries.failure(url, error_class, reason)
+
+    if paused_until is not None:
+        queue.pause(url.host, paused_until)
+    if delay is None:
+        return False
+
+    queue.retry(url, delay)
+    return True
+
+
+async def fetch(
     name: str,
     session: ClientSession,
-    queue: UniqueQueue[URL],
-    found: set[URL],
-    scanned: set[URL],
-    timeout: ClientTimeout,
+    queue: Scheduler,
+    pages: asyncio.Queue[FetchedPage],
+    links: asyncio.Queue[PageLinks],
+    options: ScanOptions,
+    budget: Budget,
 ) -> None:
+    """Fetching stage: download pages of the frontier and pass them to parsers.
+
+    Redirects are passed straight to the link sink. Streamed pages are parsed while downloading,
+    their links go to the sink as they are extracted unless the page has to be checked for duplicates.
+    """
     logger = module_logger.getChild(name)
+    concurrency = options.concurrency
 
     while True:
+        if concurrency is not None:
+            await concurrency.acquire()
+        await budget.reserve()
         url = await queue.get()
+        latency = status = retry_after = None
+        error = retrying = streamed = False
+        result: FetchedPage | PageLinks | None = None
+        metrics = options.metrics
+
+        if metrics is not None:
+            metrics.in_flight += 1
 
         try:
-            host = Host(url.host)
-            headers = {"User-Agent": user_agent.random}
+            headers = request_headers(options.user_agent)
+
+            if options.robots is not None:
+                rules = await options.robots.get(session, url, options.request_timeout, headers)
+                if rules.crawl_delay is not None:
+                    queue.set_min_delay(url.host, rules.crawl_delay)
+                if not rules.allowed(url):
+                    logger.info("Disallowed by robots.txt: %s", url)
+                    options.robots.disallowed += 1
+                    continue
+
+            cached = options.cache.get(url) if options.cache is not None else None
+
+            if cached is not None:
+                headers = {**(headers or {}), **cached.conditional_headers()}
+
             logger.info("Started scanning: %s", url)
+            started = time.monotonic()
+
+            async with session.get(url, allow_redirects=False, timeout=options.request_timeout, headers=headers) as response:
+                latency = time.monotonic() - started
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+
+                if metrics is not None:
+                    metrics.statuses[status] += 1
+
+                if options.retries is not None:
+                    if (error_class := classify(status=status)) is None:
+                        options.retries.success(url)
+                    elif retrying := retry_failed(url, error_class, f"HTTP {status}", queue, options.retries):
+                        continue
 
-            async with session.get(url, allow_redirects=False, timeout=timeout, headers=headers) as response:
                 if response.status in (301, 302):
                     raw_redirect = response.headers["location"]
                     logger.info("Got %d redirect: %s", response.status, raw_redirect)
-                    scanned.add(url)
-                    found.add(url)
 
-                    if redirect_url := normalize_url(url, host, raw_redirect):
-                        queue.put_nowait(redirect_url)
-                        found.add(redirect_url)
-                        logger.info("Redirect added to the end of queue: %s", redirect_url)
+                    if redirect_url := normalize_url(url, options.scope_of(url), raw_redirect, options.canonicalizer):
+                        result = PageLinks(url=url, links={redirect_url}, redirect=True)
+                        logger.info("Redirect added to queue: %s", redirect_url)
                     else:
+                        result = PageLinks(url=url, links=set(), redirect=True)
                         logger.info("Redirect skipped")
                     continue
 
+                if response.status == 304 and cached is not None:
+                    logger.info("Not modified, links are taken from cache")
+                    options.cache.hits += 1
+                    result = FetchedPage(
+                        url=url,
+                        links={URL(link, encoded=True) for link in cached.links},
+                        content_hash=cached.content_hash,
+                        check_duplicate=options.dedup is not None and cached.content_hash is not None,
+                    )
+                    continue
+
                 if not response.ok:
                     logger.info("Got bad response %d: %s", response.status, response.reason)
 
-                html = await response.text()
-                page_links = await scan_page(url, host, html)
-                scanned.add(url)
+                digest = content_digest()
+                download_started = time.monotonic()
+                # With dedup links of a page are queued only when it is known not to be a duplicate
+                check_duplicate = options.dedup is not None and response.ok
+                page = FetchedPage(url=url, check_duplicate=check_duplicate)
+
+                if options.stream:
+                    page.links = set()
+                    page.streamed = not check_duplicate
+                    chunks = hash_chunks(response.content.iter_chunked(options.chunk_size), digest)
+                    body = BodyBuffer() if check_duplicate and options.dedup.mode is DedupMode.NEAR else None
+
+                    if body is not None:
+                        chunks = hash_chunks(chunks, body)
+
+                    links_stream = scan_stream(
+                        url, options.scope_of(url), chunks, response.charset, options.max_body_bytes, metrics,
+                        options.canonicalizer)
+
+                    async for new_links in links_stream:
+                        page.links.update(new_links)
+
+                        if page.streamed:
+                            await links.put(PageLinks(url=url, links=new_links, complete=False))
+                            streamed = True
+
+                    page.body = body.data if body is not None else None
+                else:
+                    page.body = await response.read()
+                    page.encoding = response.get_encoding()
+                    digest.update(page.body)
 
-                found_before = len(found)
-                found.update(page_links)
+                if metrics is not None:
+                    metrics.observe(Stage.DOWNLOAD, time.monotonic() - download_started)
 
-                for link in page_links:
-                    queue.put_nowait(link)
+                page.content_hash = digest.hexdigest()
 
-                logger.info("Found links: %d new, %d in total", len(found) - found_before, len(page_links))
-                logger.debug("Current queue size is %d", queue.qsize())
+                if options.cache is not None and response.status == 200:
+                    page.cached = CachedPage(
+                        etag=response.headers.get("ETag"),
+                        last_modified=response.headers.get("Last-Modified"),
+                        content_hash=page.content_hash,
+                        links=[],
+                    )
+                result = page
 
         except ClientConnectionError as e:
             logger.error(e)
+            error = True
+            if metrics is not None:
+                metrics.errors += 1
+            if options.retries is not None:
+                retrying = retry_failed(url, ErrorClass.CONNECTION, str(e) or type(e).__name__, queue, options.retries)
             continue
 
         except asyncio.TimeoutError:
             logger.warning("Cannot get response from %s", url)
+            error = True
+            if metrics is not None:
+                metrics.errors += 1
+            if options.retries is not None:
+                retrying = retry_failed(url, ErrorClass.TIMEOUT, "timeout", queue, options.retries)
             continue
 
         finally:
-            queue.task_done()
+            if metrics is not None:
+                metrics.in_flight -= 1
+                if status is not None:
+                    metrics.pages += 1
+                    metrics.bytes += response.content.total_bytes
+            if concurrency is not None:
+                concurrency.release(latency, error or status == 429 or status is not None and status >= 500)
+            queue.release(url, latency, status, retry_after)
+
+            # Streamed links are still on the way to the sink, the url must not be done before them
+            if result is None and streamed and not retrying:
+                result = PageLinks(url=url, links=set(), failed=True)
+
+            # A retried url is not done, so the frontier is not joined while it waits
+            if retrying:
+                budget.release()
+            elif result is None:
+                budget.release()
+                queue.task_done(url)
+
+            # Waiting for a place in the next stage holds the budget, but not the host slot
+            elif isinstance(result, PageLinks):
+                await links.put(result)
+            else:
+                await pages.put(result)
+
+
+async def parse_pages(
+    name: str,
+    pages: asyncio.Queue[FetchedPage],
+    links: asyncio.Queue[PageLinks],
+    options: ScanOptions,
+) -> None:
+    """Parsing stage: drop duplicates and extract links of downloaded pages, in the executor if there is one."""
+    logger = module_logger.getChild(name)
 
+    while True:
+        page = await pages.get()
+        page_links = page.links
+        original = None
+
+        if page.check_duplicate:
+            original = options.dedup.check(page.url, page.content_hash, page.body)
+
+        if original is not None:
+            logger.info("Duplicate of %s, links are skipped", original)
+            page_links = set()
+            # Links are not known, a cached empty list would drop them on a later 304
+            page.cached = None
+        elif page_links is None:
+            page_links = await scan_page(
+                page.url, options.scope_of(page.url), page.body.decode(page.encoding), options.executor,
+                options.extractor, options.metrics, options.canonicalizer)
+
+        if page.cached is not None:
+            page.cached.links = [str(link) for link in page_links]
+
+        await links.put(PageLinks(url=page.url, links=set() if page.streamed else page_links, cached=page.cached))
+
+
+async def sink_links(
+    queue: Scheduler,
+    links: asyncio.Queue[PageLinks],
+    found: ObservedSet[URL],
+    scanned: ObservedSet[URL],
+    options: ScanOptions,
+    budget: Budget,
+) -> None:
+    """Link sink stage: record scanned pages and queue their new links, the frontier drops already seen ones."""
+    logger = module_logger.getChild("sink")
 
-async def watch_for_scanning_completion(queue: UniqueQueue[URL]) -> None:
-    await queue.join()
-    module_logger.info("All urls have been processed")
-    raise StopScanning(StopReason.ALL_PROCESSED)
+    while True:
+        page = await links.get()
+        found_before = len(found)
+        allowed = [link for link in page.links if robots_allow(link, found, options.robots)]
+
+        try:
+            if page.redirect:
+                found.add(page.url)
 
+            found.update(page.links)
 
-async def watch_for_numeric_limit(
-    reason: StopReason,
-    limit: int | None,
-    collection: Sized,
-    check_interval: float,
-) -> None:
-    if limit:
-        while True:
-            if len(collection) >= limit:
-                module_logger.info("Got %s", reason.value)
-                raise StopScanning(reason)
+            for link in allowed:
+                queue.put_nowait(link, page.url, redirect=page.redirect)
+        finally:
+            # Limits stop the crawl by raising, the page must be recorded along with its links either way
+            if page.complete and not page.failed:
+                scanned.add(page.url)
 
-            await asyncio.sleep(check_interval)
+        if not page.complete:
+            continue
+
+        if page.cached is not None:
+            options.cache.put(page.url, page.cached)
+
+        if not page.redirect and not page.failed:
+            logger.info("Found links: %d new, %d in total", len(found) - found_before, len(page.links))
+            logger.debug("Current queue size is %d", queue.qsize())
+
+        budget.release()
+        queue.task_done(page.url)
+
+
+async def seed_from_sitemaps(
+    session: ClientSession,
+    url: URL,
+    queue: Scheduler,
+    found: ObservedSet[URL],
+    robots: RobotsCache,
+    options: ScanOptions,
+) -> None:
+    """Queue pages listed in sitemaps of robots.txt or in /sitemap.xml while crawling."""
+    headers = request_headers(options.user_agent)
+    rules = await robots.get(session, url, options.request_timeout, headers)
+    sitemaps = [URL(sitemap) for sitemap in rules.sitemaps] or [url.origin().with_path("/sitemap.xml")]
+    scope = options.scope_of(url)
+    found_before = len(found)
+
+    async with aclosing(iter_sitemap_urls(session, sitemaps, headers=headers)) as locations:
+        async for location in locations:
+            if link := normalize_url(url, scope, location, options.canonicalizer):
+                if robots_allow(link, found, options.robots):
+                    queue.put_nowait(link, url)
+                found.add(link)
+
+    module_logger.info("Found in sitemaps: %d", len(found) - found_before)
+
+
+async def watch_for_scanning_completion(queue: Scheduler, seeding: asyncio.Task | None = None) -> None:
+    # Urls may be processed before the seeding queues all of its own
+    if seeding is not None:
+        await seeding
+    await queue.join()
+    module_logger.info("All urls have been processed")
+    raise StopScanning(StopReason.ALL_PROCESSED)
 
 
 async def parse(
@@ -154,36 +671,180 @@ async def parse(
     scanned: set[URL] | None = None,
     request_timeout: ClientTimeout = DEFAULT_REQUEST_TIMEOUT,
     workers_number: int = DEFAULT_WORKERS_NUMBER,
-    check_interval: float = DEFAULT_CHECK_INTERVAL,
+    parse_workers: int = DEFAULT_PARSE_WORKERS,
+    extractor: Extractor = DEFAULT_EXTRACTOR,
+    stream: bool = False,
+    max_body_bytes: int | None = None,
+    frontier: Frontier | None = None,
+    memory_budget: int | None = None,
+    bloom_error_rate: float | None = None,
+    per_host_limit: int | None = None,
+    per_host_rate: float | None = None,
+    adaptive_delay: bool = False,
+    session_options: SessionOptions | None = None,
+    connection_stats: ConnectionStats | None = None,
+    cache: PageCache | None = None,
+    checkpoint: Checkpoint | None = None,
+    site_tree: SiteTree | None = None,
+    report: NdjsonReport | None = None,
+    metrics: CrawlMetrics | None = None,
+    metrics_sinks: Iterable[MetricsSink] = (),
+    budget: Budget | None = None,
+    sinks: Iterable[ResultSink] = (),
+    ordering: Ordering = Ordering.FIFO,
+    priority_rules: Iterable[PriorityRule] = (),
+    redirects_first: bool = False,
+    robots: RobotsCache | None = None,
+    sitemaps: bool = False,
+    dedup: Deduplicator | None = None,
+    canonical: CanonicalRules | None = None,
+    scope: Scope | None = None,
+    pipeline: PipelineOptions | None = None,
+    concurrency: ConcurrencyController | None = None,
+    retries: Retries | None = None,
 ) -> tuple[set[URL], set[URL], StopReason]:
-    url = URL(url)
-    queue = UniqueQueue[URL]()
-    queue.put_nowait(url)
+    canonicalizer = Canonicalizer(canonical) if canonical is not None else None
+    url = URL(url) if canonicalizer is None else canonicalizer.canonicalize(URL(url))
+
+    if scope is None:
+        scope = Scope.for_url(url)
+    priority_rules = tuple(priority_rules)
+
+    if frontier is not None:
+        queue = frontier
+    elif ordering is Ordering.FIFO and not priority_rules and not redirects_first:
+        queue = Frontier.create(memory_budget, bloom_error_rate)
+    else:
+        queue = PriorityFrontier.create(memory_budget, bloom_error_rate, ordering, priority_rules, redirects_first)
+    scheduler = Scheduler(queue, per_host_limit, per_host_rate, adaptive_delay)
 
     if found is None:
         found = set()
     if scanned is None:
         scanned = set()
 
-    found.add(url)
+    if session_options is None:
+        session_options = SessionOptions()
+    if pipeline is None:
+        pipeline = PipelineOptions()
+
+    if checkpoint is not None and checkpoint.resume:
+        previous_found, previous_scanned = checkpoint.load()
+        found.update(previous_found)
+        scanned.update(previous_scanned)
+
+        for scanned_url in scanned:
+            queue.mark_seen(scanned_url)
+        for found_url in found - scanned:
+            scheduler.put_nowait(found_url)
+
+    found_observed = ObservedSet(found)
+    scanned_observed = ObservedSet(scanned)
+
+    if checkpoint is not None:
+        found_observed.listeners.append(checkpoint.record_found)
+        scanned_observed.listeners.append(checkpoint.record_scanned)
+    if site_tree is not None:
+        for found_url in found:
+            site_tree.insert(found_url)
+        found_observed.listeners.append(site_tree.insert)
+    for sink in sinks:
+        found_observed.listeners.append(sink.record_found)
+        scanned_observed.listeners.append(sink.record_scanned)
+    if report is not None:
+        for scanned_url in scanned:
+            report.record_scanned(scanned_url)
+        scanned_observed.listeners.append(report.record_scanned)
+
+    scheduler.put_nowait(url)
+    found_observed.add(url)
     reason = None
+    if budget is None:
+        budget = Budget(max_scanned, len(scanned))
+
+    if max_found:
+        found_observed.listeners.append(limit_listener(StopReason.FOUND_LIMIT, max_found, found))
+    if budget.limit:
+        scanned_observed.listeners.append(budget.spend)
+
+    executor = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+    options = ScanOptions(
+        request_timeout=request_timeout,
+        executor=executor,
+        extractor=extractor,
+        stream=stream,
+        max_body_bytes=max_body_bytes,
+        user_agent=session_options.user_agent,
+        cache=cache,
+        metrics=metrics,
+        robots=robots,
+        dedup=dedup,
+        canonicalizer=canonicalizer,
+        scope=scope,
+        concurrency=concurrency,
+        retries=retries,
+    )
+
+    pages = asyncio.Queue[FetchedPage](pipeline.parse_queue_size)
+    links = asyncio.Queue[PageLinks](pipeline.link_queue_size)
+    parse_concurrency = pipeline.parse_concurrency or max(parse_workers, 1)
+
+    if concurrency is not None:
+        # Spare workers wait for the controller to raise the limit
+        workers_number = concurrency.max_limit
+        concurrency.backlog = scheduler.qsize
+
+    if metrics is not None:
+        metrics.queue_size = scheduler.qsize
+        metrics.stage_queues = {"parse": pages.qsize, "sink": links.qsize}
+        if concurrency is not None:
+            metrics.concurrency_limit = lambda: concurrency.limit
 
     try:
         async with asyncio.timeout(timeout):
-            async with ClientSession() as session:
+            async with create_session(session_options, connection_stats, metrics) as session:
                 try:
+                    if max_found and len(found) >= max_found:
+                        raise StopScanning(StopReason.FOUND_LIMIT)
+                    if budget.exhausted():
+                        raise StopScanning(StopReason.SCANNED_LIMIT)
+
+                    if robots is not None:
+                        rules = await robots.get(session, url, request_timeout, request_headers(options.user_agent))
+                        if rules.crawl_delay is not None:
+                            scheduler.set_min_delay(url.host, rules.crawl_delay)
+
                     async with asyncio.TaskGroup() as tg:
+                        if sitemaps:
+                            # Sitemaps are listed in robots.txt even if it is not obeyed
+                            seeding = tg.create_task(
+                                seed_from_sitemaps(
+                                    session, url, scheduler, found_observed, robots or RobotsCache(), options),
+                                name="sitemaps")
+                        else:
+                            seeding = None
+
                         for i in range(1, workers_number + 1):
                             name = f"worker-{i}"
-                            tg.create_task(work(name, session, queue, found, scanned, request_timeout), name=name)
+                            tg.create_task(
+                                fetch(name, session, scheduler, pages, links, options, budget), name=name)
+
+                        for i in range(1, parse_concurrency + 1):
+                            name = f"parser-{i}"
+                            tg.create_task(parse_pages(name, pages, links, options), name=name)
 
                         tg.create_task(
-                            watch_for_numeric_limit(StopReason.FOUND_LIMIT, max_found, found, check_interval),
-                            name="found-watcher")
-                        tg.create_task(
-                            watch_for_numeric_limit(StopReason.SCANNED_LIMIT, max_scanned, scanned, check_interval),
-                            name="scanned-watcher")
-                        tg.create_task(watch_for_scanning_completion(queue), name="completion-watcher")
+                            sink_links(scheduler, links, found_observed, scanned_observed, options, budget),
+                            name="sink")
+
+                        tg.create_task(watch_for_scanning_completion(scheduler, seeding), name="completion-watcher")
+
+                        if checkpoint is not None:
+                            tg.create_task(checkpoint.run(), name="checkpoint")
+
+                        if metrics is not None:
+                            for i, sink in enumerate(metrics_sinks, 1):
+                                tg.create_task(sink.run(metrics), name=f"metrics-sink-{i}")
 
                 except* StopScanning as eg:
                     exception = cast(StopScanning, eg.exceptions[0])
@@ -203,6 +864,16 @@ async def parse(
         if reason is None:
             reason = StopReason.RUNTIME_ERROR
 
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if frontier is None:
+            queue.close()
+        if cache is not None:
+            cache.commit()
+        if checkpoint is not None:
+            checkpoint.close()
+
     return found, scanned, reason
 
 
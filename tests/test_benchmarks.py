@@ -0,0 +1,45 @@
+from benchmarks.run import compare, tree_urls
+from benchmarks.site import SiteConfig, children, is_error, render_page, serve_site
+from parser.web import StopReason, parse
+
+
+class TestSite:
+    def test_shape(self):
+        config = SiteConfig(fan_out=3, depth=2)
+        assert config.pages == 13
+        assert list(children(config, 0)) == [1, 2, 3]
+        assert list(children(config, 3)) == [10, 11, 12]
+        assert list(children(config, 4)) == []
+        assert len(tree_urls(config)) == 13
+
+    def test_page_is_reproducible(self):
+        config = SiteConfig(page_size=4096, link_density=3)
+        page = render_page(config, 5)
+        assert page == render_page(config, 5)
+        assert 4096 <= len(page) < 4096 + 100
+        assert page.count("<a href") == config.fan_out + 3
+
+    def test_error_rate(self):
+        config = SiteConfig(fan_out=10, depth=3, error_rate=0.2)
+        errors = sum(is_error(config, page_id) for page_id in range(config.pages))
+        assert 0.15 < errors / config.pages < 0.25
+
+    async def test_crawl(self):
+        config = SiteConfig(fan_out=3, depth=2, page_size=1024, link_density=2, redirect_chain=2, redirect_every=2)
+        async with serve_site(config) as url:
+            found, scanned, reason = await parse(url)
+
+        assert reason == StopReason.ALL_PROCESSED
+        assert sum(url.path.startswith("/page/") for url in scanned) == config.pages
+        assert sum(url.path.startswith("/redirect/2/") for url in scanned) == 6
+
+
+class TestCompare:
+    def test_regressions(self):
+        baseline = {"benchmarks": {"crawl": {"throughput": 100, "latency_p99": 0.1, "items": 10}}}
+        current = {"benchmarks": {
+            "crawl": {"throughput": 85, "latency_p99": 0.105, "items": 20},
+            "scan_page": {"throughput": 1},
+        }}
+        assert compare(baseline, current, tolerance=0.1) == ["crawl.throughput: 85 < 100"]
+        assert compare(baseline, current, tolerance=0.2) == []
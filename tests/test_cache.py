@@ -0,0 +1,58 @@
+from hashlib import blake2b
+
+from yarl import URL
+
+from parser.cache import CachedPage, PageCache, content_digest, hash_chunks
+
+
+async def test_hash_chunks():
+    async def chunks():
+        yield b"first"
+        yield b"second"
+
+    digest = content_digest()
+    assert [chunk async for chunk in hash_chunks(chunks(), digest)] == [b"first", b"second"]
+    assert digest.hexdigest() == blake2b(b"firstsecond", digest_size=16).hexdigest()
+
+
+class TestCachedPage:
+    def test_conditional_headers(self):
+        assert CachedPage(links=[]).conditional_headers() == {}
+        assert CachedPage(etag='"abc"', last_modified="Wed, 21 Oct 2015 07:28:00 GMT", links=[]).conditional_headers() == {
+            "If-None-Match": '"abc"',
+            "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+        }
+
+
+class TestPageCache:
+    def test_missing(self, tmp_path):
+        with PageCache(tmp_path / "cache.db") as cache:
+            assert cache.get(URL("https://example.org")) is None
+
+    def test_put_and_get(self, tmp_path):
+        url = URL("https://example.org")
+        page = CachedPage(etag='"abc"', content_hash="hash", links=["https://example.org/first"])
+
+        with PageCache(tmp_path / "cache.db") as cache:
+            cache.put(url, page)
+            assert cache.get(url) == page
+            assert len(cache) == 1
+
+    def test_persistence(self, tmp_path):
+        url = URL("https://example.org")
+        page = CachedPage(last_modified="Wed, 21 Oct 2015 07:28:00 GMT", links=[])
+
+        with PageCache(tmp_path / "cache.db") as cache:
+            cache.put(url, page)
+
+        with PageCache(tmp_path / "cache.db") as cache:
+            assert cache.get(url) == page
+
+    def test_replacing(self, tmp_path):
+        url = URL("https://example.org")
+
+        with PageCache(tmp_path / "cache.db") as cache:
+            cache.put(url, CachedPage(etag="1", links=["https://example.org/old"]))
+            cache.put(url, CachedPage(etag="2", links=["https://example.org/new"]))
+            assert cache.get(url).links == ["https://example.org/new"]
+            assert len(cache) == 1
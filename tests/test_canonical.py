@@ -0,0 +1,44 @@
+import pytest
+from yarl import URL
+
+from parser.canonical import CanonicalRules, Canonicalizer, TrailingSlash
+
+
+def canonical(url: str, **rules) -> str:
+    return str(Canonicalizer(CanonicalRules(**rules)).canonicalize(URL(url)))
+
+
+def test_defaults():
+    url = URL("https://example.org/a/")
+    assert Canonicalizer().canonicalize(url) is url
+    assert canonical("HTTPS://Example.org:443/a/./b/../c") == "https://example.org/a/c"
+    assert canonical("https://example.org/%7euser/%e2%82%ac") == "https://example.org/~user/%E2%82%AC"
+    assert canonical("https://example.org/a?b=1#top") == "https://example.org/a"
+
+
+@pytest.mark.parametrize("policy, url, expected", [
+    (TrailingSlash.STRIP, "https://example.org/a/", "https://example.org/a"),
+    (TrailingSlash.STRIP, "https://example.org/", "https://example.org/"),
+    (TrailingSlash.ADD, "https://example.org/a", "https://example.org/a/"),
+    (TrailingSlash.ADD, "https://example.org/a/page.html", "https://example.org/a/page.html"),
+    (TrailingSlash.KEEP, "https://example.org/a", "https://example.org/a"),
+])
+def test_trailing_slash(policy, url, expected):
+    assert canonical(url, trailing_slash=policy) == expected
+
+
+def test_query():
+    url = "https://example.org/a?utm_source=x&b=2&a=1&a=0&c=%20"
+    assert canonical(url, keep_query=True) == "https://example.org/a?a=1&a=0&b=2&c=%20&utm_source=x"
+    assert canonical(url, keep_query=True, deny_params=("utm_*", "c")) == "https://example.org/a?a=1&a=0&b=2"
+    assert canonical(url, allow_params=("b",)) == "https://example.org/a?b=2"
+    assert canonical("https://example.org/a?utm_source=x", allow_params=("b",)) == "https://example.org/a"
+
+
+def test_host_aliases():
+    assert canonical("https://www.example.org/a", host_aliases={"www.example.org": "example.org"}) == \
+        "https://example.org/a"
+    assert CanonicalRules.parse_alias("WWW.example.org = example.org") == ("www.example.org", "example.org")
+
+    with pytest.raises(ValueError):
+        CanonicalRules.parse_alias("example.org")
@@ -0,0 +1,76 @@
+from yarl import URL
+
+from parser.checkpoint import Checkpoint
+
+
+class TestCheckpoint:
+    def test_missing_file(self, tmp_path):
+        assert Checkpoint(tmp_path / "crawl.log").load() == (set(), set())
+
+    def test_flush_and_load(self, tmp_path):
+        checkpoint = Checkpoint(tmp_path / "crawl.log")
+        checkpoint.record_found(URL("https://example.org"))
+        checkpoint.record_found(URL("https://example.org/first"))
+        checkpoint.record_scanned(URL("https://example.org"))
+        checkpoint.close()
+
+        found, scanned = Checkpoint(tmp_path / "crawl.log").load()
+        assert found == {URL("https://example.org"), URL("https://example.org/first")}
+        assert scanned == {URL("https://example.org")}
+
+    def test_incremental_writes(self, tmp_path):
+        path = tmp_path / "crawl.log"
+        checkpoint = Checkpoint(path)
+        checkpoint.record_found(URL("https://example.org"))
+        checkpoint.flush()
+        size = path.stat().st_size
+
+        checkpoint.flush()
+        assert path.stat().st_size == size
+
+        checkpoint.record_scanned(URL("https://example.org"))
+        checkpoint.flush()
+        assert path.read_text().splitlines() == ["F\thttps://example.org", "S\thttps://example.org"]
+        checkpoint.close()
+
+    def test_new_checkpoint_overwrites(self, tmp_path):
+        path = tmp_path / "crawl.log"
+        path.write_text("F\thttps://example.org/old\n")
+
+        checkpoint = Checkpoint(path)
+        checkpoint.record_found(URL("https://example.org/new"))
+        checkpoint.close()
+        assert Checkpoint(path).load()[0] == {URL("https://example.org/new")}
+
+    def test_resume_appends(self, tmp_path):
+        path = tmp_path / "crawl.log"
+        path.write_text("F\thttps://example.org/old\n")
+
+        checkpoint = Checkpoint(path, resume=True)
+        checkpoint.record_found(URL("https://example.org/new"))
+        checkpoint.close()
+        assert Checkpoint(path).load()[0] == {URL("https://example.org/old"), URL("https://example.org/new")}
+
+    def test_incomplete_record(self, tmp_path):
+        path = tmp_path / "crawl.log"
+        path.write_text("F\thttps://example.org\nS\thttps://exa")
+        assert Checkpoint(path).load() == ({URL("https://example.org")}, set())
+
+    def test_resume_after_incomplete_record(self, tmp_path):
+        path = tmp_path / "crawl.log"
+        path.write_text("F\thttps://example.org\nS\thttps://exa")
+
+        for page in ("first", "second"):
+            checkpoint = Checkpoint(path, resume=True)
+            checkpoint.load()
+            checkpoint.record_found(URL(f"https://example.org/{page}"))
+            checkpoint.close()
+
+        found, scanned = Checkpoint(path).load()
+        assert found == {
+            URL("https://example.org"),
+            URL("https://example.org/first"),
+            URL("https://example.org/second"),
+        }
+        assert scanned == set()
+        assert path.read_text().endswith("F\thttps://example.org/second\n")
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.site import SiteConfig, serve_site
+from parser.coordinator import Coordinator, RemoteFrontier
+from parser.web import StopReason, StopScanning, parse
+
+
+class TestCoordinator:
+    def test_leases(self):
+        coordinator = Coordinator()
+        response = coordinator.sync("a", put=["https://example.org", "https://example.org"], want=5)
+        assert response == {"leases": ["https://example.org"], "stop": None}
+
+        response = coordinator.sync("b", put=["https://example.org", "https://example.org/a"], want=5)
+        assert response == {"leases": ["https://example.org/a"], "stop": None}
+
+        coordinator.sync("a", scanned=["https://example.org"], completed=["https://example.org"])
+        assert coordinator.reason is None
+
+        response = coordinator.sync("b", scanned=["https://example.org/a"], completed=["https://example.org/a"])
+        assert response["stop"] == "ALL_PROCESSED"
+        assert coordinator.found == ["https://example.org", "https://example.org/a"]
+        assert coordinator.scanned == ["https://example.org", "https://example.org/a"]
+
+    def test_expired_lease(self):
+        coordinator = Coordinator(lease_timeout=0.01)
+        coordinator.sync("a", put=["https://example.org"], want=1)
+        assert coordinator.sync("b", want=1)["leases"] == []
+
+        time.sleep(0.02)
+        assert coordinator.sync("b", want=1)["leases"] == ["https://example.org"]
+
+        coordinator.sync("a", completed=["https://example.org"])
+        assert coordinator.status()["leased"] == 1
+
+    def test_scanned_limit(self):
+        coordinator = Coordinator(max_scanned=2)
+        urls = [f"https://example.org/{i}" for i in range(5)]
+        assert coordinator.sync("a", put=urls, want=5)["leases"] == urls[:2]
+
+        coordinator.sync("a", scanned=urls[:1], completed=urls[:1])
+        assert coordinator.sync("a", want=5)["leases"] == []
+
+        response = coordinator.sync("a", scanned=urls[1:2], completed=urls[1:2])
+        assert response["stop"] == "SCANNED_LIMIT"
+
+    def test_found_limit(self):
+        coordinator = Coordinator(max_found=2)
+        response = coordinator.sync("a", put=[f"https://example.org/{i}" for i in range(5)])
+        assert response["stop"] == "FOUND_LIMIT"
+        assert len(coordinator.found) == 2
+
+    def test_bad_request(self):
+        coordinator = Coordinator()
+        with pytest.raises(ValueError):
+            coordinator.handle({"op": "unknown"})
+        assert coordinator.handle({"op": "stop", "reason": "TIMEOUT"})["stop"] == "TIMEOUT"
+
+
+class TestRemoteFrontier:
+    async def crawl(self, config: SiteConfig, coordinator: Coordinator, nodes: int):
+        async with serve_site(config) as url:
+            server = await coordinator.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+
+            async def node(name: str):
+                async with RemoteFrontier(port=port, node=name) as frontier:
+                    return await parse(url, frontier=frontier, sinks=[frontier])
+
+            async with server:
+                results = await asyncio.gather(*(node(str(i)) for i in range(nodes)), coordinator.wait())
+
+        return results[:-1]
+
+    async def test_nodes_share_crawl(self):
+        config = SiteConfig(fan_out=4, depth=2, page_size=1024, link_density=3)
+        coordinator = Coordinator()
+        results = await self.crawl(config, coordinator, nodes=2)
+
+        assert coordinator.reason == StopReason.ALL_PROCESSED
+        assert len(coordinator.scanned) == len(coordinator.found) == config.pages
+        assert sum(len(scanned) for found, scanned, reason in results) == config.pages
+        assert all(reason == StopReason.ALL_PROCESSED for found, scanned, reason in results)
+
+    async def test_shared_stop_reason(self):
+        config = SiteConfig(fan_out=4, depth=2, page_size=1024)
+        coordinator = Coordinator(max_scanned=5)
+        results = await self.crawl(config, coordinator, nodes=2)
+
+        assert len(coordinator.scanned) == 5
+        assert all(reason == StopReason.SCANNED_LIMIT for found, scanned, reason in results)
+
+    async def test_join_raises_reason(self):
+        coordinator = Coordinator()
+        server = await coordinator.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        async with server:
+            async with RemoteFrontier(port=port) as frontier:
+                coordinator.stop(StopReason.TIMEOUT)
+                with pytest.raises(StopScanning):
+                    await asyncio.wait_for(frontier.join(), 1)
@@ -0,0 +1,127 @@
+from typing import AsyncIterator
+
+import pytest
+from aiohttp import web
+from yarl import URL
+
+from parser.cache import PageCache
+from parser.dedup import BodyBuffer, DedupMode, Deduplicator, hamming_distance, page_words, simhash
+from parser.web import StopReason, parse
+
+TEXT = " ".join(f"word{i}" for i in range(300))
+
+
+def page(text: str, links: list[str] = ()) -> str:
+    anchors = "".join(f'<a href="{link}">{link}</a>' for link in links)
+    return f"<html><head><style>p {{ color: red }}</style></head><body><p>{text}</p>{anchors}</body></html>"
+
+
+def test_page_words():
+    assert page_words(page("Hello, World!").encode()) == ["hello", "world"]
+
+
+def test_simhash():
+    original = simhash(TEXT.split())
+    similar = simhash((TEXT + " extra").split())
+    different = simhash(" ".join(f"other{i}" for i in range(300)).split())
+
+    assert hamming_distance(original, similar) <= 3
+    assert hamming_distance(original, different) > 10
+
+
+def test_body_buffer():
+    body = BodyBuffer(limit=5)
+    body.update(b"abc")
+    body.update(b"def")
+    body.update(b"ghi")
+    assert body.data == b"abcde"
+
+
+class TestDeduplicator:
+    def test_exact(self):
+        dedup = Deduplicator()
+        assert dedup.check(URL("https://example.org/"), "a") is None
+        assert dedup.check(URL("https://example.org/b"), "b") is None
+        assert dedup.check(URL("https://example.org/index.html"), "a") == "https://example.org/"
+        assert dedup.check(URL("https://example.org/?id=1"), "a") == "https://example.org/"
+
+        assert dedup.as_dict() == {
+            "mode": "exact",
+            "pages": 4,
+            "duplicates": 2,
+            "clusters": {"https://example.org/": ["https://example.org/?id=1", "https://example.org/index.html"]},
+        }
+
+    def test_near(self):
+        dedup = Deduplicator(DedupMode.NEAR)
+        assert dedup.check(URL("https://example.org/a"), "a", page(TEXT).encode()) is None
+        assert dedup.check(URL("https://example.org/b"), "b", page(TEXT + " b").encode()) == "https://example.org/a"
+        assert dedup.check(URL("https://example.org/c"), "c", page("other text").encode()) is None
+        # Near duplicate is remembered by its hash, the exact copy of it is a duplicate of the same original
+        assert dedup.check(URL("https://example.org/d"), "b") == "https://example.org/a"
+        assert dedup.duplicates == 2
+
+    def test_near_without_body(self):
+        dedup = Deduplicator(DedupMode.NEAR)
+        assert dedup.check(URL("https://example.org/a"), "a", page(TEXT).encode()) is None
+        assert dedup.check(URL("https://example.org/b"), "b") is None
+
+    def test_invalid_distance(self):
+        with pytest.raises(ValueError):
+            Deduplicator(DedupMode.NEAR, max_distance=4)
+
+
+@pytest.fixture
+async def site() -> AsyncIterator[str]:
+    pages = {
+        "/": page("home", ["/a", "/b", "/index.html"]),
+        "/index.html": page("home", ["/a", "/b", "/index.html"]),
+        "/a": page(TEXT, ["/a/1"]),
+        "/b": page(TEXT + " b", ["/b/1"]),
+        "/a/1": page("leaf a"),
+        "/b/1": page("leaf b"),
+    }
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=pages[request.path], content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+
+    try:
+        yield f"http://127.0.0.1:{runner.addresses[0][1]}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_parse_exact(site, stream):
+    dedup = Deduplicator()
+    found, scanned, reason = await parse(f"{site}/", dedup=dedup, stream=stream)
+
+    assert reason == StopReason.ALL_PROCESSED
+    assert len(scanned) == 6
+    assert dedup.clusters == {f"{site}/": [f"{site}/index.html"]}
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_parse_near(site, stream):
+    dedup = Deduplicator(DedupMode.NEAR)
+    found, scanned, reason = await parse(f"{site}/", dedup=dedup, stream=stream, workers_number=1)
+
+    assert reason == StopReason.ALL_PROCESSED
+    # Links of the copy scanned second are not followed
+    assert (URL(f"{site}/a/1") in found) != (URL(f"{site}/b/1") in found)
+    assert dedup.clusters[f"{site}/"] == [f"{site}/index.html"]
+    assert dedup.duplicates == 2
+
+
+async def test_parse_cache(site, tmp_path):
+    with PageCache(tmp_path / "cache.db") as cache:
+        await parse(f"{site}/", dedup=Deduplicator(), cache=cache, workers_number=1)
+
+        assert cache.get(URL(f"{site}/")).links
+        assert cache.get(URL(f"{site}/index.html")) is None
@@ -0,0 +1,244 @@
+import asyncio
+
+import pytest
+from yarl import URL
+
+from parser.frontier import (
+    BloomFilter, BucketQueue, Fingerprints, Frontier, Ordering, PriorityFrontier, PriorityRule, SpillQueue, fingerprint,
+)
+
+
+def test_fingerprint():
+    assert fingerprint("https://example.org") == fingerprint("https://example.org")
+    assert fingerprint("https://example.org") != fingerprint("https://example.org/")
+    assert fingerprint("https://example.org") < 2 ** 64
+
+
+class TestFingerprints:
+    def test_add(self):
+        seen = Fingerprints()
+        assert seen.add("https://example.org")
+        assert not seen.add("https://example.org")
+        assert "https://example.org" in seen
+        assert "https://example.com" not in seen
+        assert len(seen) == 1
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self):
+        seen = BloomFilter(1000, 0.01)
+        values = [f"https://example.org/{i}" for i in range(1000)]
+
+        for value in values:
+            seen.add(value)
+
+        assert all(value in seen for value in values)
+
+    def test_error_rate(self):
+        seen = BloomFilter(1000, 0.01)
+
+        for i in range(1000):
+            seen.add(f"https://example.org/{i}")
+
+        false_positives = sum(f"https://example.com/{i}" in seen for i in range(10000))
+        assert false_positives < 300
+
+    def test_from_memory(self):
+        seen = BloomFilter.from_memory(1024, 0.01)
+        assert len(seen._bits) <= 1024
+        assert seen.capacity > 800
+
+    def test_invalid_error_rate(self):
+        with pytest.raises(ValueError):
+            BloomFilter(1000, 1)
+
+
+class TestSpillQueue:
+    def test_in_memory(self):
+        queue = SpillQueue()
+
+        for i in range(100):
+            queue.append(str(i))
+
+        assert len(queue) == 100
+        assert [queue.popleft() for _ in range(100)] == [str(i) for i in range(100)]
+
+    def test_spilling_keeps_order(self):
+        queue = SpillQueue(memory_items=3)
+
+        for i in range(10):
+            queue.append(str(i))
+
+        assert len(queue._memory) == 3
+        assert len(queue) == 10
+        assert [queue.popleft() for _ in range(5)] == [str(i) for i in range(5)]
+
+        for i in range(10, 15):
+            queue.append(str(i))
+
+        assert [queue.popleft() for _ in range(10)] == [str(i) for i in range(5, 15)]
+        assert len(queue) == 0
+        queue.close()
+
+
+class TestFrontier:
+    async def test_flow(self):
+        frontier = Frontier()
+        urls = [URL(f"https://example.org/{i}") for i in range(3)]
+
+        for url in urls:
+            frontier.put_nowait(url)
+
+        for url in urls:
+            assert await frontier.get() == url
+
+    async def test_putting_duplicates(self):
+        frontier = Frontier()
+        frontier.put_nowait(URL("https://example.org"))
+        frontier.put_nowait(URL("https://example.org"))
+        assert frontier.qsize() == 1
+
+        await frontier.get()
+        frontier.put_nowait(URL("https://example.org"))
+        assert frontier.qsize() == 0
+
+    async def test_waiting_for_item(self):
+        frontier = Frontier()
+        getter = asyncio.create_task(frontier.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+
+        frontier.put_nowait(URL("https://example.org"))
+        assert await getter == URL("https://example.org")
+
+    async def test_join(self):
+        frontier = Frontier()
+        frontier.put_nowait(URL("https://example.org"))
+        joiner = asyncio.create_task(frontier.join())
+        await asyncio.sleep(0)
+        assert not joiner.done()
+
+        await frontier.get()
+        frontier.task_done()
+        await asyncio.wait_for(joiner, 1)
+
+        with pytest.raises(ValueError):
+            frontier.task_done()
+
+    async def test_memory_budget(self):
+        frontier = Frontier.create(memory_budget=1024, error_rate=0.01)
+        assert isinstance(frontier.seen, BloomFilter)
+        assert frontier.pending.memory_items == 4
+
+        urls = [URL(f"https://example.org/{i}") for i in range(20)]
+
+        for url in urls:
+            frontier.put_nowait(url)
+
+        assert frontier.qsize() == 20
+        assert [await frontier.get() for _ in range(20)] == urls
+        frontier.close()
+
+    def test_exact_by_default(self):
+        frontier = Frontier.create()
+        assert isinstance(frontier.seen, Fingerprints)
+        assert frontier.pending.memory_items is None
+
+
+class TestBucketQueue:
+    def test_order(self):
+        queue = BucketQueue()
+
+        for value, priority in [("a", 2), ("b", 0), ("c", 1), ("d", 0), ("e", 2)]:
+            queue.append(value, priority)
+
+        assert len(queue) == 5
+        assert [queue.popleft()[0] for _ in range(5)] == ["b", "d", "c", "a", "e"]
+        assert len(queue) == 0
+        assert not queue._buckets and not queue._priorities
+
+
+class TestPriorityRule:
+    def test_parse(self):
+        rule = PriorityRule.parse(r"/tag/\d+=10")
+        assert rule.pattern.pattern == r"/tag/\d+"
+        assert rule.priority == 10
+        assert PriorityRule.parse("a=b=-1").priority == -1
+
+    @pytest.mark.parametrize("value", ["no-priority", "=1", "a=b"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            PriorityRule.parse(value)
+
+
+class TestPriorityFrontier:
+    async def test_breadth_first_by_depth(self):
+        frontier = PriorityFrontier(ordering=Ordering.DEPTH)
+        start = URL("https://example.org")
+        frontier.put_nowait(start)
+        assert await frontier.get() == start
+
+        frontier.put_nowait(URL("https://example.org/a"), start)
+        frontier.put_nowait(URL("https://example.org/b"), start)
+        frontier.put_nowait(URL("https://example.org/c"), start)
+        frontier.complete(start)
+        frontier.task_done()
+
+        a = await frontier.get()
+        frontier.put_nowait(URL("https://example.org/a/1"), a)
+        frontier.complete(a)
+        frontier.task_done()
+
+        assert await frontier.get() == URL("https://example.org/b")
+        assert await frontier.get() == URL("https://example.org/c")
+        assert await frontier.get() == URL("https://example.org/a/1")
+        assert frontier._depths == {
+            "https://example.org/b": 1, "https://example.org/c": 1, "https://example.org/a/1": 2,
+        }
+
+    async def test_path_length(self):
+        frontier = PriorityFrontier(ordering=Ordering.PATH_LENGTH)
+
+        for path in ["/a/b/c", "/a", "/a/b", "/"]:
+            frontier.put_nowait(URL(f"https://example.org{path}"))
+
+        assert [(await frontier.get()).path for _ in range(4)] == ["/", "/a", "/a/b", "/a/b/c"]
+
+    async def test_rules(self):
+        rules = [PriorityRule.parse("/tag/=10"), PriorityRule.parse("/product/=-5"), PriorityRule.parse("/=100")]
+        frontier = PriorityFrontier(ordering=Ordering.FIFO, rules=rules)
+
+        for path in ["/tag/1", "/about", "/product/1", "/tag/2", "/product/2"]:
+            frontier.put_nowait(URL(f"https://example.org{path}"))
+
+        paths = [(await frontier.get()).path for _ in range(5)]
+        assert paths == ["/product/1", "/product/2", "/tag/1", "/tag/2", "/about"]
+
+    async def test_redirects(self):
+        frontier = PriorityFrontier(ordering=Ordering.DEPTH, redirects_first=True)
+        start = URL("https://example.org")
+        frontier.put_nowait(start)
+        await frontier.get()
+        frontier.put_nowait(URL("https://example.org/a"), start)
+        frontier.put_nowait(URL("https://example.org/moved"), start, redirect=True)
+
+        moved = await frontier.get()
+        assert moved == URL("https://example.org/moved")
+        assert frontier._depths[str(moved)] == 0
+
+    async def test_join(self):
+        frontier = PriorityFrontier.create(memory_budget=1024, error_rate=0.01)
+        assert isinstance(frontier.seen, BloomFilter)
+        frontier.put_nowait(URL("https://example.org"))
+        frontier.put_nowait(URL("https://example.org"))
+        assert frontier.qsize() == 1
+
+        joiner = asyncio.create_task(frontier.join())
+        url = await frontier.get()
+        await asyncio.sleep(0)
+        assert not joiner.done()
+
+        frontier.complete(url)
+        frontier.task_done()
+        await asyncio.wait_for(joiner, 1)
+        assert not frontier._depths
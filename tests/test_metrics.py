@@ -0,0 +1,95 @@
+import asyncio
+import io
+import json
+
+import aiohttp
+
+from parser.metrics import CrawlMetrics, Histogram, JsonFileSink, PrometheusSink, Stage, StderrSink
+
+
+class TestHistogram:
+    def test_empty(self):
+        assert Histogram().as_dict() == {"count": 0, "mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+
+    def test_quantiles(self):
+        histogram = Histogram(buckets=(0.001, 0.01, 0.1, 1))
+        for value in [0.0005] * 50 + [0.005] * 40 + [0.05] * 9 + [5]:
+            histogram.observe(value)
+
+        assert histogram.count == 100
+        assert histogram.quantile(0.5) == 0.001
+        assert histogram.quantile(0.9) == 0.01
+        assert histogram.quantile(0.99) == 0.1
+        assert histogram.quantile(1) == 5
+        assert histogram.counts == [50, 40, 9, 0, 1]
+
+
+class TestCrawlMetrics:
+    def test_snapshot(self):
+        metrics = CrawlMetrics()
+        metrics.queue_size = lambda: 7
+        metrics.pages = 2
+        metrics.statuses[200] += 2
+        metrics.observe(Stage.PARSE, 0.002)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["queue_size"] == 7
+        assert snapshot["statuses"] == {"200": 2}
+        assert snapshot["stages"]["parse"]["count"] == 1
+        assert snapshot["stages"]["dns"]["count"] == 0
+        assert snapshot["pages_per_second"] > 0
+
+    def test_prometheus(self):
+        metrics = CrawlMetrics()
+        metrics.statuses[404] += 1
+        metrics.observe(Stage.TTFB, 0.003)
+        metrics.stage_queues = {"parse": lambda: 2}
+        metrics.concurrency_limit = lambda: 12
+        text = metrics.to_prometheus()
+
+        assert 'parser_responses_total{status="404"} 1' in text
+        assert 'parser_stage_queue_size{stage="parse"} 2' in text
+        assert "parser_concurrency_limit 12" in text
+        assert 'parser_stage_seconds_bucket{stage="ttfb",le="+Inf"} 1' in text
+        assert 'parser_stage_seconds_bucket{stage="ttfb",le="0.002"} 0' in text
+        assert 'parser_stage_seconds_bucket{stage="ttfb",le="0.004"} 1' in text
+
+
+class TestSinks:
+    async def test_stderr(self):
+        stream = io.StringIO()
+        task = asyncio.create_task(StderrSink(0.01, stream).run(CrawlMetrics()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        assert stream.getvalue().startswith("pages=0 ")
+
+    async def test_json_file_written_on_stop(self, tmp_path):
+        path = tmp_path / "metrics.json"
+        metrics = CrawlMetrics()
+        task = asyncio.create_task(JsonFileSink(path, interval=60).run(metrics))
+        await asyncio.sleep(0)
+        metrics.pages = 3
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert json.loads(path.read_text())["pages"] == 3
+
+    async def test_prometheus_endpoint(self, unused_tcp_port):
+        metrics = CrawlMetrics()
+        metrics.pages = 5
+        task = asyncio.create_task(PrometheusSink(unused_tcp_port).run(metrics))
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                for _ in range(50):
+                    try:
+                        async with session.get(f"http://127.0.0.1:{unused_tcp_port}/metrics") as response:
+                            text = await response.text()
+                            break
+                    except aiohttp.ClientConnectionError:
+                        await asyncio.sleep(0.01)
+
+            assert "parser_pages_total 5" in text
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -1,16 +1,24 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
 from yarl import URL
 
-from parser.pages import Host, normalize_url, search_for_urls, scan_page
+from parser.canonical import CanonicalRules, Canonicalizer, TrailingSlash
+from parser.pages import (
+    Extractor, Host, LinkStream, get_host, normalize_url, normalize_urls, reject_reason, search_for_urls, scan_page,
+    scan_stream,
+)
+from parser.scope import Scope
 
 
 class TestNormalizeUrl:
     @staticmethod
-    def with_base(base_url: str):
+    def with_base(base_url: str, canonicalizer: Canonicalizer | None = None):
         base = URL(base_url)
         base_host = Host(base.host)
 
         def wrapper(url: str) -> str | None:
-            normalized = normalize_url(base, base_host, url)
+            normalized = normalize_url(base, base_host, url, canonicalizer)
             return str(normalized) if normalized else None
 
         return wrapper
@@ -34,6 +42,27 @@ class TestNormalizeUrl:
         assert test("/advanced_search?hl=ru&fg=1") == "https://www.google.ru/advanced_search"
         assert test("/history/privacyadvisor/search/unauth?utm_source=googlemenu&fg=1&cctld=ru") == "https://www.google.ru/history/privacyadvisor/search/unauth"
 
+    def test_canonical(self):
+        canonicalizer = Canonicalizer(CanonicalRules(
+            trailing_slash=TrailingSlash.STRIP,
+            deny_params=("utm_*",),
+            keep_query=True,
+            host_aliases={"www.dvmn.org": "dvmn.org"},
+        ))
+        test = self.with_base("https://dvmn.org/modules/", canonicalizer)
+        assert test("../signin/?next=/modules/&utm_source=x#top") == "https://dvmn.org/signin?next=/modules/"
+        assert test("https://WWW.dvmn.org/contacts/") == "https://dvmn.org/contacts"
+        assert test("/file.pdf?download=1") is None
+        assert test("https://example.org/?page=1") is None
+
+    def test_scope(self):
+        base = URL("https://www.dvmn.org/modules/")
+        scope = Scope(["dvmn.org", "cdn.example.org"], ["private.dvmn.org"])
+        assert normalize_url(base, scope, "https://dvmn.org/") == URL("https://dvmn.org/")
+        assert normalize_url(base, scope, "https://cdn.example.org/a") == URL("https://cdn.example.org/a")
+        assert normalize_url(base, scope, "https://private.dvmn.org/") is None
+        assert normalize_url(base, scope, "https://example.org/") is None
+
     def test_fragment(self):
         test = self.with_base("https://dvmn.org")
         assert test("#") == "https://dvmn.org"
@@ -58,7 +87,77 @@ class TestNormalizeUrl:
         assert test("https://www.google.ru/document.pdf") is None
 
 
+class TestRejectReason:
+    @pytest.mark.parametrize("raw_url", [
+        "tel:11221",
+        "mailto:mail@mail.com",
+        "javascript:void(0)",
+        "https://www.google.ru/picture.jpg",
+        "//www.google.ru/document.pdf",
+        "/static/style.css",
+        "archive.tar.gz",
+    ])
+    def test_rejected(self, raw_url):
+        assert reject_reason(raw_url) is not None
+
+    @pytest.mark.parametrize("raw_url", [
+        "",
+        "/",
+        "https://www.google.ru",
+        "HTTP://www.google.ru/page.html",
+        "//www.google.ru",
+        "//www.google.ru/",
+        "/a/.htaccess",
+        "/a/b.",
+        "/a/b.jpg/",
+        "/%2Ejpg",
+        "page.htm",
+    ])
+    def test_passed(self, raw_url):
+        assert reject_reason(raw_url) is None
+
+    @pytest.mark.parametrize("raw_url", [
+        "tel:11221",
+        "localhost:5000/page",
+        "https://www.google.ru/picture.jpg",
+        "/a/b.html;p=1",
+        "x.HTML",
+        "/a/.htaccess",
+        "/%2Ejpg",
+    ])
+    def test_agrees_with_url(self, raw_url):
+        url = URL(raw_url)
+        rejected_by_url = (url.scheme not in ("", "http", "https")) or (url.suffix not in ("", ".htm", ".html"))
+        assert reject_reason(raw_url) is None or rejected_by_url
+
+
+class TestNormalizeUrls:
+    async def test_batch(self):
+        base = URL("https://example.org/catalog/")
+        host = Host(base.host)
+        raw_urls = [f"/item/{i}?page=1" for i in range(1000)] + ["mailto:a@example.org", "/image.png", "#top"]
+
+        urls = await normalize_urls(base, host, raw_urls, batch_size=100)
+
+        assert len(urls) == 1001
+        assert URL("https://example.org/item/999") in urls
+        assert base in urls
+
+    async def test_same_as_single(self):
+        base = URL("https://dvmn.org")
+        host = Host(base.host)
+        raw_urls = ["/contacts/", "https://dvmn.org/signin/?next=/modules/", "https://google.com", "tel:1", "/a.jpg"]
+
+        urls = await normalize_urls(base, host, raw_urls)
+
+        assert urls == {url for raw_url in raw_urls if (url := normalize_url(base, host, raw_url))}
+
+
 class TestHost:
+    def test_memoized(self):
+        assert get_host("www.google.ru") is get_host("www.google.ru")
+        assert get_host("www.google.ru", top_level=True) == Host("google.ru")
+
     def test_equals(self):
         assert Host("google.ru") == Host("google.ru")
         assert Host("www.google.ru") == Host("www.google.ru")
@@ -102,7 +201,41 @@ def html_with_body(body: str) -> str:
         """
 
 
+PARITY_CORPUS = [
+    "",
+    "plain text without tags",
+    html_with_body(""),
+    html_with_body('<A HREF="/upper">Upper case</A>'),
+    html_with_body('<a href="/a?x=1&amp;y=2">Entity</a><a href="/caf&eacute;">Named entity</a>'),
+    html_with_body('<a href="  /spaces \n ">Whitespace</a><a href="\t/tab">Tab</a>'),
+    html_with_body('<a href="/unclosed"><a href="/next"><p><a href=/unquoted>Unquoted'),
+    html_with_body('<a href="/first" href="/second">Duplicate attribute</a>'),
+    html_with_body('<a href>No value</a><a name="anchor">No href</a><a href="">Empty</a>'),
+    html_with_body('<!-- <a href="/commented">Comment</a> --><a href="/visible">Visible</a>'),
+    html_with_body('<script>var s = \'<a href="/script">\';</script><a href="/after-script">After</a>'),
+    html_with_body('<svg><a xlink:href="/svg">Svg</a><a href="/svg-href">Svg href</a></svg>'),
+    html_with_body('<a href="/путь/страница.html">Cyrillic</a><a href="/%D0%BF">Encoded</a>'),
+    html_with_body('<table><tr><a href="/in-table">Table</a></tr></table>'),
+    html_with_body('<link href="/style.css"><area href="/area"><a href="javascript:void(0)">Js</a>'),
+    html_with_body("".join(f'<div><a href="/page/{i}">Page {i}</a></div>' for i in range(500))),
+    "<html><body><a href='/no-doctype'>Fragment</a>",
+    "<a href='/bare'>Bare anchor</a>",
+]
+
+
 class TestSearchForUrl:
+    @pytest.mark.parametrize("html", PARITY_CORPUS)
+    def test_extractors_parity(self, html):
+        assert search_for_urls(html, Extractor.LXML) == search_for_urls(html, Extractor.SOUP)
+
+    @pytest.mark.parametrize("extractor", Extractor)
+    def test_extractor_backends(self, extractor):
+        html = html_with_body("""
+            <a href="/help">Link to help</a>
+            <a>Empty link</a>
+            """)
+        assert search_for_urls(html, extractor) == {"/help"}
+
     def test_finding_hrefs(self):
         html = html_with_body("""
               <p>Paragraph</p>
@@ -142,3 +275,72 @@ class TestScanPage:
             "https://example.org/absolute",
             "https://example.org/",
         }
+
+    async def test_executor(self):
+        url = URL("https://example.org")
+        host = Host(url.host)
+        html = html_with_body("""
+            <a href="/first"></a>
+            <a href="https://example.org/second"></a>
+            <a href="https://www.google.com"></a>
+            """)
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            urls = await scan_page(url, host, html, executor)
+
+        assert {str(url) for url in urls} == {
+            "https://example.org/first",
+            "https://example.org/second",
+        }
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i: i + size]
+
+
+class TestLinkStream:
+    def test_feeding_chunks(self):
+        stream = LinkStream()
+        assert stream.feed(b'<html><body><a href="/first">First</a><a hr') == ["/first"]
+        assert stream.feed(b'ef="/second">Second</a><a href="/first">Again</a>') == ["/second"]
+        assert stream.close() == []
+
+    def test_closing_empty(self):
+        assert LinkStream().close() == []
+
+    def test_unknown_encoding(self):
+        stream = LinkStream("utf8mb4")
+        assert stream.feed(b'<html><body><a href="/first">First</a><a href="/second">Second</a>') == [
+            "/first", "/second"]
+        assert stream.close() == []
+
+
+class TestScanStream:
+    async def test_chunks(self):
+        url = URL("https://example.org")
+        host = Host(url.host)
+        html = html_with_body("""
+            <a href="/first"></a>
+            <a href="https://www.google.com"></a>
+            <a href="/second"></a>
+            """).encode()
+
+        batches = [links async for links in scan_stream(url, host, chunked(html, 16))]
+        assert len(batches) > 2
+        assert set().union(*batches) == {URL("https://example.org/first"), URL("https://example.org/second")}
+
+    async def test_max_bytes(self):
+        url = URL("https://example.org")
+        host = Host(url.host)
+        html = b'<a href="/first"></a>' + b" " * 100 + b'<a href="/second"></a>'
+
+        batches = [links async for links in scan_stream(url, host, chunked(html, 16), max_bytes=64)]
+        assert set().union(*batches) == {URL("https://example.org/first")}
+
+    async def test_unknown_encoding(self):
+        url = URL("https://example.org")
+        html = html_with_body('<a href="/first"></a>').encode()
+
+        batches = [links async for links in scan_stream(url, Host(url.host), chunked(html, 16), "utf8mb4")]
+        assert set().union(*batches) == {URL("https://example.org/first")}
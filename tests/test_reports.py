@@ -0,0 +1,81 @@
+import gzip
+import json
+from importlib.util import find_spec
+
+import pytest
+from yarl import URL
+
+from parser.reports import Compression, NdjsonReport, ReportFormat, report_path, write_report
+from parser.web import StopReason
+
+FOUND = {URL("https://example.org"), URL("https://example.org/b"), URL("https://example.org/a")}
+SCANNED = {URL("https://example.org"), URL("https://example.org/a")}
+
+
+class TestWriteReport:
+    def test_same_as_json_dump(self, tmp_path):
+        stats = {"connections": {"requests": 2}}
+        path = write_report(tmp_path, "https://example.org", FOUND, SCANNED, StopReason.ALL_PROCESSED, 1.234, stats)
+
+        expected = {
+            "start_url": "https://example.org",
+            "total_scanned": 2,
+            "total_found": 3,
+            "elapsed_time": 1.23,
+            "stop_reason": "ALL_PROCESSED",
+            "stats": stats,
+            "scanned": ["https://example.org", "https://example.org/a"],
+            "found": ["https://example.org", "https://example.org/a", "https://example.org/b"],
+        }
+        assert path.suffix == ".json"
+        assert path.read_text() == json.dumps(expected, indent=4)
+
+    def test_empty_arrays(self, tmp_path):
+        path = write_report(tmp_path, "https://example.org", set(), set(), StopReason.TIMEOUT, 0)
+        report = json.loads(path.read_text())
+        assert report["found"] == report["scanned"] == []
+        assert "stats" not in report
+
+    def test_unsorted(self, tmp_path):
+        path = write_report(tmp_path, "https://example.org", FOUND, SCANNED, StopReason.TIMEOUT, 0, sort=False)
+        report = json.loads(path.read_text())
+        assert set(report["found"]) == {str(url) for url in FOUND}
+
+    def test_gzip(self, tmp_path):
+        path = write_report(
+            tmp_path, "https://example.org", FOUND, SCANNED, StopReason.TIMEOUT, 0, compression=Compression.GZIP)
+        assert path.name.endswith(".json.gz")
+        with gzip.open(path, "rt") as file:
+            assert json.load(file)["total_found"] == 3
+
+    @pytest.mark.skipif(find_spec("zstandard") is not None, reason="zstandard is installed")
+    def test_zstd_without_package(self, tmp_path):
+        with pytest.raises(RuntimeError):
+            write_report(
+                tmp_path, "https://example.org", FOUND, SCANNED, StopReason.TIMEOUT, 0, compression=Compression.ZSTD)
+
+
+class TestNdjsonReport:
+    def test_records(self, tmp_path):
+        path = report_path(tmp_path, "https://example.org", ReportFormat.NDJSON)
+        assert path.suffix == ".ndjson"
+
+        with NdjsonReport(path) as report:
+            report.record_scanned(URL("https://example.org"))
+            report.record_scanned(URL("https://example.org/a"))
+            report.finish("https://example.org", FOUND, SCANNED, StopReason.ALL_PROCESSED, 0.5)
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert lines[:2] == [{"scanned": "https://example.org"}, {"scanned": "https://example.org/a"}]
+        assert lines[2:5] == [{"found": str(url)} for url in sorted(str(url) for url in FOUND)]
+        assert lines[5]["total_found"] == 3
+        assert lines[5]["stop_reason"] == "ALL_PROCESSED"
+
+    def test_scanned_lines_are_written_before_finish(self, tmp_path):
+        path = tmp_path / "report.ndjson.gz"
+        report = NdjsonReport(path, Compression.GZIP)
+        report.record_scanned(URL("https://example.org"))
+        report.close()
+
+        with gzip.open(path, "rt") as file:
+            assert file.read() == '{"scanned": "https://example.org"}\n'
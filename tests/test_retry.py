@@ -0,0 +1,127 @@
+import asyncio
+from collections import Counter
+from typing import AsyncIterator
+
+import pytest
+from aiohttp import ClientConnectionError, web
+from yarl import URL
+
+from parser.retry import CircuitBreaker, ErrorClass, Retries, RetryPolicy, classify
+from parser.web import StopReason, parse
+
+
+def test_classify():
+    assert classify(asyncio.TimeoutError()) == ErrorClass.TIMEOUT
+    assert classify(ClientConnectionError()) == ErrorClass.CONNECTION
+    assert classify(status=503) == ErrorClass.SERVER
+    assert classify(status=429) == ErrorClass.THROTTLED
+    assert classify(status=404) is None
+    assert classify(status=200) is None
+
+
+class TestRetryPolicy:
+    def test_backoff(self):
+        policy = RetryPolicy(base_delay=1, max_delay=5)
+        assert 0.5 <= policy.backoff(1) <= 1
+        assert 2 <= policy.backoff(3) <= 4
+        assert 2.5 <= policy.backoff(10) <= 5
+
+    def test_parse_budget(self):
+        assert RetryPolicy.parse_budget("timeout=5") == (ErrorClass.TIMEOUT, 5)
+        for value in ("timeout", "unknown=1", "server=x"):
+            with pytest.raises(ValueError):
+                RetryPolicy.parse_budget(value)
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+    assert breaker.failure("a", 0) is None
+    assert breaker.failure("b", 0) is None
+    assert breaker.failure("a", 1) == 11
+    # Half-open after the cooldown: a single failure opens the breaker again
+    assert breaker.failure("a", 20) == 30
+    breaker.success("a")
+    assert breaker.failure("a", 30) is None
+    assert breaker.opened == 2
+
+
+class TestRetries:
+    def test_budgets(self):
+        retries = Retries(RetryPolicy(budgets={ErrorClass.TIMEOUT: 2}, base_delay=0.1))
+        url = URL("https://example.org/")
+
+        assert retries.failure(url, ErrorClass.TIMEOUT, "timeout")[0] is not None
+        assert retries.failure(url, ErrorClass.TIMEOUT, "timeout")[0] is not None
+        assert retries.failure(url, ErrorClass.TIMEOUT, "timeout")[0] is None
+        assert retries.failure(URL("https://example.org/a"), ErrorClass.SERVER, "HTTP 500")[0] is None
+
+        assert retries.as_dict() == {
+            "retried": {"connection": 0, "timeout": 2, "server": 0, "throttled": 0},
+            "breakers_opened": 0,
+            "failed": {"https://example.org/": "timeout", "https://example.org/a": "HTTP 500"},
+        }
+
+    def test_success_resets_attempts(self):
+        retries = Retries(RetryPolicy(budgets={ErrorClass.SERVER: 1}, base_delay=0.1))
+        url = URL("https://example.org/")
+
+        assert retries.failure(url, ErrorClass.SERVER, "HTTP 503")[0] is not None
+        retries.success(url)
+        assert retries.failure(url, ErrorClass.SERVER, "HTTP 503")[0] is not None
+
+    def test_breaker_delays_retry(self):
+        retries = Retries(RetryPolicy(breaker_threshold=1, breaker_cooldown=60))
+        delay, paused_until = retries.failure(URL("https://example.org/"), ErrorClass.CONNECTION, "refused")
+        assert delay > 59
+        assert paused_until is not None
+
+
+@pytest.fixture
+async def site() -> AsyncIterator[tuple[str, Counter[str]]]:
+    requests = Counter[str]()
+
+    async def handle(request: web.Request) -> web.Response:
+        requests[request.path] += 1
+        if request.path == "/":
+            return web.Response(text='<a href="/flaky">a</a><a href="/broken">b</a>', content_type="text/html")
+        if request.path == "/flaky" and requests[request.path] < 3:
+            return web.Response(status=502)
+        if request.path == "/broken":
+            return web.Response(status=500)
+        return web.Response(text="<p>ok</p>", content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+
+    try:
+        yield f"http://127.0.0.1:{runner.addresses[0][1]}", requests
+    finally:
+        await runner.cleanup()
+
+
+async def test_parse(site):
+    root, requests = site
+    retries = Retries(RetryPolicy(base_delay=0.01))
+    found, scanned, reason = await parse(f"{root}/", retries=retries)
+
+    assert reason == StopReason.ALL_PROCESSED
+    assert requests == {"/": 1, "/flaky": 3, "/broken": 3}
+    # The last response of a url out of retries is scanned as before
+    assert scanned == {URL(f"{root}/"), URL(f"{root}/flaky"), URL(f"{root}/broken")}
+    assert retries.as_dict()["failed"] == {f"{root}/broken": "HTTP 500"}
+    assert retries.retried[ErrorClass.SERVER] == 4
+
+
+async def test_parse_connection_error():
+    retries = Retries(RetryPolicy(base_delay=0.01, breaker_threshold=2, breaker_cooldown=0.05))
+    # Nothing listens on the port
+    found, scanned, reason = await parse("http://127.0.0.1:9/", retries=retries)
+
+    assert reason == StopReason.ALL_PROCESSED
+    assert scanned == set()
+    assert list(retries.failed) == ["http://127.0.0.1:9/"]
+    assert retries.retried[ErrorClass.CONNECTION] == 3
+    assert retries.breaker.opened == 3
@@ -0,0 +1,208 @@
+import gzip
+import time
+from typing import AsyncIterator
+
+import aiohttp
+import pytest
+from aiohttp import web
+from yarl import URL
+
+from benchmarks.site import SiteConfig, serve_site
+from parser.robots import RobotsCache, iter_sitemap, iter_sitemap_urls, parse_robots
+from parser.web import StopReason, parse
+
+ROBOTS = """
+# comment
+User-agent: otherbot
+Disallow: /
+
+User-agent: *
+Disallow: /private
+Allow: /private/open
+Disallow: /*.php$
+Crawl-delay: 0.01
+
+Sitemap: {root}/sitemap_index.xml
+"""
+
+SITEMAP_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <sitemap><loc>{root}/sitemap-1.xml.gz</loc></sitemap>
+    <sitemap><loc>{root}/sitemap-2.xml</loc></sitemap>
+    <sitemap><loc>{root}/sitemap-2.xml</loc></sitemap>
+</sitemapindex>
+"""
+
+SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+{urls}
+</urlset>
+"""
+
+
+def sitemap(root: str, paths: list[str]) -> str:
+    return SITEMAP.format(urls="\n".join(f"    <url><loc>{root}{path}</loc></url>" for path in paths))
+
+
+async def chunked(data: bytes, size: int = 7) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestParseRobots:
+    def test_rules(self):
+        rules = parse_robots(ROBOTS.format(root="https://example.org"))
+        assert rules.crawl_delay == 0.01
+        assert rules.sitemaps == ["https://example.org/sitemap_index.xml"]
+
+        assert rules.allowed(URL("https://example.org/"))
+        assert rules.allowed(URL("https://example.org/public"))
+        assert not rules.allowed(URL("https://example.org/private"))
+        assert not rules.allowed(URL("https://example.org/private/page"))
+        assert rules.allowed(URL("https://example.org/private/open/page"))
+        assert not rules.allowed(URL("https://example.org/a/index.php"))
+        assert rules.allowed(URL("https://example.org/a/index.php5"))
+
+    def test_specific_agent(self):
+        rules = parse_robots(ROBOTS, agent="OtherBot/2.0")
+        assert rules.crawl_delay is None
+        assert not rules.allowed(URL("https://example.org/public"))
+
+    def test_empty(self):
+        rules = parse_robots("User-agent: *\nDisallow:\n")
+        assert not rules.rules
+        assert rules.allowed(URL("https://example.org/"))
+
+
+class TestIterSitemap:
+    async def test_urlset(self):
+        data = sitemap("https://example.org", ["/a", "/b", "/c"]).encode()
+        locations = [item async for item in iter_sitemap(chunked(data))]
+        assert locations == [(f"https://example.org/{path}", False) for path in "abc"]
+
+    async def test_gzipped_index(self):
+        data = gzip.compress(SITEMAP_INDEX.format(root="https://example.org").encode())
+        locations = [item async for item in iter_sitemap(chunked(data))]
+        assert locations[0] == ("https://example.org/sitemap-1.xml.gz", True)
+        assert len(locations) == 3
+
+    async def test_max_size(self):
+        data = sitemap("https://example.org", [f"/{i}" for i in range(1000)]).encode()
+        locations = [item async for item in iter_sitemap(chunked(data, 1024), max_size=4096)]
+        assert 0 < len(locations) < 1000
+
+
+@pytest.fixture
+async def site() -> AsyncIterator[str]:
+    root = ""
+
+    async def robots(request: web.Request) -> web.Response:
+        return web.Response(text=ROBOTS.format(root=root))
+
+    async def index(request: web.Request) -> web.Response:
+        return web.Response(text=SITEMAP_INDEX.format(root=root), content_type="application/xml")
+
+    async def first(request: web.Request) -> web.Response:
+        body = gzip.compress(sitemap(root, ["/a", "/private/b", "/c.php"]).encode())
+        return web.Response(body=body, content_type="application/gzip")
+
+    async def second(request: web.Request) -> web.Response:
+        return web.Response(text=sitemap(root, ["/d", "/private/open/e", "/a"]), content_type="application/xml")
+
+    async def page(request: web.Request) -> web.Response:
+        return web.Response(text="<html><body><a href='/d'>d</a></body></html>", content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/robots.txt", robots)
+    app.router.add_get("/sitemap_index.xml", index)
+    app.router.add_get("/sitemap-1.xml.gz", first)
+    app.router.add_get("/sitemap-2.xml", second)
+    app.router.add_get("/{path:.*}", page)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    root = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    try:
+        yield root
+    finally:
+        await runner.cleanup()
+
+
+class TestRobotsCache:
+    async def test_fetched_once(self, site):
+        cache = RobotsCache()
+
+        async with aiohttp.ClientSession() as session:
+            rules = await cache.get(session, URL(f"{site}/a"))
+            assert await cache.get(session, URL(f"{site}/b")) is rules
+
+        assert len(cache) == 1
+        assert cache.cached(URL(site)) is rules
+        assert not rules.allowed(URL(f"{site}/private/b"))
+
+    async def test_missing(self):
+        cache = RobotsCache()
+
+        async with serve_site(SiteConfig(depth=1)) as root, aiohttp.ClientSession() as session:
+            rules = await cache.get(session, URL(root))
+
+        assert rules.allowed(URL(root))
+
+    async def test_unreachable(self):
+        cache = RobotsCache()
+
+        async with aiohttp.ClientSession() as session:
+            rules = await cache.get(session, URL("http://127.0.0.1:9/page"), aiohttp.ClientTimeout(total=1))
+
+        assert not rules.allowed(URL("http://127.0.0.1:9/page"))
+
+
+async def test_iter_sitemap_urls(site):
+    async with aiohttp.ClientSession() as session:
+        urls = [url async for url in iter_sitemap_urls(session, [URL(f"{site}/sitemap_index.xml")])]
+
+    assert urls == [f"{site}{path}" for path in ["/a", "/private/b", "/c.php", "/d", "/private/open/e", "/a"]]
+
+
+async def test_parse_with_robots_and_sitemaps(site):
+    robots = RobotsCache()
+    found, scanned, reason = await parse(f"{site}/", robots=robots, sitemaps=True)
+
+    assert reason == StopReason.ALL_PROCESSED
+    assert {str(url) for url in scanned} == {f"{site}/", f"{site}/a", f"{site}/d", f"{site}/private/open/e"}
+    assert {str(url) for url in found} == {str(url) for url in scanned} | {f"{site}/private/b"}
+    assert robots.disallowed == 1
+
+
+async def test_parse_does_not_wait_for_disallowed():
+    async def robots(request: web.Request) -> web.Response:
+        return web.Response(text="User-agent: *\nDisallow: /private\nCrawl-delay: 0.3\n")
+
+    async def page(request: web.Request) -> web.Response:
+        paths = [f"/private/{i}" for i in range(4)] + ["/public"]
+        anchors = "".join(f"<a href='{path}'>{path}</a>" for path in paths)
+        return web.Response(text=f"<html><body>{anchors}</body></html>", content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/robots.txt", robots)
+    app.router.add_get("/{path:.*}", page)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    root = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    cache = RobotsCache()
+
+    try:
+        started = time.monotonic()
+        found, scanned, reason = await parse(f"{root}/", robots=cache)
+        elapsed = time.monotonic() - started
+    finally:
+        await runner.cleanup()
+
+    assert reason == StopReason.ALL_PROCESSED
+    assert {str(url) for url in scanned} == {f"{root}/", f"{root}/public"}
+    assert len(found) == 6
+    assert cache.disallowed == 4
+    # Disallowed urls are not queued, so they do not wait for the crawl delay
+    assert elapsed < 0.9
@@ -0,0 +1,173 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+from yarl import URL
+
+from parser.frontier import Frontier, PriorityFrontier, PriorityRule
+from parser.scheduler import Scheduler, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("not a date") is None
+    assert 50 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0
+    # The date is in -0000 zone
+    assert 50 < parse_retry_after(formatdate(time.time() + 60)) <= 60
+    assert parse_retry_after("Wed, 21 Oct 2015 99:28:00 GMT") is None
+
+
+def scheduler_with(urls: list[str], **kwargs) -> Scheduler:
+    scheduler = Scheduler(Frontier(), **kwargs)
+    for url in urls:
+        scheduler.put_nowait(URL(url))
+    return scheduler
+
+
+async def get_now(scheduler: Scheduler) -> URL:
+    return await asyncio.wait_for(scheduler.get(), 0.05)
+
+
+class TestScheduler:
+    async def test_fifo_for_single_host(self):
+        urls = [f"https://example.org/{i}" for i in range(3)]
+        scheduler = scheduler_with(urls)
+        assert [str(await get_now(scheduler)) for _ in urls] == urls
+        assert scheduler.qsize() == 0
+
+    async def test_round_robin_between_hosts(self):
+        scheduler = scheduler_with([
+            "https://a.example.org/1",
+            "https://a.example.org/2",
+            "https://b.example.org/1",
+        ])
+        hosts = [(await get_now(scheduler)).host for _ in range(3)]
+        assert hosts[:2] == ["a.example.org", "b.example.org"]
+
+    async def test_per_host_limit(self):
+        scheduler = scheduler_with([
+            "https://a.example.org/1",
+            "https://a.example.org/2",
+            "https://b.example.org/1",
+        ], per_host_limit=1)
+
+        first = await get_now(scheduler)
+        second = await get_now(scheduler)
+        assert {first.host, second.host} == {"a.example.org", "b.example.org"}
+
+        with pytest.raises(asyncio.TimeoutError):
+            await get_now(scheduler)
+
+        scheduler.release(URL("https://a.example.org/1"))
+        assert await get_now(scheduler) == URL("https://a.example.org/2")
+
+    async def test_waiting_for_released_slot(self):
+        scheduler = scheduler_with(["https://example.org/1", "https://example.org/2"], per_host_limit=1)
+        first = await get_now(scheduler)
+        getter = asyncio.create_task(scheduler.get())
+        await asyncio.sleep(0.01)
+        assert not getter.done()
+
+        scheduler.release(first)
+        assert await asyncio.wait_for(getter, 0.05) == URL("https://example.org/2")
+
+    async def test_per_host_rate(self):
+        scheduler = scheduler_with([f"https://example.org/{i}" for i in range(3)], per_host_rate=20)
+        started = time.monotonic()
+
+        for _ in range(3):
+            url = await asyncio.wait_for(scheduler.get(), 1)
+            scheduler.release(url)
+
+        assert time.monotonic() - started >= 0.09
+
+    async def test_backoff_on_too_many_requests(self):
+        scheduler = scheduler_with(["https://example.org/1", "https://example.org/2"])
+        first = await get_now(scheduler)
+        scheduler.release(first, latency=0.01, status=429, retry_after="0.2")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await get_now(scheduler)
+
+        assert scheduler._hosts["example.org"].delay >= 1
+
+    async def test_retry_after(self):
+        scheduler = scheduler_with(["https://example.org/1", "https://example.org/2"])
+        first = await get_now(scheduler)
+        scheduler.release(first, latency=0.01, status=503, retry_after="0")
+        scheduler._hosts["example.org"].delay = 0
+        assert await get_now(scheduler) == URL("https://example.org/2")
+
+    async def test_adaptive_delay(self):
+        scheduler = scheduler_with(["https://example.org/1"], adaptive=True)
+        url = await get_now(scheduler)
+        scheduler.release(url, latency=0.5, status=200)
+        assert scheduler._hosts["example.org"].delay == pytest.approx(0.25)
+
+    async def test_delay_decays_without_adaptive(self):
+        scheduler = scheduler_with(["https://example.org/1"])
+        url = await get_now(scheduler)
+        state = scheduler._hosts["example.org"]
+        state.delay = 4
+        scheduler.release(url, latency=0.1, status=200)
+        assert state.delay == 2
+
+    async def test_min_delay(self):
+        scheduler = scheduler_with(["https://example.org/1"])
+        scheduler.set_min_delay("example.org", 2)
+        state = scheduler._hosts["example.org"]
+        assert state.delay == 2
+
+        url = await get_now(scheduler)
+        scheduler.release(url, latency=0.1, status=200)
+        assert state.delay == 2
+
+    async def test_retry(self):
+        scheduler = scheduler_with(["https://example.org/1", "https://example.org/2"])
+        first = await get_now(scheduler)
+        scheduler.release(first)
+        scheduler.retry(first, 0.03)
+        assert scheduler.qsize() == 2
+
+        # The retried url is given out again when its time comes, ahead of the host queue
+        second = await get_now(scheduler)
+        scheduler.release(second)
+        scheduler.task_done(second)
+        assert str(second) == "https://example.org/2"
+        assert await get_now(scheduler) == first
+
+        join = asyncio.create_task(scheduler.join())
+        await asyncio.sleep(0)
+        assert not join.done()
+        scheduler.task_done(first)
+        await asyncio.wait_for(join, 0.05)
+
+    async def test_pause(self):
+        scheduler = scheduler_with(["https://a.example.org/1", "https://b.example.org/1"])
+        scheduler.pause("a.example.org", time.monotonic() + 60)
+        assert (await get_now(scheduler)).host == "b.example.org"
+
+        with pytest.raises(asyncio.TimeoutError):
+            await get_now(scheduler)
+
+    async def test_priority_frontier(self):
+        frontier = PriorityFrontier(rules=[PriorityRule.parse("/important$=-1")], redirects_first=True)
+        scheduler = Scheduler(frontier)
+        start = URL("https://example.org/")
+        scheduler.put_nowait(start)
+        assert await get_now(scheduler) == start
+
+        for i in range(50):
+            scheduler.put_nowait(URL(f"https://example.org/p{i}"), start)
+        assert await get_now(scheduler) == URL("https://example.org/p0")
+
+        # Urls queued later go first by their priority, they are not stuck behind the buffered ones
+        scheduler.put_nowait(URL("https://example.org/important"), start)
+        scheduler.put_nowait(URL("https://example.org/redirected"), start, redirect=True)
+        assert await get_now(scheduler) == URL("https://example.org/redirected")
+        assert await get_now(scheduler) == URL("https://example.org/important")
+        assert await get_now(scheduler) == URL("https://example.org/p1")
@@ -0,0 +1,84 @@
+import pickle
+
+import pytest
+from yarl import URL
+
+from parser.scope import PublicSuffixes, Scope, host_labels
+
+
+def test_host_labels():
+    assert host_labels("WWW.Example.org.") == ("org", "example", "www")
+
+
+class TestPublicSuffixes:
+    @pytest.mark.parametrize("host, expected", [
+        ("example.org", "example.org"),
+        ("www.example.org", "example.org"),
+        ("a.b.example.co.uk", "example.co.uk"),
+        ("co.uk", "co.uk"),
+        ("user.github.io", "user.github.io"),
+        ("localhost", "localhost"),
+    ])
+    def test_default(self, host, expected):
+        assert PublicSuffixes().registrable_domain(host) == expected
+
+    def test_wildcard_and_exception(self):
+        suffixes = PublicSuffixes(["ck", "*.ck", "!www.ck"])
+        assert suffixes.registrable_domain("a.b.ck") == "a.b.ck"
+        assert suffixes.registrable_domain("x.a.b.ck") == "a.b.ck"
+        assert suffixes.registrable_domain("www.ck") == "www.ck"
+        assert suffixes.registrable_domain("a.www.ck") == "www.ck"
+
+    def test_load(self, tmp_path):
+        path = tmp_path / "public_suffix_list.dat"
+        path.write_text("// comment\n\nuk\nco.uk\n\nexample.net  // private\n", encoding="utf-8")
+
+        suffixes = PublicSuffixes.load(path)
+        assert suffixes.registrable_domain("www.example.co.uk") == "example.co.uk"
+        assert suffixes.registrable_domain("a.b.example.net") == "b.example.net"
+        assert suffixes.registrable_domain("www.example.com.au") == "com.au"
+
+
+class TestScope:
+    def test_roots(self):
+        scope = Scope(["example.org", "example.net"])
+        assert "example.org" in scope
+        assert "www.Example.org" in scope
+        assert "example.net" in scope
+        assert "org" not in scope
+        assert "example.com" not in scope
+        assert "notexample.org" not in scope
+
+    def test_exclude(self):
+        scope = Scope(["example.org", "public.private.example.org"], ["private.example.org"])
+        assert "www.example.org" in scope
+        assert "private.example.org" not in scope
+        assert "a.private.example.org" not in scope
+        assert "public.private.example.org" in scope
+        assert "a.public.private.example.org" in scope
+
+    def test_cache(self):
+        scope = Scope(["example.org"], cache_size=2)
+        assert scope.includes("a.example.org")
+        assert not scope.includes("example.com")
+        assert len(scope._cache) == 2
+
+        assert scope.includes("b.example.org")
+        assert len(scope._cache) == 1
+
+    def test_for_url(self):
+        scope = Scope.for_url(URL("https://www.example.co.uk/a"))
+        assert "a.www.example.co.uk" in scope
+        assert "example.co.uk" not in scope
+
+        scope = Scope.for_url(URL("https://www.example.co.uk/a"), top_level=True, allow=["cdn.example.net"])
+        assert "example.co.uk" in scope
+        assert "shop.example.co.uk" in scope
+        assert "other.co.uk" not in scope
+        assert "img.cdn.example.net" in scope
+        assert str(scope) == "example.co.uk, cdn.example.net"
+
+    def test_pickle(self):
+        scope = pickle.loads(pickle.dumps(Scope(["example.org"], ["private.example.org"])))
+        assert "example.org" in scope
+        assert "private.example.org" not in scope
@@ -0,0 +1,34 @@
+from parser.session import SessionOptions, UserAgentMode, create_session, request_headers
+
+
+def test_request_headers():
+    assert "User-Agent" in request_headers(UserAgentMode.RANDOM)
+    assert request_headers(UserAgentMode.FIXED) is None
+
+
+class TestCreateSession:
+    async def test_connector(self):
+        options = SessionOptions(limit=10, limit_per_host=2, dns_cache_ttl=60, keepalive_timeout=5)
+
+        async with create_session(options) as session:
+            assert session.connector.limit == 10
+            assert session.connector.limit_per_host == 2
+            assert session.connector.use_dns_cache
+
+    async def test_disabled_dns_cache(self):
+        async with create_session(SessionOptions(dns_cache_ttl=0)) as session:
+            assert not session.connector.use_dns_cache
+
+    async def test_fixed_user_agent(self):
+        async with create_session(SessionOptions(user_agent=UserAgentMode.FIXED)) as session:
+            assert session.headers["User-Agent"]
+
+        async with create_session(SessionOptions(user_agent=UserAgentMode.RANDOM)) as session:
+            assert "User-Agent" not in session.headers
+
+    async def test_compression(self):
+        async with create_session(SessionOptions(compress=False)) as session:
+            assert session.headers["Accept-Encoding"] == "identity"
+
+        async with create_session(SessionOptions()) as session:
+            assert "Accept-Encoding" not in session.headers
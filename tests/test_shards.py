@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from yarl import URL
+
+from benchmarks.site import SiteConfig, serve_site
+from parser.shards import ShardFrontier, ShardKey, SharedBudget, SharedState, parse_sharded, shard_of
+from parser.web import StopReason, StopScanning
+
+
+def owned_by(shard: int, shards: int, count: int) -> list[URL]:
+    urls = (URL(f"https://example.org/{i}") for i in range(1000))
+    return [url for url in urls if shard_of(url, shards) == shard][:count]
+
+
+class TestShardOf:
+    def test_partition(self):
+        urls = [URL(f"https://example.org/{i}") for i in range(1000)]
+        shards = [shard_of(url, 4) for url in urls]
+        assert set(shards) == {0, 1, 2, 3}
+        assert shards == [shard_of(url, 4) for url in urls]
+
+    def test_host_key(self):
+        assert len({shard_of(URL(f"https://example.org/{i}"), 4, ShardKey.HOST) for i in range(100)}) == 1
+
+
+class TestShardFrontier:
+    async def test_local_and_forwarded(self):
+        state = SharedState(2)
+        frontier = ShardFrontier(0, state)
+        own, other = owned_by(0, 2, 1)[0], owned_by(1, 2, 1)[0]
+
+        frontier.put_nowait(own)
+        frontier.put_nowait(own)
+        frontier.put_nowait(other)
+        assert frontier.qsize() == 1
+        assert state.pending.value == 2
+
+        await asyncio.sleep(0)
+        assert state.inboxes[1].get(timeout=1) == [str(other)]
+
+    async def test_all_processed(self):
+        state = SharedState(1)
+        frontier = ShardFrontier(0, state)
+        frontier.start()
+
+        frontier.put_nowait(URL("https://example.org"))
+        assert await frontier.get() == URL("https://example.org")
+        frontier.task_done()
+
+        await asyncio.wait_for(frontier.join(), 1)
+        assert state.stop_reason == StopReason.ALL_PROCESSED
+        frontier.close()
+
+    async def test_found_limit(self):
+        state = SharedState(1, max_found=2)
+        frontier = ShardFrontier(0, state)
+        frontier.start()
+
+        for i in range(5):
+            frontier.put_nowait(URL(f"https://example.org/{i}"))
+
+        assert frontier.owned == ["https://example.org/0", "https://example.org/1"]
+        with pytest.raises(StopScanning):
+            await asyncio.wait_for(frontier.join(), 1)
+        assert state.stop_reason == StopReason.FOUND_LIMIT
+        frontier.close()
+
+
+class TestSharedBudget:
+    async def test_limit(self):
+        state = SharedState(2, max_scanned=2)
+        first, second = SharedBudget(state), SharedBudget(state)
+
+        await first.reserve()
+        await second.reserve()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(first.reserve(), 0.1)
+
+        first.spend()
+        first.release()
+        with pytest.raises(StopScanning):
+            second.spend()
+        assert state.stop_reason == StopReason.SCANNED_LIMIT
+
+
+class TestParseSharded:
+    async def test_same_as_single_process(self):
+        config = SiteConfig(fan_out=4, depth=2, page_size=1024, link_density=3)
+        async with serve_site(config) as url:
+            found, scanned, reason, stats = await asyncio.to_thread(parse_sharded, url, 2)
+
+        assert reason == StopReason.ALL_PROCESSED
+        assert len(scanned) == config.pages
+        assert found == scanned
+        assert len(stats) == 2
+        assert sum(shard["connections"]["requests"] for shard in stats) == config.pages
+
+    async def test_scanned_limit(self):
+        config = SiteConfig(fan_out=4, depth=2, page_size=1024)
+        async with serve_site(config) as url:
+            found, scanned, reason, stats = await asyncio.to_thread(parse_sharded, url, 2, max_scanned=7)
+
+        assert reason == StopReason.SCANNED_LIMIT
+        assert len(scanned) == 7
+
+    async def test_failed_shard_stops_others(self):
+        async def index(request: web.Request) -> web.Response:
+            links = "".join(f'<a href="/page/{i}">{i}</a>' for i in range(20))
+            return web.Response(text=f'{links}<a href="/broken">broken</a>', content_type="text/html")
+
+        async def page(request: web.Request) -> web.Response:
+            await asyncio.sleep(0.2)
+            return web.Response(text="<p>page</p>", content_type="text/html")
+
+        async def broken(request: web.Request) -> web.Response:
+            # Redirect without location breaks the crawl of the shard owning the url
+            return web.Response(status=301)
+
+        app = web.Application()
+        app.router.add_get("/", index)
+        app.router.add_get("/page/{i}", page)
+        app.router.add_get("/broken", broken)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+
+        try:
+            url = f"http://127.0.0.1:{runner.addresses[0][1]}/"
+            found, scanned, reason, stats = await asyncio.wait_for(asyncio.to_thread(parse_sharded, url, 2), 30)
+        finally:
+            await runner.cleanup()
+
+        assert reason == StopReason.RUNTIME_ERROR
+        assert len(scanned) < 21
+        assert len(stats) == 2
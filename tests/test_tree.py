@@ -1,8 +1,11 @@
-from collections import deque
+import time
 
+import pytest
 from yarl import URL
 
-from parser.tree import Node, NodeType, prepare_branches, merge_branch, build_tree, tree_to_dict
+from parser.tree import (
+    CompactTree, Node, NodeType, SiteTree, build_tree, build_compact_tree, tree_to_dict,
+)
 
 
 class TestNode:
@@ -11,83 +14,22 @@ class TestNode:
         assert Node(type=NodeType.DOMAIN, value="value") != Node(type=NodeType.PATH, value="value")
         assert Node(type=NodeType.PATH, value="value") != Node(type=NodeType.PATH, value="diff")
 
-
-def test_prepare_branches():
-    urls = [
-        URL(u) for u in [
-            "https://example.org",
-            "https://example.org/first",
-            "https://example.org/first/nested",
-            "https://level.example.org/first",
-            "https://level.example.org/second",
-        ]
-    ]
-
-    expected = [
-        deque([
-            Node.domain("org"),
-            Node.domain("example"),
-        ]),
-        deque([
-            Node.domain("org"),
-            Node.domain("example"),
-            Node.path("first"),
-        ]),
-        deque([
-            Node.domain("org"),
-            Node.domain("example"),
-            Node.path("first"),
-            Node.path("nested"),
-        ]),
-        deque([
-            Node.domain("org"),
-            Node.domain("example"),
-            Node.domain("level"),
-            Node.path("first"),
-        ]),
-        deque([
-            Node.domain("org"),
-            Node.domain("example"),
-            Node.domain("level"),
-            Node.path("second"),
-        ]),
-    ]
-
-    actual = list(prepare_branches(urls))
-    assert actual == expected
-
-
-class TestMergeBranch:
-    def test_empty_branch(self):
-        assert merge_branch(None, deque()) is None
-        node = Node.domain("value")
-        assert merge_branch(node, deque()) is node
-
-    def test_already_existing_child(self):
-        grandpa = Node.domain("grandpa")
+    def test_add(self):
         parent = Node.domain("parent")
         child = Node.path("child")
-        grandpa.children = [parent]
-        parent.parent = grandpa
-        merge_branch(grandpa, deque([parent, child]))
-        assert parent.children == [child]
-        assert child.parent == parent
-
-    def test_new_child(self):
-        parent = Node.domain("domain")
-        child = Node.path("child")
-        branch = deque([child])
-        merge_branch(parent, branch)
-        assert parent.children == [child]
-        assert child.parent == parent
+        assert parent.add(child) is child
+        assert parent.add(Node.path("child")) is child
+        assert list(parent.children.values()) == [child]
+        assert child.parent is parent
 
-    def test_none_parent(self):
-        domain = Node.domain("org")
-        branch = deque([
-            domain
-        ])
-        root = merge_branch(None, branch)
-        assert root is domain
+    def test_child(self):
+        parent = Node.domain("parent")
+        child = parent.child(NodeType.PATH, "child")
+        assert child == Node.path("child")
+        assert parent.child(NodeType.PATH, "child") is child
+        assert parent.child(NodeType.DOMAIN, "child") is not child
+        assert parent.get(NodeType.PATH, "child") is child
+        assert parent.get(NodeType.PATH, "missing") is None
 
 
 def test_build_tree():
@@ -102,15 +44,61 @@ def test_build_tree():
     ]
     tree = build_tree(urls)
     assert tree == Node.domain("com")
-    assert tree.children == [Node.domain("google")]
-    assert tree.children[0].children == [
+    assert list(tree.children.values()) == [Node.domain("google")]
+    google = tree.get(NodeType.DOMAIN, "google")
+    assert list(google.children.values()) == [
         Node.path("privacy"),
         Node.domain("blog"),
         Node.domain("www"),
     ]
-    assert tree.children[0].children[0].children == []
-    assert tree.children[0].children[1].children == [Node.path("about")]
-    assert tree.children[0].children[2].children == [Node.path("policy")]
+    privacy, blog, www = google.children.values()
+    assert privacy.children == {}
+    assert list(blog.children.values()) == [Node.path("about")]
+    assert list(www.children.values()) == [Node.path("policy")]
+
+
+def test_build_deep_tree():
+    url = URL("https://example.org/" + "/".join(f"level{i}" for i in range(5000)))
+    tree = build_tree([url])
+    depth = 0
+    node = tree
+
+    while node.children:
+        node = next(iter(node.children.values()))
+        depth += 1
+
+    assert depth == 5001
+    assert "example" in tree_to_dict(tree)["org"]
+
+
+class TestSiteTree:
+    def test_incremental_insert(self):
+        tree = SiteTree()
+        assert tree.root is None
+
+        tree.insert(URL("https://example.org/first"))
+        tree.insert(URL("https://example.org/first/nested"))
+        tree.insert(URL("https://blog.example.org"))
+
+        assert tree_to_dict(tree.root) == {
+            "org": {
+                "example": {
+                    "first": {
+                        "nested": {}
+                    },
+                    "blog": {}
+                }
+            }
+        }
+
+    def test_wide_directory(self):
+        tree = SiteTree()
+
+        for i in range(10000):
+            tree.insert(URL(f"https://example.org/products/{i}/"))
+
+        products = tree.root.get(NodeType.DOMAIN, "example").get(NodeType.PATH, "products")
+        assert len(products.children) == 10000
 
 
 def test_tree_to_dict():
@@ -122,14 +110,12 @@ def test_tree_to_dict():
     www = Node.domain("www")
     policy = Node.path("policy")
 
-    com.children = [google]
-    google.children = [
-        privacy,
-        blog,
-        www
-    ]
-    blog.children = [about]
-    www.children = [policy]
+    com.add(google)
+    google.add(privacy)
+    google.add(blog)
+    google.add(www)
+    blog.add(about)
+    www.add(policy)
     tree = com
 
     assert tree_to_dict(tree) == {
@@ -145,3 +131,69 @@ def test_tree_to_dict():
             }
         }
     }
+
+
+class TestCompactTree:
+    urls = [
+        URL(u) for u in [
+            "https://google.com",
+            "https://google.com/privacy",
+            "https://blog.google.com",
+            "https://blog.google.com/about",
+            "https://www.google.com/policy",
+            "https://www.google.com/privacy",
+        ]
+    ]
+
+    def test_same_as_node_tree(self):
+        assert tree_to_dict(build_compact_tree(self.urls)) == tree_to_dict(build_tree(self.urls))
+
+    def test_interned_segments(self):
+        tree = build_compact_tree(self.urls)
+        assert len(tree) == 8
+        assert tree.segments.count("privacy") == 1
+        assert tree.value_of(0) == "com"
+        assert [tree.value_of(child) for child in tree.children(1)] == ["privacy", "blog", "www"]
+        assert tree.type_of(tree.children(1)[0]) == NodeType.PATH
+        assert tree.type_of(tree.children(1)[1]) == NodeType.DOMAIN
+
+    def test_lazy_view(self):
+        view = tree_to_dict(build_compact_tree(self.urls))
+        assert list(view) == ["com"]
+        assert list(view["com"]["google"]) == ["privacy", "blog", "www"]
+        assert len(view["com"]["google"]["www"]) == 2
+        assert view.to_dict()["com"]["google"]["blog"] == {"about": {}}
+
+        with pytest.raises(KeyError):
+            view["org"]
+
+    def test_empty(self):
+        tree = CompactTree()
+        assert len(tree) == 0
+        assert tree.view().to_dict() == {}
+
+    def test_frozen_insertion(self):
+        tree = build_compact_tree(self.urls)
+        tree.freeze()
+        tree.insert(URL("https://google.com/privacy"))
+        tree.insert(URL("https://google.com/terms"))
+        assert len(tree) == 9
+        assert list(tree.view()["com"]["google"]) == ["privacy", "blog", "www", "terms"]
+
+    def test_deep_url(self):
+        url = URL("https://example.org/" + "/".join(f"level{i}" for i in range(5000)))
+        tree = build_compact_tree([url])
+        assert len(tree) == 5002
+        assert "level0" in tree.view().to_dict()["org"]["example"]
+
+    def test_wide_node(self):
+        tree = build_compact_tree(URL(f"https://example.org/page{i}") for i in range(20000))
+        example = tree.view()["org"]["example"]
+
+        started = time.perf_counter()
+        assert len(list(example.items())) == 20000
+        assert all(len(example[f"page{i}"]) == 0 for i in range(20000))
+        assert time.perf_counter() - started < 1
+
+        tree.insert(URL("https://example.org/page20000"))
+        assert "page20000" in example
@@ -1,70 +1,149 @@
 import asyncio
+import json
+import time
 from unittest.mock import patch
 
 import aiohttp
+from aiohttp import web
 import httpbin
 import pytest
 from pytest_httpbin import serve
 from yarl import URL
 
-from parser.web import StopReason, UniqueQueue, parse
-
-
-class TestUniqueQueue:
-    async def test_size(self):
-        queue = UniqueQueue()
-        assert queue.qsize() == 0
-
-        queue.put_nowait(0)
-        assert queue.qsize() == 1
-
-        await queue.get()
-        assert queue.qsize() == 0
-
-    async def test_flow(self):
-        queue = UniqueQueue()
-        numbers = (1, 2, 3)
-
-        for i in numbers:
-            queue.put_nowait(i)
-
-        for i in numbers:
-            assert await queue.get() == i
-
-    async def test_join(self):
-        queue = UniqueQueue()
-        numbers = (1, 2, 3)
-
-        for i in numbers:
-            queue.put_nowait(i)
-
-        async def stop(q: UniqueQueue):
-            await q.join()
-            raise ValueError
-
-        async def consume(q: UniqueQueue):
-            while True:
-                await q.get()
-                q.task_done()
-
-        with pytest.raises(ExceptionGroup) as eg:
-            async with asyncio.TaskGroup() as tg:
-                tg.create_task(consume(queue))
-                tg.create_task(stop(queue))
-
-        assert len(eg.value.exceptions) == 1
-        exception = eg.value.exceptions[0]
-        assert isinstance(exception, ValueError)
-
-    async def test_putting_duplicates(self):
-        queue = UniqueQueue()
-        queue.put_nowait(1)
-        queue.put_nowait(2)
-        assert queue.qsize() == 2
-
-        queue.put_nowait(1)
-        queue.put_nowait(2)
-        assert queue.qsize() == 2
+from parser.cache import PageCache
+from parser.checkpoint import Checkpoint
+from parser.frontier import Frontier, Ordering, PriorityRule
+from parser.metrics import CrawlMetrics
+from parser.reports import NdjsonReport
+from parser.scheduler import Scheduler
+from parser.session import ConnectionStats, SessionOptions, UserAgentMode
+from parser.tree import SiteTree, tree_to_dict
+from parser.pages import scan_page
+from parser.web import (
+    Budget, ConcurrencyController, ObservedSet, PipelineOptions, ScanOptions, StopReason, StopScanning, fetch,
+    limit_listener, parse,
+)
+
+
+class TestObservedSet:
+    def test_listeners(self):
+        values = {1}
+        added = []
+        observed = ObservedSet(values)
+        observed.listeners.append(added.append)
+
+        observed.add(1)
+        observed.update([2, 3, 2])
+        assert added == [2, 3]
+        assert values == {1, 2, 3}
+        assert len(observed) == 3
+        assert 2 in observed
+
+    def test_limit_listener(self):
+        values = set()
+        observed = ObservedSet(values)
+        observed.listeners.append(limit_listener(StopReason.FOUND_LIMIT, 2, values))
+        observed.add(1)
+
+        with pytest.raises(StopScanning) as e:
+            observed.update([2, 3])
+
+        assert e.value.reason == StopReason.FOUND_LIMIT
+        assert values == {1, 2}
+
+
+class TestBudget:
+    async def test_unlimited(self):
+        budget = Budget(None)
+        for _ in range(10):
+            await budget.reserve()
+        budget.spend()
+        assert not budget.exhausted()
+
+    async def test_reserve_waits_for_release(self):
+        budget = Budget(2)
+        await budget.reserve()
+        await budget.reserve()
+
+        waiter = asyncio.create_task(budget.reserve())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        budget.release()
+        await asyncio.wait_for(waiter, 1)
+        assert budget.reserved == 2
+
+    async def test_spend(self):
+        budget = Budget(2, spent=1)
+        await budget.reserve()
+
+        with pytest.raises(StopScanning) as e:
+            budget.spend()
+
+        assert e.value.reason == StopReason.SCANNED_LIMIT
+        assert budget.exhausted()
+
+
+class TestConcurrencyController:
+    @staticmethod
+    async def window(controller: ConcurrencyController, latencies: list[float | None], now: float) -> int:
+        """Finish requests with the latencies, None for an error, and adjust the limit at `now`."""
+        for latency in latencies:
+            await controller.acquire()
+            controller.release(latency, error=latency is None)
+        controller.adjust(now)
+        return controller.limit
+
+    def test_bounds(self):
+        assert ConcurrencyController(200, max_limit=50).limit == 50
+        with pytest.raises(ValueError):
+            ConcurrencyController(5, min_limit=10, max_limit=5)
+
+    async def test_acquire_waits_for_release(self):
+        controller = ConcurrencyController(1, interval=3600)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        controller.release(0.1)
+        await waiter
+        assert controller.active == 1
+
+    async def test_aimd(self):
+        controller = ConcurrencyController(2, max_limit=20, interval=3600)
+        now = time.monotonic()
+        controller.backlog = lambda: 1
+
+        assert await self.window(controller, [0.1] * 10, now + 1) == 4
+        assert await self.window(controller, [0.1] * 10, now + 2) == 8
+        assert await self.window(controller, [0.1] * 10, now + 3) == 16
+        assert await self.window(controller, [0.1] * 10, now + 4) == 20
+        assert await self.window(controller, [0.1] * 9 + [None], now + 5) == 20
+        assert await self.window(controller, [0.1] * 8 + [None] * 2, now + 6) == 15
+        # After the first cut the limit grows by one
+        assert await self.window(controller, [0.1] * 10, now + 7) == 16
+        assert await self.window(controller, [0.5] * 10, now + 8) == 12
+
+        assert controller.as_dict()["decisions"][-1]["reason"] == "latency"
+        assert controller.increases == 5
+        assert controller.decreases == 2
+
+    async def test_no_growth_without_gain(self):
+        controller = ConcurrencyController(4, interval=3600)
+        now = time.monotonic()
+        controller.backlog = lambda: 1
+        assert await self.window(controller, [0.1] * 10, now + 1) == 8
+        # Twice as many workers finished less requests
+        assert await self.window(controller, [0.1] * 5, now + 2) == 8
+        assert await self.window(controller, [0.1] * 5, now + 3) == 16
+
+    async def test_idle(self):
+        controller = ConcurrencyController(4, min_limit=3, interval=3600)
+        now = time.monotonic()
+        assert await self.window(controller, [0.1] * 10, now + 1) == 4
+        assert await self.window(controller, [None] * 10, now + 2) == 3
+        assert await self.window(controller, [None] * 10, now + 3) == 3
 
 
 @pytest.fixture(scope="session")
@@ -106,6 +185,176 @@ class TestParse:
         assert scanned == set()
         assert reason == StopReason.ALL_PROCESSED
 
+    async def test_parse_workers(self, server):
+        found, scanned, reason = await parse_str(f"{server.url}/links/5/0", parse_workers=2)
+        expected = {f"{server.url}/links/5/{i}" for i in range(5)}
+        assert found == expected
+        assert scanned == expected
+        assert reason == StopReason.ALL_PROCESSED
+
+    async def test_stream(self, server):
+        found, scanned, reason = await parse_str(f"{server.url}/links/5/0", stream=True)
+        expected = {f"{server.url}/links/5/{i}" for i in range(5)}
+        assert found == expected
+        assert scanned == expected
+        assert reason == StopReason.ALL_PROCESSED
+
+    async def test_stream_max_body_bytes(self, server):
+        url = f"{server.url}/links/10/0"
+        found, scanned, reason = await parse_str(url, stream=True, max_body_bytes=1)
+        assert found == {url}
+        assert scanned == {url}
+        assert reason == StopReason.ALL_PROCESSED
+
+    @pytest.mark.parametrize("stream", [False, True])
+    async def test_pipeline(self, server, stream):
+        pipeline = PipelineOptions(parse_concurrency=3, parse_queue_size=1, link_queue_size=1)
+        found, scanned, reason = await parse_str(f"{server.url}/links/10/0", stream=stream, pipeline=pipeline)
+        expected = {f"{server.url}/links/10/{i}" for i in range(10)}
+        assert found == expected
+        assert scanned == expected
+        assert reason == StopReason.ALL_PROCESSED
+
+    async def test_pipeline_backpressure(self, server):
+        metrics = CrawlMetrics()
+        parsed = 0
+        backlog = []
+
+        async def slow_scan_page(*args, **kwargs):
+            nonlocal parsed
+            backlog.append(metrics.pages - parsed)
+            await asyncio.sleep(0.02)
+            parsed += 1
+            return await scan_page(*args, **kwargs)
+
+        pipeline = PipelineOptions(parse_concurrency=1, parse_queue_size=2)
+
+        with patch("parser.web.scan_page", slow_scan_page):
+            found, scanned, reason = await parse(
+                f"{server.url}/links/30/0", workers_number=5, metrics=metrics, pipeline=pipeline)
+
+        assert len(scanned) == 30
+        # Downloaded pages wait in the queue, in the parser and in fetchers blocked by the full queue
+        assert max(backlog) <= 2 + 1 + 5
+
+    async def test_adaptive_concurrency(self, server):
+        concurrency = ConcurrencyController(1, max_limit=8, interval=0.01)
+        metrics = CrawlMetrics()
+        found, scanned, reason = await parse(f"{server.url}/links/30/0", concurrency=concurrency, metrics=metrics)
+
+        assert len(scanned) == 30
+        assert reason == StopReason.ALL_PROCESSED
+        assert metrics.snapshot()["concurrency_limit"] == concurrency.limit
+
+    async def test_memory_budget(self, server):
+        found, scanned, reason = await parse_str(
+            f"{server.url}/links/5/0", memory_budget=1024, bloom_error_rate=0.001)
+        expected = {f"{server.url}/links/5/{i}" for i in range(5)}
+        assert found == expected
+        assert scanned == expected
+        assert reason == StopReason.ALL_PROCESSED
+
+    async def test_priority_ordering(self, server):
+        class RecordingSink:
+            def record_found(self, url: URL) -> None:
+                pass
+
+            def record_scanned(self, url: URL) -> None:
+                scanned.append(str(url))
+
+        scanned = []
+        found, _, reason = await parse_str(
+            f"{server.url}/links/5/0",
+            workers_number=1,
+            ordering=Ordering.DEPTH,
+            priority_rules=[PriorityRule.parse("/links/5/3$=-1")],
+            sinks=[RecordingSink()],
+        )
+        assert len(found) == 5
+        assert reason == StopReason.ALL_PROCESSED
+        assert scanned[:2] == [f"{server.url}/links/5/0", f"{server.url}/links/5/3"]
+
+    async def test_politeness(self, server):
+        found, scanned, reason = await parse_str(
+            f"{server.url}/links/5/0", per_host_limit=1, per_host_rate=100, adaptive_delay=True)
+        expected = {f"{server.url}/links/5/{i}" for i in range(5)}
+        assert found == expected
+        assert scanned == expected
+        assert reason == StopReason.ALL_PROCESSED
+
+    async def test_connection_stats(self, server):
+        stats = ConnectionStats()
+        options = SessionOptions(limit_per_host=1, user_agent=UserAgentMode.FIXED)
+        found, scanned, reason = await parse_str(
+            f"{server.url}/links/5/0", session_options=options, connection_stats=stats)
+        assert len(scanned) == 5
+        assert stats.requests == 5
+        assert stats.connections_created + stats.connections_reused == 5
+
+    async def test_cache(self, server, tmp_path):
+        url = f"{server.url}/etag/abc"
+
+        with PageCache(tmp_path / "cache.db") as cache:
+            await parse(url, cache=cache)
+            assert cache.get(URL(url)).etag == "abc"
+            assert cache.hits == 0
+
+            found, scanned, reason = await parse_str(url, cache=cache)
+            assert scanned == {url}
+            assert cache.hits == 1
+            assert reason == StopReason.ALL_PROCESSED
+
+    async def test_checkpoint_and_resume(self, server, tmp_path):
+        path = tmp_path / "crawl.log"
+        start = f"{server.url}/links/50/0"
+        expected = {f"{server.url}/links/50/{i}" for i in range(50)}
+
+        found, scanned, reason = await parse_str(
+            start, max_scanned=2, workers_number=1, checkpoint=Checkpoint(path))
+        assert reason == StopReason.SCANNED_LIMIT
+        assert len(scanned) < 50
+        assert Checkpoint(path).load() == ({URL(url) for url in found}, {URL(url) for url in scanned})
+        scanned_before = scanned
+
+        found, scanned, reason = await parse_str(start, checkpoint=Checkpoint(path, resume=True))
+        assert found == expected
+        assert scanned == expected
+        assert reason == StopReason.ALL_PROCESSED
+        assert len(Checkpoint(path).load()[1]) == 50
+        assert scanned_before < scanned
+
+    async def test_site_tree(self, server):
+        tree = SiteTree()
+        await parse(f"{server.url}/links/3/0", site_tree=tree)
+        assert tree_to_dict(tree.root) == {
+            "1": {"0": {"0": {"127": {
+                "links": {
+                    "3": {"0": {}, "1": {}, "2": {}}
+                }
+            }}}}
+        }
+
+    async def test_ndjson_report(self, server, tmp_path):
+        path = tmp_path / "report.ndjson"
+        with NdjsonReport(path) as report:
+            found, scanned, reason = await parse(f"{server.url}/links/3/0", report=report)
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert {URL(line["scanned"]) for line in lines} == scanned
+
+    async def test_metrics(self, server):
+        metrics = CrawlMetrics()
+        found, scanned, reason = await parse(f"{server.url}/links/3/0", metrics=metrics)
+        snapshot = metrics.snapshot()
+
+        assert snapshot["pages"] == len(scanned) == 3
+        assert snapshot["statuses"] == {"200": 3}
+        assert snapshot["bytes"] > 0
+        assert snapshot["in_flight"] == 0
+        assert snapshot["stage_queues"] == {"parse": 0, "sink": 0}
+        for stage in ("connect", "ttfb", "download", "parse", "normalize"):
+            assert snapshot["stages"][stage]["count"] > 0
+
     async def test_redirect(self, server):
         url = f"{server.url}/redirect/1"
         found, scanned, reason = await parse_str(url)
@@ -138,16 +387,36 @@ class TestParse:
 
     async def test_max_scanned(self, server):
         limit = 10
-        found, scanned, reason = await parse_str(f"{server.url}/links/50/0", max_scanned=limit, check_interval=0)
-        assert abs(len(scanned) - limit) <= 1
+        found, scanned, reason = await parse_str(f"{server.url}/links/50/0", max_scanned=limit)
+        assert len(scanned) == limit
+        assert reason == StopReason.SCANNED_LIMIT
+
+    async def test_max_scanned_keeps_links(self, server):
+        found, scanned, reason = await parse_str(f"{server.url}/links/10/0", max_scanned=1)
+        assert len(scanned) == 1
+        assert len(found) == 10
         assert reason == StopReason.SCANNED_LIMIT
 
     async def test_max_found(self, server):
-        found, scanned, reason = await parse_str(f"{server.url}/links/10/0", max_found=10, check_interval=0)
+        found, scanned, reason = await parse_str(f"{server.url}/links/10/0", max_found=10)
         assert len(scanned) == 1
         assert len(found) == 10
         assert reason == StopReason.FOUND_LIMIT
 
+    async def test_no_requests_after_limit(self, server):
+        stats = ConnectionStats()
+        found, scanned, reason = await parse_str(
+            f"{server.url}/links/50/0", max_scanned=3, workers_number=10, connection_stats=stats)
+        assert len(scanned) == 3
+        assert stats.requests == 3
+        assert reason == StopReason.SCANNED_LIMIT
+
+    async def test_limit_reached_before_scanning(self, server):
+        url = f"{server.url}/status/200"
+        found, scanned, reason = await parse(url, max_found=1)
+        assert scanned == set()
+        assert reason == StopReason.FOUND_LIMIT
+
     async def test_found_set_injecting(self, server):
         url = f"{server.url}/status/200"
         found_injected = set()
@@ -166,9 +435,49 @@ class TestParse:
         async def raiser(*args, **kwargs):
             raise RuntimeError
 
-        with patch("parser.web.work", raiser):
+        with patch("parser.web.fetch", raiser):
             found, scanned, reason = await parse(f"{server.url}/status/200")
 
         assert found is not None
         assert scanned is not None
         assert reason == StopReason.RUNTIME_ERROR
+
+
+async def test_fetch_failed_stream():
+    async def handle(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await response.prepare(request)
+        await response.write(b'<html><body><a href="/first">first</a>')
+        await asyncio.sleep(0.5)
+        return response
+
+    app = web.Application()
+    app.router.add_get("/", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    root = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    scheduler = Scheduler(Frontier())
+    scheduler.put_nowait(URL(f"{root}/"))
+    links = asyncio.Queue()
+    options = ScanOptions(stream=True, request_timeout=aiohttp.ClientTimeout(total=0.1))
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            worker = asyncio.create_task(
+                fetch("worker", session, scheduler, asyncio.Queue(), links, options, Budget(None)))
+            try:
+                partial = await asyncio.wait_for(links.get(), 1)
+                failed = await asyncio.wait_for(links.get(), 1)
+            finally:
+                worker.cancel()
+    finally:
+        await runner.cleanup()
+
+    assert partial.links == {URL(f"{root}/first")}
+    assert not partial.complete
+    assert failed.failed
+    # The url is done by the sink after its streamed links are queued
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(scheduler.join(), 0.05)